@@ -0,0 +1,138 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Worker-local processor, created once per pool process by _init_worker
+_processor = None
+
+
+def _init_worker(model_name: str) -> None:
+    """Pool initializer: load the spaCy model once per worker process"""
+    global _processor
+    from app.services.document_processor import DocumentProcessor, load_ner_model
+
+    _processor = DocumentProcessor(load_ner_model(model_name), parallel_pages=False)
+
+
+def _process_file(name: str, content: bytes) -> Dict[str, Any]:
+    """Pool task: extract the fields of one PDF and time it"""
+    start = time.perf_counter()
+    try:
+        result = _processor.extract(content)
+        return {"arquivo": name, "status": "ok", "resultado": result,
+                "tempo_ms": round((time.perf_counter() - start) * 1000, 2)}
+    except Exception as e:
+        return {"arquivo": name, "status": "erro", "erro": str(e),
+                "tempo_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+
+class BatchIngestor:
+    """
+    Fans PDF documents out to a process pool of ``DocumentProcessor`` workers.
+
+    The pool is created on first use and reused across batches, so each worker
+    loads the spaCy model only once. Results are yielded as each file finishes,
+    followed by a summary record with per-run timing and throughput.
+    """
+
+    def __init__(self, model_name: str = "pt_core_news_lg", workers: Optional[int] = None):
+        self.model_name = model_name
+        self.workers = workers or os.cpu_count() or 2
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_name,)
+                )
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    def process(self, files: Iterable[Tuple[str, bytes]]) -> Iterator[Dict[str, Any]]:
+        """
+        Process ``(name, content)`` pairs, yielding one record per file in
+        completion order and a final ``{"resumo": {...}}`` record.
+
+        If a worker dies mid-batch (e.g. out of memory) the files it left
+        unfinished become error records, the summary is still yielded and the
+        pool is discarded so the next batch recreates it.
+        """
+        start = time.perf_counter()
+        ok = errors = 0
+        file_times = []
+        broken = False
+
+        futures = {}
+        unsubmitted = []
+        executor = self._get_executor()
+        for name, content in files:
+            if broken:
+                unsubmitted.append(name)
+                continue
+            try:
+                futures[executor.submit(_process_file, name, content)] = name
+            except BrokenProcessPool:
+                broken = True
+                unsubmitted.append(name)
+
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except BrokenProcessPool:
+                broken = True
+                errors += 1
+                yield _broken_pool_record(futures[future])
+                continue
+            file_times.append(record["tempo_ms"])
+            if record["status"] == "ok":
+                ok += 1
+            else:
+                errors += 1
+            yield record
+        for name in unsubmitted:
+            errors += 1
+            yield _broken_pool_record(name)
+
+        if broken:
+            logger.error("Pool de processamento de documentos interrompido; será recriado no próximo lote")
+            self.shutdown()
+
+        yield {"resumo": summarize(ok, errors, file_times, time.perf_counter() - start)}
+
+
+def _broken_pool_record(name: str) -> Dict[str, Any]:
+    """Error record of a file left unprocessed by a dead pool worker"""
+    return {"arquivo": name, "status": "erro",
+            "erro": "Processamento interrompido: um worker do pool terminou inesperadamente.",
+            "tempo_ms": 0.0}
+
+
+def summarize(ok: int, errors: int, file_times: list, elapsed: float) -> Dict[str, Any]:
+    """Run summary: counts, wall time, throughput and per-file timing"""
+    total = ok + errors
+    return {
+        "total_arquivos": total,
+        "processados": ok,
+        "erros": errors,
+        "tempo_total_s": round(elapsed, 3),
+        "arquivos_por_segundo": round(total / elapsed, 2) if elapsed > 0 else 0.0,
+        "tempo_medio_ms": round(sum(file_times) / len(file_times), 2) if file_times else 0.0,
+        "tempo_max_ms": max(file_times) if file_times else 0.0,
+    }
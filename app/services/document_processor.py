@@ -1,188 +1,350 @@
-import io
+import os
 import re
-import spacy
-from typing import Optional, Dict, List
+from typing import TYPE_CHECKING, Optional, Dict, List, Tuple
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 import logging
-from PyPDF2 import PdfReader
+
+if TYPE_CHECKING:
+    # spaCy is imported lazily (load_ner_model) so importing this module stays cheap
+    import spacy
+
+from app.services.pdf_text import extract_text
 
 logger = logging.getLogger(__name__)
 
+# Version of the extraction logic: bump it whenever results may change (invalidates cached results)
+EXTRACTOR_VERSION = "proximidade-6"
+
+TRIBUNAL_CNPJ = "21.154.877/0001-07"
+
+# Context window around a partner CNPJ used to find its razão social
+CONTEXT_BEFORE = 500
+CONTEXT_AFTER = 200
+
+# Early termination: pages read after the OBJETO clause closed, the term number was
+# found and the last new partner CNPJ appeared (0 = always read every page)
+EARLY_STOP_PAGES = int(os.getenv("HUB_PDF_EARLY_STOP_PAGES", "2"))
+# Characters of the previous page kept when scanning a new one (matches across page breaks)
+PAGE_OVERLAP = 200
+
+# Patterns compiled once at import time
+WHITESPACE_PATTERN = re.compile(r'\s+')
+CNPJ_PATTERN = re.compile(r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}')
+OBJETO_PATTERN = re.compile(
+    r'CLÁUSULA\s*PRIMEIRA\s*–\s*DO\s*OBJETO\s*(.*?)(?=\s*CLÁUSULA\s*SEGUNDA|\Z)',
+    re.DOTALL | re.IGNORECASE
+)
+OBJETO_START_PATTERN = re.compile(r'CLÁUSULA\s*PRIMEIRA\s*–\s*DO\s*OBJETO', re.IGNORECASE)
+OBJETO_END_PATTERN = re.compile(r'CLÁUSULA\s*SEGUNDA', re.IGNORECASE)
+ANO_PATTERN = re.compile(r'Nº\s*\d+/(\d{4})', re.IGNORECASE)
+UPPERCASE_ORG_PATTERN = re.compile(r"([A-ZÀ-Ú]{2,}(?:\s+[A-ZÀ-Ú]{2,}){1,})")
+FORMAL_NAME_PATTERNS = (
+    re.compile(
+        r'(?:instituto|universidade|fundação|fundacao|empresa|companhia|hospital|secretaria|faculdade|centro|associação|associacao)\s+(?:[\w\s]+(?:\s+(?:de|do|da|dos|das)\s+[\w\s]+)*)',
+        re.IGNORECASE
+    ),
+    re.compile(
+        r'(?:[\w\s]+(?:\s+(?:de|do|da|dos|das)\s+[\w\s]+)*(?:\s+(?:ltda|s\.?/?a|sociedade|instituto|empresa)))',
+        re.IGNORECASE
+    ),
+)
+
+# Generic or header terms that never make a valid razão social
+JUNK_TERMS = frozenset({
+    "UNIÃO", "ESTADO", "MUNICÍPIO", "GOVERNO", "PREFEITURA",
+    "TERMO", "ADITIVO", "ACORDO", "COOPERAÇÃO", "COOPERACAO",
+    "PRORROGAÇÃO", "PRORROGACAO", "OBJETO", "CELEBRAM"
+})
+NAME_CONNECTORS = frozenset({'de', 'do', 'da', 'dos', 'das'})
+
+# Only NER is needed: the extractor reads doc.ents and the API only uses static vectors otherwise
+NER_PIPES = ("ner",)
+
+
+def restrict_to_ner(nlp: "spacy.language.Language") -> "spacy.language.Language":
+    """
+    Disable every pipeline component not needed for NER (nlp.select_pipes).
+
+    Keeps a shared tok2vec when the ner component listens to it. Static word
+    vectors (Doc.vector) do not depend on any component and keep working.
+    """
+    enable = [name for name in NER_PIPES if name in nlp.pipe_names]
+    if "tok2vec" in nlp.pipe_names:
+        listeners = nlp.get_pipe("tok2vec").listening_components
+        if any(name in listeners for name in enable):
+            enable.insert(0, "tok2vec")
+    nlp.select_pipes(enable=enable)
+    logger.info(f"Pipeline spaCy restrita a: {nlp.pipe_names}")
+    return nlp
+
+
+def load_ner_model(model_name: str) -> "spacy.language.Language":
+    """Load a spaCy model with only the components used for extraction enabled"""
+    import spacy
+
+    return restrict_to_ner(spacy.load(model_name))
+
+
+class EmptyDocumentError(ValueError):
+    """Raised when a PDF has no extractable text"""
+
+
+class _ExtractionProgress:
+    """
+    ``is_complete`` callback of ``extract_text``: True once the OBJETO clause is
+    closed, the term number was found, a partner CNPJ was seen and ``quiet_pages``
+    pages in a row brought no new partner CNPJ.
+
+    Each call scans only the new page (plus the end of the previous one), so the
+    cost per page is constant.
+    """
+
+    def __init__(self, quiet_pages: int):
+        self.quiet_pages = quiet_pages
+        self.cnpjs: set = set()
+        self.objeto_started = False
+        self.objeto_closed = False
+        self.ano_found = False
+        self.pages_without_new_cnpj = 0
+        self._tail = ""
+
+    def __call__(self, page_text: str) -> bool:
+        texto = self._tail + WHITESPACE_PATTERN.sub(' ', page_text.replace('\n', ' '))
+        self._tail = texto[-PAGE_OVERLAP:]
+
+        new_cnpjs = {c for c in CNPJ_PATTERN.findall(texto) if c != TRIBUNAL_CNPJ} - self.cnpjs
+        self.cnpjs |= new_cnpjs
+        self.pages_without_new_cnpj = 0 if new_cnpjs else self.pages_without_new_cnpj + 1
+
+        if not self.objeto_started:
+            start = OBJETO_START_PATTERN.search(texto)
+            if start:
+                self.objeto_started = True
+                texto_objeto = texto[start.end():]
+            else:
+                texto_objeto = ""
+        else:
+            texto_objeto = texto
+        if self.objeto_started and not self.objeto_closed:
+            self.objeto_closed = bool(OBJETO_END_PATTERN.search(texto_objeto))
+        self.ano_found = self.ano_found or bool(ANO_PATTERN.search(texto))
+
+        return (self.objeto_closed and self.ano_found and bool(self.cnpjs)
+                and self.pages_without_new_cnpj >= self.quiet_pages)
+
+
 class DocumentProcessor:
-    TRIBUNAL_CNPJ = "21.154.877/0001-07"
-    
-    def __init__(self, nlp_model: spacy.language.Language):
+    TRIBUNAL_CNPJ = TRIBUNAL_CNPJ
+
+    def __init__(self, nlp_model: "spacy.language.Language", parallel_pages: bool = True,
+                 early_stop_pages: int = EARLY_STOP_PAGES):
         self.nlp = nlp_model
-        
+        # Disable the page-parallel pool when the processor already runs inside a pool worker
+        self.parallel_pages = parallel_pages
+        self.early_stop_pages = early_stop_pages
+
     async def process_pdf(self, file_content: bytes) -> Dict[str, str]:
         """
         Process a PDF file and extract relevant information.
-        
+
         Args:
             file_content: Raw bytes of the PDF file
-            
+
         Returns:
             Dictionary containing extracted information
         """
         try:
-            # Extract text from PDF
-            pdf_stream = io.BytesIO(file_content)
-            reader = PdfReader(pdf_stream)
-            texto_completo = self._extract_text(reader)
-            
-            if not texto_completo.strip():
-                raise HTTPException(status_code=400, detail="Não foi possível extrair texto do PDF.")
-                
-            texto_limpo = self._clean_text(texto_completo)
-            
-            # Extract information
-            return {
-                "razao_social_sugerida": self._extract_razao_social(texto_limpo),
-                "objeto_sugerido": self._extract_objeto(texto_completo),
-                "cnpj_sugerido": self._extract_cnpj(texto_limpo),
-                "ano_do_termo_sugerido": self._extract_ano(texto_limpo)
-            }
-            
+            # Runs in a worker thread so the event loop is not blocked during extraction
+            return await run_in_threadpool(self.extract, file_content)
+        except EmptyDocumentError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             logger.error(f"Erro no processamento do documento: {e}", exc_info=True)
             raise HTTPException(status_code=500, detail=f"Erro no processamento: {str(e)}")
-    
-    def _extract_text(self, reader: PdfReader) -> str:
-        """Extract text from PDF pages"""
-        return "".join([page.extract_text() or "" for page in reader.pages])
-    
+
+    def extract(self, file_content: bytes) -> Dict[str, str]:
+        """
+        Synchronous extraction (usable outside the request cycle, e.g. pool workers).
+
+        Raises:
+            EmptyDocumentError: if no text could be extracted from the PDF
+        """
+        # Extract text from PDF pages (stops once every field is found and no new partner CNPJ appears)
+        texto_completo = self._extract_text(file_content)
+
+        if not texto_completo.strip():
+            raise EmptyDocumentError("Não foi possível extrair texto do PDF.")
+
+        return self.extract_fields(texto_completo)
+
+    def extract_fields(self, texto_completo: str) -> Dict[str, str]:
+        """Extract every field from the raw document text"""
+        texto_limpo = self._clean_text(texto_completo)
+        cnpjs_parceiros = self._extract_partner_cnpjs(texto_limpo)
+
+        return {
+            "razao_social_sugerida": self._extract_razao_social(texto_limpo, cnpjs_parceiros),
+            "objeto_sugerido": self._extract_objeto(texto_completo),
+            "cnpj_sugerido": ", ".join(cnpjs_parceiros),
+            "ano_do_termo_sugerido": self._extract_ano(texto_limpo)
+        }
+
+    def _extract_text(self, file_content: bytes) -> str:
+        """
+        Extract the text of the PDF pages, page by page.
+
+        Reading stops ``early_stop_pages`` pages after the last new partner CNPJ,
+        once the OBJETO clause is closed and the term number was found (partners
+        of multi-party agreements may be listed after the OBJETO clause). This is
+        a heuristic: a partner first named further down is missed, so
+        ``early_stop_pages=0`` reads every page.
+        """
+        is_complete = _ExtractionProgress(self.early_stop_pages) if self.early_stop_pages > 0 else None
+        texto, _ = extract_text(file_content, is_complete=is_complete, parallel=self.parallel_pages)
+        return texto
+
     def _clean_text(self, text: str) -> str:
         """Clean and normalize text"""
-        return re.sub(r'\s+', ' ', text.replace('\n', ' '))
-    
-    def _extract_razao_social(self, texto: str) -> str:
+        return WHITESPACE_PATTERN.sub(' ', text.replace('\n', ' '))
+
+    def _extract_razao_social(self, texto: str, cnpjs_parceiros: List[str]) -> str:
         """
-        Extract organization name using a sophisticated approach:
-        1. Look for organizations near CNPJs
-        2. Use regex patterns for formal names
-        3. Apply NLP for entity recognition
-        4. Score and rank candidates
+        Extract the partner's organization name by proximity to its CNPJ:
+        1. Uppercase blocks right before the CNPJ (most reliable in official documents)
+        2. Formal name patterns (instituto, universidade, ... ltda)
+        3. spaCy ORG entities, only for windows where 1 and 2 failed, in one nlp.pipe batch
+        The candidate closest to its CNPJ wins; the score only breaks ties.
         """
-        cnpjs = self._extract_cnpj_list(texto)
-        candidates = []
-        
-        for cnpj in cnpjs:
-            if cnpj == self.TRIBUNAL_CNPJ:
-                continue
-                
-            # Find text window around CNPJ
+        # Context windows (left, right, cnpj_pos), one per distinct CNPJ position
+        windows = []
+        for cnpj in cnpjs_parceiros:
             pos = texto.find(cnpj)
-            window = texto[max(0, pos - 500):min(len(texto), pos + 200)]
-            
-            # Try different extraction methods
-            candidates.extend(self._find_uppercase_orgs(window, pos))
-            candidates.extend(self._find_formal_names(window, pos))
-            candidates.extend(self._find_spacy_orgs(window, pos))
-        
-        # Score and select best candidate
-        if candidates:
-            return max(candidates, key=lambda x: x[1])[0]
-        return ""
-    
-    def _find_uppercase_orgs(self, text: str, cnpj_pos: int) -> List[tuple]:
-        """Find organization names in uppercase"""
-        pattern = r"([A-ZÀ-Ú]{2,}(?:\s+[A-ZÀ-Ú]{2,}){1,})"
-        matches = re.finditer(pattern, text)
-        results = []
-        
-        for match in matches:
-            if not self._is_junk(match.group()):
-                score = self._calculate_score(match.group(), match.start(), cnpj_pos)
-                results.append((match.group(), score))
-                
-        return results
-    
-    def _find_formal_names(self, text: str, cnpj_pos: int) -> List[tuple]:
-        """Find organization names using formal patterns"""
-        patterns = [
-            r'(?:instituto|universidade|fundação|fundacao|empresa|companhia)\s+(?:[\w\s]+(?:\s+(?:de|do|da|dos|das)\s+[\w\s]+)*)',
-            r'(?:[\w\s]+(?:\s+(?:de|do|da|dos|das)\s+[\w\s]+)*(?:\s+(?:ltda|s\.?/?a|sociedade|instituto|empresa)))'
-        ]
-        
-        results = []
-        for pattern in patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                name = self._normalize_name(match.group())
-                if not self._is_junk(name):
-                    score = self._calculate_score(name, match.start(), cnpj_pos)
-                    results.append((name, score))
-                    
-        return results
-    
-    def _find_spacy_orgs(self, text: str, cnpj_pos: int) -> List[tuple]:
-        """Find organizations using spaCy NER"""
-        doc = self.nlp(text)
+            if pos == -1:
+                continue
+            windows.append((max(0, pos - CONTEXT_BEFORE), min(len(texto), pos + CONTEXT_AFTER), pos))
+
+        # Heuristics first; remember which windows still need NER
+        candidates = []
+        pending = []
+        for left, right, pos in windows:
+            window = texto[left:right]
+            chosen = self._find_uppercase_org(window, left, pos) or self._find_formal_name(window, left, pos)
+            if chosen:
+                candidates.append(chosen)
+            else:
+                pending.append((left, right, pos))
+
+        if pending:
+            candidates.extend(self._find_spacy_orgs(texto, pending))
+
+        best = None
+        best_dist = float('inf')
+        best_score = 0.0
+        for name, dist in candidates:
+            score = self._calculate_score(name, dist)
+            if dist < best_dist or (dist == best_dist and score > best_score):
+                best, best_dist, best_score = name, dist, score
+
+        return best or ""
+
+    def _find_uppercase_org(self, window: str, left: int, cnpj_pos: int) -> Optional[Tuple[str, int]]:
+        """Closest uppercase organization name ending before the CNPJ"""
+        chosen = None
+        for match in UPPERCASE_ORG_PATTERN.finditer(window):
+            dist = cnpj_pos - (left + match.end())
+            if dist >= 0 and (chosen is None or dist < chosen[1]):
+                candidate = match.group().strip()
+                if not self._is_junk(candidate):
+                    chosen = (candidate, dist)
+        return chosen
+
+    def _find_formal_name(self, window: str, left: int, cnpj_pos: int) -> Optional[Tuple[str, int]]:
+        """Closest organization name matching a formal pattern, ending before the CNPJ"""
+        chosen = None
+        for pattern in FORMAL_NAME_PATTERNS:
+            for match in pattern.finditer(window):
+                dist = cnpj_pos - (left + match.end())
+                if dist >= 0 and (chosen is None or dist < chosen[1]):
+                    candidate = self._normalize_name(match.group())
+                    if not self._is_junk(candidate):
+                        chosen = (candidate, dist)
+        return chosen
+
+    def _find_spacy_orgs(self, texto: str, windows: List[Tuple[int, int, int]]) -> List[Tuple[str, int]]:
+        """
+        Closest ORG entity (either side of the CNPJ) for each ``(left, right, cnpj_pos)``
+        window, using spaCy NER in a single nlp.pipe pass.
+
+        Overlapping windows are merged into one span so shared text is only
+        processed once; entities are then assigned back to every window that
+        fully contains them.
+        """
+        spans = []
+        for left, right, _ in sorted(windows):
+            if spans and left <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], right)
+            else:
+                spans.append([left, right])
+
+        entities = []
+        for (start, end), doc in zip(spans, self.nlp.pipe(texto[start:end] for start, end in spans)):
+            for ent in doc.ents:
+                if ent.label_ == 'ORG':
+                    name = ent.text.strip()
+                    if not self._is_junk(name):
+                        entities.append((start + ent.start_char, start + ent.end_char, name))
+
         results = []
-        
-        for ent in doc.ents:
-            if ent.label_ == 'ORG':
-                name = ent.text.strip()
-                if not self._is_junk(name):
-                    score = self._calculate_score(name, ent.start_char, cnpj_pos)
-                    results.append((name, score))
-                    
+        for left, right, cnpj_pos in windows:
+            chosen = None
+            for ent_start, ent_end, name in entities:
+                if ent_start < left or ent_end > right:
+                    continue
+                dist = min(abs(ent_start - cnpj_pos), abs(ent_end - cnpj_pos))
+                if chosen is None or dist < chosen[1]:
+                    chosen = (name, dist)
+            if chosen:
+                results.append(chosen)
         return results
-    
+
     def _normalize_name(self, name: str) -> str:
         """Normalize organization name capitalization"""
-        words = name.strip().split()
-        normalized = []
-        
-        for word in words:
-            if word.lower() in {'de', 'do', 'da', 'dos', 'das'}:
-                normalized.append(word.lower())
-            else:
-                normalized.append(word.capitalize())
-                
-        return ' '.join(normalized)
-    
+        return ' '.join(
+            word.lower() if word.lower() in NAME_CONNECTORS else word.capitalize()
+            for word in name.strip().split()
+        )
+
     def _is_junk(self, text: str) -> bool:
         """Check if text is a generic term or header"""
-        junk_terms = {
-            "UNIÃO", "ESTADO", "MUNICÍPIO", "GOVERNO", "PREFEITURA",
-            "TERMO", "ADITIVO", "ACORDO", "COOPERAÇÃO", "COOPERACAO",
-            "PRORROGAÇÃO", "PRORROGACAO", "OBJETO"
-        }
-        
         upper = text.upper()
         return (
-            any(term in upper for term in junk_terms) or
+            any(term in upper for term in JUNK_TERMS) or
             len(text.split()) < 2
         )
-    
-    def _calculate_score(self, name: str, pos: int, cnpj_pos: int) -> float:
-        """Calculate candidate score based on position and characteristics"""
-        distance_score = 1.0 / (1 + abs(pos - cnpj_pos))
+
+    def _calculate_score(self, name: str, distance: int) -> float:
+        """Tie-break score: prefer closer, longer and mostly uppercase names"""
+        distance_score = 1.0 / (1 + distance)
         length_score = len(name.split()) / 10.0
-        caps_score = 0.2 if sum(1 for c in name if c.isupper()) / len(name) > 0.4 else 0
-        
+        caps_score = 0.2 if sum(1 for c in name if c.isupper()) / max(1, len(name)) > 0.4 else 0
+
         return distance_score + length_score + caps_score
-    
-    def _extract_cnpj(self, texto: str) -> str:
-        """Extract CNPJ from text"""
-        cnpjs = self._extract_cnpj_list(texto)
-        return ", ".join(cnpj for cnpj in cnpjs if cnpj != self.TRIBUNAL_CNPJ)
-    
+
+    def _extract_partner_cnpjs(self, texto: str) -> List[str]:
+        """Distinct partner CNPJs (tribunal excluded) in order of appearance"""
+        return list(dict.fromkeys(cnpj for cnpj in self._extract_cnpj_list(texto) if cnpj != self.TRIBUNAL_CNPJ))
+
     def _extract_cnpj_list(self, texto: str) -> List[str]:
         """Extract all CNPJs from text"""
-        return re.findall(r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}', texto)
-    
+        return CNPJ_PATTERN.findall(texto)
+
     def _extract_objeto(self, texto: str) -> str:
         """Extract object description from text"""
-        match = re.search(
-            r'CLÁUSULA\s*PRIMEIRA\s*–\s*DO\s*OBJETO\s*(.*?)(?=\s*CLÁUSULA\s*SEGUNDA|\Z)',
-            texto,
-            re.DOTALL | re.IGNORECASE
-        )
+        match = OBJETO_PATTERN.search(texto)
         return match.group(1).strip() if match else texto[:1000]
-    
+
     def _extract_ano(self, texto: str) -> str:
         """Extract year from text"""
-        match = re.search(r'Nº\s*\d+/(\d{4})', texto, re.IGNORECASE)
-        return match.group(1) if match else ""
\ No newline at end of file
+        match = ANO_PATTERN.search(texto)
+        return match.group(1) if match else ""
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionCache:
+    """
+    Bounded on-disk cache (SQLite) of document extraction results.
+
+    Entries are keyed by the SHA-256 of the uploaded bytes plus the extractor
+    version, so changing the extraction logic invalidates old results. When the
+    store grows beyond ``max_entries`` the least recently used rows are evicted.
+    The SQLite file can be shared by several worker processes.
+    """
+
+    def __init__(self, path: str, max_entries: int = 512):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if self.enabled:
+            try:
+                self._connect()
+            except sqlite3.Error as e:
+                logger.warning(f"Cache de extração desabilitado ({path}): {e}")
+                self._conn = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(content: bytes, extractor_version: str) -> str:
+        """Build the cache key from the file content and extractor version"""
+        digest = hashlib.sha256(content).hexdigest()
+        return f"{extractor_version}:{digest}"
+
+    def _connect(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS extracoes (
+                chave TEXT PRIMARY KEY,
+                resultado TEXT NOT NULL,
+                ultimo_acesso REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS extracoes_acesso_idx ON extracoes (ultimo_acesso)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for ``key`` (refreshing its LRU position) or None"""
+        if self._conn is None:
+            return None
+        with self._lock:
+            try:
+                row = self._conn.execute("SELECT resultado FROM extracoes WHERE chave = ?", (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                self._conn.execute("UPDATE extracoes SET ultimo_acesso = ? WHERE chave = ?", (time.time(), key))
+                self._conn.commit()
+                self.hits += 1
+                return json.loads(row[0])
+            except sqlite3.Error as e:
+                logger.warning(f"Falha ao ler cache de extração: {e}")
+                self.misses += 1
+                return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """Store ``value`` and evict the least recently used entries above the limit"""
+        if self._conn is None:
+            return
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO extracoes (chave, resultado, ultimo_acesso) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), time.time())
+                )
+                self._conn.execute("""
+                    DELETE FROM extracoes WHERE chave IN (
+                        SELECT chave FROM extracoes
+                        ORDER BY ultimo_acesso DESC
+                        LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Falha ao gravar cache de extração: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of this process plus the current store size"""
+        total = self.hits + self.misses
+        entries = 0
+        if self._conn is not None:
+            with self._lock:
+                try:
+                    entries = self._conn.execute("SELECT COUNT(*) FROM extracoes").fetchone()[0]
+                except sqlite3.Error:
+                    entries = 0
+        return {
+            "habilitado": self._conn is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entradas": entries,
+            "max_entradas": self.max_entries,
+        }
@@ -0,0 +1,112 @@
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from app.services.quantization import popcount
+
+logger = logging.getLogger(__name__)
+
+
+class FacetBitmaps:
+    """
+    One packed bitmap (64 parcerias per uint64 word) per value of each facet column.
+
+    Rows are the parcerias sorted by id. A selection (the rows that pass the
+    search filters) is a bitmap too, so filtering is an AND of value bitmaps and
+    counting a facet is an AND + popcount per value, without touching the database.
+    """
+
+    def __init__(self, ids: Sequence[int], columns: Dict[str, Sequence[Any]]):
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+        self.ids = ids[order]
+        self.words = (len(self.ids) + 63) // 64
+        self.values: Dict[str, List[Any]] = {}
+        self.bitmaps: Dict[str, np.ndarray] = {}
+        rows = np.arange(len(self.ids))
+        for name, column in columns.items():
+            column = [column[i] for i in order]
+            values = list(dict.fromkeys(column))
+            position = {value: n for n, value in enumerate(values)}
+            codes = np.fromiter((position[value] for value in column), dtype=np.int64, count=len(column))
+            members = np.zeros((len(values), len(self.ids)), dtype=bool)
+            members[codes, rows] = True
+            self.values[name] = values
+            self.bitmaps[name] = self._pack(members)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _pack(self, members: np.ndarray) -> np.ndarray:
+        """Pack boolean rows (last axis = parcerias) into uint64 words"""
+        packed = np.zeros((*members.shape[:-1], self.words * 8), dtype=np.uint8)
+        bits = np.packbits(members, axis=-1, bitorder="little")
+        packed[..., :bits.shape[-1]] = bits
+        return packed.view(np.uint64)
+
+    def all(self) -> np.ndarray:
+        return self._pack(np.ones(len(self.ids), dtype=bool))
+
+    def select(self, **filters: Any) -> np.ndarray:
+        """Bitmap of the rows whose facet ``name`` equals each given value (None filters are ignored)"""
+        selection = self.all()
+        for name, value in filters.items():
+            if value is None:
+                continue
+            values = self.values[name]
+            if value not in values:
+                return np.zeros(self.words, dtype=np.uint64)
+            selection &= self.bitmaps[name][values.index(value)]
+        return selection
+
+    def ids_of(self, selection: np.ndarray) -> np.ndarray:
+        """Parceria ids of the rows set in ``selection``"""
+        members = np.unpackbits(selection.view(np.uint8), bitorder="little")[:len(self.ids)]
+        return self.ids[members.astype(bool)]
+
+    def count(self, selection: np.ndarray) -> int:
+        return int(popcount(selection).sum())
+
+    def counts(self, selection: np.ndarray, facets: Sequence[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Per facet, ``{"valor", "total"}`` of the selected rows (most frequent first, zeros omitted)"""
+        result = {}
+        for name in facets:
+            totals = popcount(self.bitmaps[name] & selection).sum(axis=1)
+            order = np.argsort(-totals, kind="stable")
+            result[name] = [
+                {"valor": self.values[name][i], "total": int(totals[i])} for i in order if totals[i] > 0
+            ]
+        return result
+
+
+class FacetStore:
+    """
+    ``FacetBitmaps`` of ``instrumentos_parceria`` for the configured columns,
+    rebuilt (one scan of the table) when the data version changes.
+    """
+
+    def __init__(self, engine, columns: Dict[str, str], data_version):
+        self.engine = engine
+        self.columns = columns
+        self.data_version = data_version
+        self._bitmaps: Optional[FacetBitmaps] = None
+        self._version: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> FacetBitmaps:
+        version = self.data_version.current()
+        with self._lock:
+            if self._bitmaps is None or self._version != version:
+                select = ", ".join(f"{column} AS {name}" for name, column in self.columns.items())
+                with self.engine.connect() as conn:
+                    rows = conn.execute(text(f"SELECT id, {select} FROM instrumentos_parceria")).all()
+                self._bitmaps = FacetBitmaps(
+                    [row[0] for row in rows],
+                    {name: [row[n] for row in rows] for n, name in enumerate(self.columns, start=1)}
+                )
+                self._version = version
+                logger.info(f"Bitmaps de facetas carregados: {len(rows)} parcerias")
+            return self._bitmaps
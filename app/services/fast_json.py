@@ -0,0 +1,63 @@
+import datetime
+import decimal
+import json
+from typing import Any, Dict, List
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard library encoder
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Types the standard library encoder does not know (same output as orjson)"""
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def _orjson_default(value: Any) -> Any:
+        if isinstance(value, decimal.Decimal):
+            return float(value)
+        raise TypeError
+
+    def dumps(content: Any) -> bytes:
+        """UTF-8 JSON of dicts/lists of database values (dates, numpy scalars and arrays included)"""
+        return orjson.dumps(content, default=_orjson_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(content: Any) -> bytes:
+        """UTF-8 JSON of dicts/lists of database values (dates, numpy scalars and arrays included)"""
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def rows_as_dicts(result) -> List[Dict[str, Any]]:
+    """
+    Rows of a SQLAlchemy result as plain dicts, built straight from the row
+    tuples (no ``RowMapping`` objects or per-row copies).
+    """
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered by orjson (or the standard encoder when it is not installed).
+
+    Returning it from an endpoint skips FastAPI's ``response_model`` validation and
+    ``jsonable_encoder`` pass, so it is meant for content built from trusted database rows.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,299 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IVF_FORMAT = 1
+
+# Rows per block when assigning vectors to centroids (bounds the score matrix)
+ASSIGN_BLOCK_ROWS = 4096
+
+
+def write_atomic(target: Path, write: Callable[[Any], None], binary: bool = True) -> None:
+    """
+    Write ``target`` through a unique temporary file in the same directory and
+    ``os.replace`` it, so concurrent writers (several workers) never share a temp file.
+    """
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb" if binary else "w", **({} if binary else {"encoding": "utf-8"})) as f:
+            write(f)
+        os.replace(tmp, target)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.where(norms > 0, norms, 1.0)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the most similar centroid for each row"""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+        block = vectors[start:start + ASSIGN_BLOCK_ROWS]
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def spherical_kmeans(vectors: np.ndarray, nlist: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """
+    k-means on the unit sphere (cosine): centroids are normalized cluster means.
+    Empty clusters are re-seeded with random rows.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = np.array(vectors[rng.choice(len(vectors), size=nlist, replace=False)], dtype=np.float32)
+    for _ in range(iterations):
+        assignment = _assign(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=nlist)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        non_empty = counts > 0
+        sums = np.zeros_like(centroids)
+        sums[non_empty] = np.add.reduceat(vectors[order], starts[non_empty], axis=0)
+        empty = ~non_empty
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()), replace=False)]
+        updated = _normalize(sums).astype(np.float32)
+        if np.allclose(updated, centroids, atol=1e-5):
+            break
+        centroids = updated
+    return centroids
+
+
+class _IVFState(NamedTuple):
+    """Lists and pending adds, swapped as a whole so concurrent searches see a consistent view"""
+    offsets: np.ndarray
+    ids: np.ndarray
+    vectors: np.ndarray
+    delta_ids: np.ndarray
+    delta_vectors: np.ndarray
+    delta_lists: np.ndarray
+    deleted: FrozenSet[int]
+
+
+class IVFIndex:
+    """
+    Inverted-file index over normalized vectors (coarse k-means partitioning).
+
+    Vectors are stored grouped by centroid, so each inverted list is a
+    contiguous slice of ``vectors``/``ids``. A query scores the centroids and
+    then only the rows of the ``nprobe`` closest lists.
+
+    ``add`` appends to a small delta buffer (scanned with the same list filter)
+    and replaces earlier vectors of the same id; ``compact`` merges the delta
+    into the contiguous lists. ``needs_retrain`` tells when the centroids no
+    longer represent the data well enough.
+    """
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, ids: np.ndarray, vectors: np.ndarray,
+                 trained_at: Optional[float] = None, trained_count: Optional[int] = None):
+        self.centroids = centroids
+        self.trained_at = trained_at or time.time()
+        self.trained_count = len(ids) if trained_count is None else trained_count
+        self._state = _IVFState(
+            offsets, ids, vectors,
+            np.empty(0, dtype=np.int64), np.empty((0, self.dims), dtype=np.float32), np.empty(0, dtype=np.int32),
+            frozenset()
+        )
+        self._lock = threading.Lock()
+
+    @classmethod
+    def train(cls, ids: Sequence[int], vectors: np.ndarray, nlist: Optional[int] = None,
+              iterations: int = 20, sample: int = 100_000, seed: int = 0) -> "IVFIndex":
+        """
+        Train centroids on (a sample of) ``vectors`` and build the inverted lists.
+
+        ``nlist`` defaults to about 4 * sqrt(N) lists.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32)).astype(np.float32)
+        if len(vectors) == 0:
+            raise ValueError("Nenhum vetor para treinar o índice IVF")
+        nlist = min(nlist or max(1, int(4 * np.sqrt(len(vectors)))), len(vectors))
+
+        rng = np.random.default_rng(seed)
+        training = vectors if len(vectors) <= sample else vectors[rng.choice(len(vectors), size=sample, replace=False)]
+        centroids = spherical_kmeans(training, nlist, iterations=iterations, seed=seed)
+        return cls._build(centroids, ids, vectors)
+
+    @classmethod
+    def _build(cls, centroids: np.ndarray, ids: np.ndarray, vectors: np.ndarray, **kwargs) -> "IVFIndex":
+        assignment = _assign(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=len(centroids))))).astype(np.int64)
+        return cls(centroids, offsets, np.ascontiguousarray(ids[order]),
+                   np.ascontiguousarray(vectors[order]), **kwargs)
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self._state.offsets
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._state.ids
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._state.vectors
+
+    @property
+    def dims(self) -> int:
+        return self.centroids.shape[1]
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def __len__(self) -> int:
+        state = self._state
+        return len(state.ids) + len(state.delta_ids) - len(state.deleted)
+
+    @property
+    def pending(self) -> int:
+        return len(self._state.delta_ids)
+
+    def pending_items(self) -> Tuple[np.ndarray, np.ndarray]:
+        """``(ids, vectors)`` added since the last compaction"""
+        state = self._state
+        return state.delta_ids, state.delta_vectors
+
+    def items(self) -> Tuple[np.ndarray, np.ndarray]:
+        """``(ids, vectors)`` of every indexed parceria (inverted lists and pending adds)"""
+        state = self._state
+        keep = ~np.isin(state.ids, np.fromiter(state.deleted, dtype=np.int64, count=len(state.deleted)))
+        return (np.concatenate([state.ids[keep], state.delta_ids]),
+                np.concatenate([state.vectors[keep], state.delta_vectors]))
+
+    def add(self, parceria_id: int, vector: Sequence[float]) -> None:
+        """Add (or replace) the vector of ``parceria_id``"""
+        vec = _normalize(np.asarray(vector, dtype=np.float32))
+        if vec.shape != (self.dims,):
+            raise ValueError(f"Vetor com {vec.shape[-1]} dimensões; índice tem {self.dims}")
+        with self._lock:
+            state = self._state
+            keep = state.delta_ids != parceria_id
+            deleted = state.deleted | {int(parceria_id)} if parceria_id in state.ids else state.deleted
+            self._state = state._replace(
+                delta_ids=np.append(state.delta_ids[keep], np.int64(parceria_id)),
+                delta_vectors=np.vstack([state.delta_vectors[keep], vec[None, :]]),
+                delta_lists=np.append(state.delta_lists[keep], np.int32(np.argmax(self.centroids @ vec))),
+                deleted=deleted,
+            )
+
+    def compact(self) -> None:
+        """Merge pending adds into the contiguous inverted lists (same centroids)"""
+        with self._lock:
+            state = self._state
+            if not len(state.delta_ids) and not state.deleted:
+                return
+            keep = ~np.isin(state.ids, np.fromiter(state.deleted, dtype=np.int64, count=len(state.deleted)))
+            ids = np.concatenate([state.ids[keep], state.delta_ids])
+            vectors = np.concatenate([state.vectors[keep], state.delta_vectors])
+            merged = self._build(self.centroids, ids, vectors,
+                                 trained_at=self.trained_at, trained_count=self.trained_count)
+            self._state = merged._state
+
+    def needs_retrain(self, max_growth: float = 0.2, max_age_seconds: float = 0) -> bool:
+        """True when the corpus grew more than ``max_growth`` since training or the index is too old"""
+        if self.trained_count and (len(self) - self.trained_count) / self.trained_count > max_growth:
+            return True
+        return max_age_seconds > 0 and time.time() - self.trained_at > max_age_seconds
+
+    def search(self, query: Sequence[float], k: int, nprobe: int = 8,
+               allowed_ids: Optional[Sequence[int]] = None) -> List[Tuple[int, float]]:
+        """Top-k ``(parceria_id, cosine similarity)`` among the ``nprobe`` closest lists"""
+        q = np.asarray(query, dtype=np.float32)
+        q_norm = np.linalg.norm(q)
+        if k <= 0 or q_norm == 0 or len(self) == 0:
+            return []
+        q = q / q_norm
+
+        state = self._state
+        nprobe = max(1, min(nprobe, self.nlist))
+        probe = np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe]
+
+        ids_parts, score_parts = [], []
+        for c in probe:
+            start, end = state.offsets[c], state.offsets[c + 1]
+            if end > start:
+                ids_parts.append(state.ids[start:end])
+                score_parts.append(state.vectors[start:end] @ q)
+        if state.deleted and ids_parts:
+            # Rows replaced by a pending add (the delta copy is the current one)
+            ids = np.concatenate(ids_parts)
+            fresh = ~np.isin(ids, np.fromiter(state.deleted, dtype=np.int64, count=len(state.deleted)))
+            ids_parts, score_parts = [ids[fresh]], [np.concatenate(score_parts)[fresh]]
+        if len(state.delta_ids):
+            in_probe = np.isin(state.delta_lists, probe)
+            ids_parts.append(state.delta_ids[in_probe])
+            score_parts.append(state.delta_vectors[in_probe] @ q)
+        if not ids_parts:
+            return []
+
+        ids = np.concatenate(ids_parts)
+        scores = np.concatenate(score_parts)
+        if allowed_ids is not None:
+            mask = np.isin(ids, np.asarray(allowed_ids, dtype=np.int64))
+            ids, scores = ids[mask], scores[mask]
+        if len(ids) == 0:
+            return []
+
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def status(self) -> Dict[str, Any]:
+        sizes = np.diff(self.offsets)
+        return {
+            "listas": self.nlist,
+            "vetores": len(self),
+            "pendentes": self.pending,
+            "tamanho_medio_lista": round(float(sizes.mean()), 1) if len(sizes) else 0.0,
+            "tamanho_max_lista": int(sizes.max()) if len(sizes) else 0,
+            "treinado_em": self.trained_at,
+            "vetores_no_treino": self.trained_count,
+        }
+
+    def save(self, directory: str, meta: Optional[Dict[str, Any]] = None) -> None:
+        """Persist (after merging pending adds) as .npy arrays + meta.json"""
+        self.compact()
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        for name, array in (("centroides", self.centroids), ("offsets", self.offsets),
+                            ("ids", self.ids), ("vetores", self.vectors)):
+            write_atomic(path / f"{name}.npy", lambda f, array=array: np.save(f, array))
+        info = {"formato": IVF_FORMAT, "dimensoes": self.dims, "listas": self.nlist, "total": len(self.ids),
+                "treinado_em": self.trained_at, "vetores_no_treino": self.trained_count, **(meta or {})}
+        write_atomic(path / "meta.json", lambda f: json.dump(info, f), binary=False)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional[Tuple["IVFIndex", Dict[str, Any]]]:
+        """Load a persisted index and its metadata, or None when there is none"""
+        path = Path(directory)
+        if not (path / "meta.json").exists():
+            return None
+        with open(path / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("formato") != IVF_FORMAT:
+            raise ValueError(f"formato {meta.get('formato')} não suportado")
+        arrays = {name: np.load(path / f"{name}.npy") for name in ("centroides", "offsets", "ids", "vetores")}
+        if len(arrays["ids"]) != meta["total"] or arrays["offsets"][-1] != meta["total"]:
+            raise ValueError("arquivos não correspondem aos metadados (gravação em andamento?)")
+        index = cls(arrays["centroides"], arrays["offsets"], arrays["ids"], arrays["vetores"],
+                    trained_at=meta["treinado_em"], trained_count=meta["vetores_no_treino"])
+        return index, meta
@@ -0,0 +1,172 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _env_flag(name: str, default: bool = True) -> bool:
+    return os.getenv(name, "1" if default else "0").strip().lower() in {"1", "true", "yes", "on"}
+
+
+class ModelUnavailableError(RuntimeError):
+    """Raised when a model is disabled for this instance or failed to load"""
+
+
+class _LazyModel:
+    """
+    A model loaded on first use (thread-safe), with load state and timing.
+
+    After a failed load, calls fail fast for ``retry_seconds`` and then try
+    loading again (``force=True`` retries immediately).
+    """
+
+    def __init__(self, name: str, enabled: bool, loader: Callable[[], Any], retry_seconds: float = 60):
+        self.name = name
+        self.enabled = enabled
+        self.retry_seconds = retry_seconds
+        self._loader = loader
+        self._model = None
+        self._lock = threading.Lock()
+        self.loading = False
+        self.load_time: Optional[float] = None
+        self.error: Optional[str] = None
+        self._failed_at: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def get(self, force: bool = False) -> Any:
+        if self._model is not None:
+            return self._model
+        if not self.enabled:
+            raise ModelUnavailableError(f"Modelo {self.name} desabilitado nesta instância.")
+        with self._lock:
+            if self._model is None:
+                if (not force and self._failed_at is not None
+                        and time.monotonic() - self._failed_at < self.retry_seconds):
+                    raise ModelUnavailableError(f"Modelo {self.name} indisponível: {self.error}")
+                self.loading = True
+                start = time.perf_counter()
+                try:
+                    self._model = self._loader()
+                    self.load_time = time.perf_counter() - start
+                    self.error = None
+                    self._failed_at = None
+                    logger.info(f"Modelo {self.name} carregado em {self.load_time:.2f}s")
+                except Exception as e:
+                    self.error = str(e)
+                    self._failed_at = time.monotonic()
+                    logger.error(f"Falha ao carregar modelo {self.name}: {e}", exc_info=True)
+                    raise ModelUnavailableError(f"Modelo {self.name} indisponível: {e}") from e
+                finally:
+                    self.loading = False
+        return self._model
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "modelo": self.name,
+            "habilitado": self.enabled,
+            "carregado": self.loaded,
+            "carregando": self.loading,
+            "tempo_carga_s": round(self.load_time, 3) if self.load_time is not None else None,
+            "erro": self.error,
+        }
+
+
+class ModelRegistry:
+    """
+    Lazily loaded NLP models, enabled per instance role.
+
+    ``HUB_ENABLE_NLP`` controls the spaCy model (document extraction, spaCy
+    vectors) and ``HUB_ENABLE_EMBEDDINGS`` the SentenceTransformer (semantic
+    search). Read-only replicas can disable both and boot without importing
+    spaCy or torch. Models load on first use or through ``warmup()``; failed
+    loads are retried after ``HUB_MODEL_RETRY_S`` seconds or on the next warmup.
+    A failed SentenceTransformer only degrades semantic search (spaCy fallback),
+    so the instance stays ready.
+    """
+
+    def __init__(self, spacy_model: str, sentence_model: str,
+                 enable_nlp: Optional[bool] = None, enable_embeddings: Optional[bool] = None):
+        retry_seconds = float(os.getenv("HUB_MODEL_RETRY_S", "60"))
+        self.nlp = _LazyModel(
+            spacy_model,
+            _env_flag("HUB_ENABLE_NLP") if enable_nlp is None else enable_nlp,
+            lambda: self._load_spacy(spacy_model),
+            retry_seconds
+        )
+        self.embeddings = _LazyModel(
+            sentence_model,
+            _env_flag("HUB_ENABLE_EMBEDDINGS") if enable_embeddings is None else enable_embeddings,
+            lambda: self._load_sentence_transformer(sentence_model),
+            retry_seconds
+        )
+        self.warmup_requested = False
+        self.warmup_done = False
+
+    @staticmethod
+    def _load_spacy(model_name: str):
+        from app.services.document_processor import load_ner_model
+        return load_ner_model(model_name)
+
+    @staticmethod
+    def _load_sentence_transformer(model_name: str):
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+
+    def get_nlp(self):
+        """spaCy model (only NER enabled); raises ModelUnavailableError if disabled"""
+        return self.nlp.get()
+
+    def get_sentence_model(self):
+        """SentenceTransformer, or None when disabled/unavailable (callers fall back to spaCy)"""
+        if not self.embeddings.enabled:
+            return None
+        try:
+            return self.embeddings.get()
+        except ModelUnavailableError:
+            return None
+
+    def warmup(self, background: bool = False) -> None:
+        """Load every enabled model now (optionally in a background thread), retrying failed ones"""
+        self.warmup_requested = True
+        self.warmup_done = False
+
+        def _run():
+            for model in (self.nlp, self.embeddings):
+                if model.enabled:
+                    try:
+                        model.get(force=True)
+                    except ModelUnavailableError:
+                        pass
+            self.warmup_done = True
+
+        if background:
+            threading.Thread(target=_run, name="model-warmup", daemon=True).start()
+        else:
+            _run()
+
+    def ready(self) -> bool:
+        """
+        Ready when a requested warmup finished and spaCy (if enabled) did not fail to
+        load; a failed SentenceTransformer only makes the instance degraded.
+        """
+        if self.warmup_requested and not self.warmup_done:
+            return False
+        return not (self.nlp.enabled and self.nlp.error)
+
+    def degraded(self) -> bool:
+        """Semantic search running on the spaCy fallback because the SentenceTransformer failed"""
+        return bool(self.embeddings.enabled and self.embeddings.error)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "pronto": self.ready(),
+            "degradado": self.degraded(),
+            "warmup": "concluido" if self.warmup_done else ("em_andamento" if self.warmup_requested else "nao_solicitado"),
+            "modelos": {"nlp": self.nlp.status(), "embeddings": self.embeddings.status()},
+        }
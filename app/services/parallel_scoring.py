@@ -0,0 +1,77 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def _local_top_k(vectors: np.ndarray, q: np.ndarray, k: int, start: int, end: int,
+                 rows: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k positions (in ``rows`` or ``vectors``) and scores of one shard"""
+    block = vectors[start:end] if rows is None else vectors[rows[start:end]]
+    scores = block @ q
+    if len(scores) > k:
+        best = np.argpartition(-scores, k - 1)[:k]
+        return best + start, scores[best]
+    return np.arange(start, end), scores
+
+
+class ShardedScorer:
+    """
+    Exact cosine top-k over a normalized matrix, split into row shards scored
+    concurrently.
+
+    NumPy releases the GIL inside the matrix-vector product, so each thread of
+    the pool scans its shard on its own core and keeps a local top-k; the
+    ``threads * k`` candidates are merged at the end. Matrices smaller than
+    ``min_rows`` are scored in the calling thread. The default is a single
+    thread: every API worker process gets its own scorer, so pools sized to
+    the CPU count would oversubscribe the machine.
+    """
+
+    def __init__(self, threads: int = 1, min_rows: int = 50_000):
+        self.threads = max(1, threads)
+        self.min_rows = min_rows
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="vector-shard")
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def top_k(self, vectors: np.ndarray, q: np.ndarray, k: int,
+              rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Best ``k`` rows for the normalized query ``q``, best first.
+
+        Returns ``(row indices into vectors, scores)``; with ``rows`` only those
+        rows are scored.
+        """
+        n = len(vectors) if rows is None else len(rows)
+        k = min(k, n)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        if self.threads <= 1 or n < self.min_rows:
+            positions, scores = _local_top_k(vectors, q, k, 0, n, rows)
+        else:
+            bounds = np.linspace(0, n, self.threads + 1).astype(np.int64)
+            executor = self._get_executor()
+            futures = [executor.submit(_local_top_k, vectors, q, k, int(a), int(b), rows)
+                       for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+            parts = [f.result() for f in futures]
+            positions = np.concatenate([p for p, _ in parts])
+            scores = np.concatenate([s for _, s in parts])
+
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.lexsort((positions[best], -scores[best]))]
+        positions, scores = positions[best], scores[best]
+        return (positions if rows is None else rows[positions]), scores
@@ -0,0 +1,121 @@
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from PyPDF2 import PdfReader, PdfWriter
+
+logger = logging.getLogger(__name__)
+
+# Documents with at least this many pages are extracted in a process pool
+PARALLEL_MIN_PAGES = int(os.getenv("HUB_PDF_PARALLEL_MIN_PAGES", "24"))
+# Number of pool workers (0 = one per CPU) and pages handled by each task
+PAGE_WORKERS = int(os.getenv("HUB_PDF_PAGE_WORKERS", "0")) or (os.cpu_count() or 2)
+PAGES_PER_TASK = int(os.getenv("HUB_PDF_PAGES_PER_TASK", "4"))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Lazily create the shared page-extraction pool (spawn: safe inside threaded servers)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=PAGE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _extract_pages(content: bytes) -> List[str]:
+    """Pool task: extract the text of every page of a (small) PDF"""
+    reader = PdfReader(io.BytesIO(content))
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def _page_range_pdf(reader: PdfReader, start: int, stop: int) -> bytes:
+    """Pages [start, stop) copied into a standalone PDF (only their objects are sent to the pool)"""
+    writer = PdfWriter()
+    for i in range(start, stop):
+        writer.add_page(reader.pages[i])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def iter_page_texts(reader: PdfReader) -> Iterator[str]:
+    """Yield the text of each page, in order, as it is extracted"""
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+def iter_page_texts_parallel(reader: PdfReader) -> Iterator[str]:
+    """
+    Yield page texts in order while a process pool extracts them ahead.
+
+    Each task receives a small PDF with just its ``PAGES_PER_TASK`` pages, so
+    the full document is neither re-sent nor re-parsed per task. Only
+    ``PAGE_WORKERS`` tasks are kept in flight, so when the consumer stops
+    early the remaining pages are never submitted.
+    """
+    num_pages = len(reader.pages)
+    executor = _get_executor()
+    ranges = deque((start, min(start + PAGES_PER_TASK, num_pages)) for start in range(0, num_pages, PAGES_PER_TASK))
+    in_flight = deque()
+    try:
+        while ranges or in_flight:
+            while ranges and len(in_flight) < PAGE_WORKERS:
+                start, stop = ranges.popleft()
+                in_flight.append(executor.submit(_extract_pages, _page_range_pdf(reader, start, stop)))
+            for page_text in in_flight.popleft().result():
+                yield page_text
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+def extract_text(
+    content: bytes,
+    is_complete: Optional[Callable[[str], bool]] = None,
+    parallel: bool = True
+) -> Tuple[str, int]:
+    """
+    Extract the text of a PDF page by page.
+
+    Args:
+        content: Raw bytes of the PDF file
+        is_complete: Called with the text of each new page, in order (keep any
+            state needed across pages in the callable, so each check only scans
+            the new text); when it returns True the remaining pages are skipped
+        parallel: Allow the process-pool mode for heavy documents
+
+    Returns:
+        Tuple (text of the pages read, number of pages read)
+    """
+    reader = PdfReader(io.BytesIO(content))
+    num_pages = len(reader.pages)
+
+    if parallel and num_pages >= PARALLEL_MIN_PAGES and PAGE_WORKERS > 1:
+        pages = iter_page_texts_parallel(reader)
+    else:
+        pages = iter_page_texts(reader)
+
+    parts: List[str] = []
+    try:
+        for page_text in pages:
+            parts.append(page_text)
+            if is_complete is not None and is_complete(page_text):
+                break
+    finally:
+        pages.close()
+    text = "".join(parts)
+
+    if len(parts) < num_pages:
+        logger.info(f"Extração encerrada antecipadamente: {len(parts)}/{num_pages} páginas lidas")
+    return text, len(parts)
@@ -0,0 +1,84 @@
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    """L2-normalize the last axis (zero vectors stay zero)"""
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.where(norms == 0, 1, norms)
+
+
+class PCAProjection:
+    """
+    Linear PCA projection of embeddings to fewer dimensions.
+
+    Fit and transform both L2-normalize their input first: the fit runs on the
+    normalized vectors of the search matrix, and raw model outputs (queries,
+    new parcerias) must be centered by the same mean.
+
+    ``version`` identifies the fitted matrix (dimensions + content hash) and is
+    stored next to every projected vector, so vectors and queries projected by
+    different fits are never compared.
+    """
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, explained_variance: np.ndarray,
+                 source_model: Optional[str] = None):
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)
+        self.explained_variance = explained_variance.astype(np.float32)
+        self.source_model = source_model
+        digest = hashlib.sha1(self.mean.tobytes() + self.components.tobytes()).hexdigest()[:12]
+        self.version = f"pca{self.dims}-{digest}"
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, dims: int, source_model: Optional[str] = None) -> "PCAProjection":
+        """Fit on ``vectors`` (rows, normalized here) keeping the ``dims`` principal components"""
+        x = _normalize(np.asarray(vectors, dtype=np.float64))
+        if dims <= 0 or dims > min(x.shape):
+            raise ValueError(f"dims deve estar entre 1 e {min(x.shape)} (vetores: {x.shape})")
+        mean = x.mean(axis=0)
+        _, s, vt = np.linalg.svd(x - mean, full_matrices=False)
+        variance = s ** 2
+        return cls(mean, vt[:dims], variance[:dims] / variance.sum(), source_model)
+
+    @property
+    def dims(self) -> int:
+        return self.components.shape[0]
+
+    @property
+    def input_dims(self) -> int:
+        return self.components.shape[1]
+
+    def transform(self, vectors) -> np.ndarray:
+        """Project one vector (1-D) or a batch (rows), normalized first, to ``dims`` dimensions"""
+        x = np.asarray(vectors, dtype=np.float32)
+        if x.shape[-1] != self.input_dims:
+            raise ValueError(f"Projeção {self.version} espera {self.input_dims} dimensões, recebeu {x.shape[-1]}")
+        return (_normalize(x) - self.mean) @ self.components.T
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "versao": self.version,
+            "dimensoes": self.dims,
+            "dimensoes_origem": self.input_dims,
+            "variancia_explicada": round(float(self.explained_variance.sum()), 4),
+            "modelo": self.source_model,
+        }
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            np.savez(f, mean=self.mean, components=self.components,
+                     explained_variance=self.explained_variance,
+                     meta=np.array(json.dumps({"modelo": self.source_model, "versao": self.version})))
+
+    @classmethod
+    def load(cls, path: str) -> "PCAProjection":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            projection = cls(data["mean"], data["components"], data["explained_variance"], meta.get("modelo"))
+        if projection.version != meta.get("versao"):
+            raise ValueError(f"Arquivo de projeção corrompido: {path}")
+        return projection
@@ -0,0 +1,109 @@
+from typing import Callable, Optional
+
+import numpy as np
+
+QUANTIZATION_KINDS = ("none", "int8", "binary")
+
+# Rows upcast to float32 per block when scanning int8 codes (keeps the temporary in cache)
+SCAN_BLOCK_ROWS = 1024
+
+# Set bits per byte, for NumPy versions without np.bitwise_count (< 2.0)
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+
+
+def popcount(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    return _POPCOUNT[x.view(np.uint8)].reshape(*x.shape, x.itemsize).sum(axis=-1)
+
+
+class Int8Index:
+    """
+    Scalar int8 codes of a normalized float32 matrix (4x smaller).
+
+    Each dimension is scaled symmetrically by its maximum absolute value, so the
+    approximate score of a row is ``codes @ (scale * query)``.
+    """
+
+    kind = "int8"
+
+    def __init__(self, codes: np.ndarray, scale: np.ndarray):
+        self.codes = codes
+        self.scale = scale
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, allocate: Callable = np.empty) -> "Int8Index":
+        scale = np.abs(vectors).max(axis=0) / 127.0 if len(vectors) else np.ones(vectors.shape[1], dtype=np.float32)
+        scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+        codes = allocate(vectors.shape, np.int8)
+        for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+            block = vectors[start:start + SCAN_BLOCK_ROWS]
+            codes[start:start + len(block)] = np.clip(np.rint(block / scale), -127, 127)
+        return cls(codes, scale)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes + self.scale.nbytes)
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate scores for ``rows`` (all rows when None)"""
+        q = (query * self.scale).astype(np.float32)
+        codes = self.codes if rows is None else self.codes[rows]
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCAN_BLOCK_ROWS):
+            block = codes[start:start + SCAN_BLOCK_ROWS]
+            out[start:start + len(block)] = block.astype(np.float32) @ q
+        return out
+
+
+class BinaryIndex:
+    """
+    Sign-bit codes packed 8 dimensions per byte (32x smaller).
+
+    Rows are ranked by Hamming distance to the query's sign bits (XOR + popcount
+    over 64-bit words); scores are negated distances, so higher is better as
+    with cosine.
+    """
+
+    kind = "binary"
+
+    def __init__(self, codes: np.ndarray):
+        self.codes = codes
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, allocate: Callable = np.empty) -> "BinaryIndex":
+        # Rows padded to whole 64-bit words (padding bits are zero in rows and query)
+        words = (vectors.shape[1] + 63) // 64
+        codes = allocate((len(vectors), words), np.uint64)
+        packed = codes.view(np.uint8).reshape(len(vectors), words * 8)
+        for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+            block = vectors[start:start + SCAN_BLOCK_ROWS]
+            bits = np.packbits(block > 0, axis=1)
+            packed[start:start + len(block)] = 0
+            packed[start:start + len(block), :bits.shape[1]] = bits
+        return cls(codes)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes)
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Negated Hamming distances for ``rows`` (all rows when None)"""
+        q = np.zeros(self.codes.shape[1] * 8, dtype=np.uint8)
+        bits = np.packbits(query > 0)
+        q[:len(bits)] = bits
+        q = q.view(np.uint64)
+        codes = self.codes if rows is None else self.codes[rows]
+        distances = popcount(np.bitwise_xor(codes, q)).sum(axis=1, dtype=np.int32)
+        return -distances.astype(np.float32)
+
+
+def build_index(kind: str, vectors: np.ndarray, allocate: Callable = np.empty):
+    """Quantized index of ``kind`` for ``vectors``, or None for ``"none"``"""
+    if kind not in QUANTIZATION_KINDS:
+        raise ValueError(f"Quantização desconhecida: {kind} (use {', '.join(QUANTIZATION_KINDS)})")
+    if kind == "int8":
+        return Int8Index.build(vectors, allocate)
+    if kind == "binary":
+        return BinaryIndex.build(vectors, allocate)
+    return None
@@ -0,0 +1,207 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.services.fast_json import dumps
+from app.services.result_cache import DataVersion
+
+logger = logging.getLogger(__name__)
+
+# Disk hits whose access times are written in one batch
+ACCESS_FLUSH_SIZE = 256
+# Puts between two row counts of the shared store
+EVICTION_CHECK_INTERVAL = 256
+# The shared store is trimmed back to max_disk_entries once it passes this fraction above it
+HIGH_WATER_RATIO = 1.1
+
+
+class RecordCache:
+    """
+    Read-through LRU cache of single parceria rows keyed by id.
+
+    Entries are tagged with the data version they were read at, so any write
+    recorded in ``versao_dados`` (API creates, bulk inserts, imports) drops them.
+    With ``path`` a SQLite file shared by the worker processes backs the
+    in-memory LRU: a row read by one worker is served by the others without a
+    database round trip. The shared store is only used while ``versao_dados``
+    can be read, since it is what tells the other processes that rows changed.
+    Access times of shared rows are written in batches and the shared store is
+    only trimmed (least recently used first) once it passes a high-water mark.
+    ``max_entries=0`` disables the cache.
+    """
+
+    def __init__(self, data_version: DataVersion, max_entries: int = 4096,
+                 path: Optional[str] = None, max_disk_entries: int = 50_000):
+        self.data_version = data_version
+        self.max_entries = max_entries
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Tuple[Dict[str, Any], Tuple[int, int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_version: Optional[int] = None
+        self._accessed: Dict[int, float] = {}
+        self._puts_since_check = 0
+
+        if self.enabled and path:
+            try:
+                self._connect()
+            except sqlite3.Error as e:
+                logger.warning(f"Cache compartilhado de parcerias desabilitado ({path}): {e}")
+                self._conn = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _connect(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS parcerias (
+                id INTEGER PRIMARY KEY,
+                versao INTEGER NOT NULL,
+                registro TEXT NOT NULL,
+                ultimo_acesso REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS parcerias_acesso_idx ON parcerias (ultimo_acesso)")
+        self._conn.commit()
+
+    def _disk_get(self, record_id: int, shared: int) -> Optional[Dict[str, Any]]:
+        try:
+            row = self._conn.execute(
+                "SELECT registro FROM parcerias WHERE id = ? AND versao = ?", (record_id, shared)
+            ).fetchone()
+            if row is None:
+                return None
+            self._accessed[record_id] = time.time()
+            if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+                self._flush_access()
+                self._conn.commit()
+            return json.loads(row[0])
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao ler cache compartilhado de parcerias: {e}")
+            return None
+
+    def _flush_access(self) -> None:
+        """Write the pending access times of disk hits (the caller commits)"""
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE parcerias SET ultimo_acesso = ? WHERE id = ?",
+                [(accessed, record_id) for record_id, accessed in self._accessed.items()]
+            )
+            self._accessed.clear()
+
+    def _evict_if_needed(self) -> None:
+        """Every ``EVICTION_CHECK_INTERVAL`` puts, trim the store if it passed the high-water mark"""
+        self._puts_since_check += 1
+        if self._puts_since_check < EVICTION_CHECK_INTERVAL:
+            return
+        self._puts_since_check = 0
+        count = self._conn.execute("SELECT COUNT(*) FROM parcerias").fetchone()[0]
+        if count <= self.max_disk_entries * HIGH_WATER_RATIO:
+            return
+        self._flush_access()
+        self._conn.execute("""
+            DELETE FROM parcerias WHERE id IN (
+                SELECT id FROM parcerias
+                ORDER BY ultimo_acesso
+                LIMIT ?
+            )
+        """, (count - self.max_disk_entries,))
+
+    def _disk_put(self, record_id: int, record: Dict[str, Any], shared: int) -> None:
+        try:
+            if self._disk_version != shared:
+                # Rows of older data versions can no longer be served by any process
+                self._conn.execute("DELETE FROM parcerias WHERE versao < ?", (shared,))
+                self._disk_version = shared
+                self._accessed.clear()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO parcerias (id, versao, registro, ultimo_acesso) VALUES (?, ?, ?, ?)",
+                (record_id, shared, dumps(record).decode("utf-8"), time.time())
+            )
+            self._evict_if_needed()
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao gravar cache compartilhado de parcerias: {e}")
+
+    def get_or_load(self, record_id: int, load: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        Cached row of ``record_id``, or ``load()`` stored under the data version read
+        before loading. Missing rows (``load()`` returning None) are not cached.
+        """
+        if not self.enabled:
+            return load()
+        version = self.data_version.current()
+        shared_store = self._conn is not None and self.data_version.available
+        with self._lock:
+            entry = self._entries.get(record_id)
+            if entry is not None and entry[1] == version:
+                self._entries.move_to_end(record_id)
+                self.hits += 1
+                return entry[0]
+            record = self._disk_get(record_id, version[0]) if shared_store else None
+            if record is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+
+        if record is None:
+            record = load()
+            if record is None:
+                return None
+            if shared_store:
+                with self._lock:
+                    self._disk_put(record_id, record, version[0])
+        with self._lock:
+            self._entries[record_id] = (record, version)
+            self._entries.move_to_end(record_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return record
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._accessed.clear()
+            if self._conn is not None:
+                try:
+                    self._conn.execute("DELETE FROM parcerias")
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Falha ao limpar cache compartilhado de parcerias: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of this process plus the current sizes"""
+        total = self.hits + self.disk_hits + self.misses
+        disk_entries = 0
+        if self._conn is not None:
+            with self._lock:
+                try:
+                    disk_entries = self._conn.execute("SELECT COUNT(*) FROM parcerias").fetchone()[0]
+                except sqlite3.Error:
+                    disk_entries = 0
+        return {
+            "habilitado": self.enabled,
+            "hits": self.hits,
+            "hits_compartilhado": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / total, 4) if total else 0.0,
+            "entradas": len(self._entries),
+            "max_entradas": self.max_entries,
+            "compartilhado": self._conn is not None and self.data_version.available,
+            "entradas_compartilhado": disk_entries,
+        }
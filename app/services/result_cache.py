@@ -0,0 +1,162 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Increments the shared data version (migration 20251110_add_versao_dados). Run after
+# every write that changes what searches or statistics return.
+BUMP_DATA_VERSION_SQL = "UPDATE versao_dados SET versao = versao + 1, atualizado_em = now()"
+
+
+def bump_data_version(conn) -> bool:
+    """
+    Bump the data version through a SQLAlchemy connection/session and commit.
+
+    Used by scripts that write to the database; returns False (and rolls back)
+    when the table does not exist yet, so a missing migration never breaks a job.
+    """
+    try:
+        conn.execute(text(BUMP_DATA_VERSION_SQL))
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        logger.warning(f"Não foi possível atualizar versao_dados: {e}")
+        return False
+
+
+class DataVersion:
+    """
+    Data-version counter shared by all processes (single row of ``versao_dados``).
+
+    Writers bump it after committing; readers re-read it at most every
+    ``check_seconds``, so every worker notices a change within that interval
+    (immediately in the process that made the write). While the table cannot
+    be read only local writes are seen.
+    """
+
+    def __init__(self, engine, check_seconds: float = 1.0):
+        self.engine = engine
+        self.check_seconds = check_seconds
+        self._value = 0
+        self._local = 0
+        self._checked_at = 0.0
+        self._warned = False
+        self._available = False
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """Whether the last read of ``versao_dados`` succeeded (the shared version is meaningful)"""
+        return self._available
+
+    def current(self) -> Tuple[int, int]:
+        """Current ``(shared, local)`` version pair"""
+        with self._lock:
+            if time.monotonic() - self._checked_at >= self.check_seconds:
+                try:
+                    with self.engine.connect() as conn:
+                        self._value = conn.execute(text("SELECT versao FROM versao_dados")).scalar_one()
+                    self._warned = False
+                    self._available = True
+                except Exception as e:
+                    self._available = False
+                    if not self._warned:
+                        logger.warning(f"versao_dados indisponível; invalidação apenas local: {e}")
+                        self._warned = True
+                self._checked_at = time.monotonic()
+            return self._value, self._local
+
+    def bump(self) -> None:
+        """Record a committed write (locally and, when possible, for the other processes)"""
+        with self._lock:
+            self._local += 1
+            self._checked_at = 0.0
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text(BUMP_DATA_VERSION_SQL))
+        except Exception as e:
+            logger.warning(f"Não foi possível atualizar versao_dados: {e}")
+
+
+class ResultCache:
+    """
+    In-memory LRU cache of endpoint results with TTL.
+
+    Entries remember the data version they were computed at and are discarded
+    once it changes, so results are recomputed only when the underlying data
+    actually changed (or ``ttl_seconds`` elapsed). ``max_entries=0`` disables it.
+    """
+
+    def __init__(self, data_version: DataVersion, max_entries: int = 1024, ttl_seconds: float = 300):
+        self.data_version = data_version
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[Any, Tuple[int, int], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(endpoint: str, **params) -> str:
+        """Key from the endpoint name and its parameters (strings with collapsed whitespace)"""
+        normalized = {
+            name: " ".join(value.split()) if isinstance(value, str) else value
+            for name, value in params.items()
+        }
+        return f"{endpoint}:{json.dumps(normalized, sort_keys=True, ensure_ascii=False)}"
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """
+        Cached result for ``key``, or ``compute()`` stored under the data version
+        read before computing (a write during the computation invalidates it).
+        """
+        if not self.enabled:
+            return compute()
+        version = self.data_version.current()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == version and entry[2] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = compute()
+        with self._lock:
+            self._entries[key] = (value, version, now + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of this process plus the current size"""
+        total = self.hits + self.misses
+        shared, local = self.data_version.current()
+        return {
+            "habilitado": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entradas": len(self._entries),
+            "max_entradas": self.max_entries,
+            "ttl_s": self.ttl_seconds,
+            "versao_dados": shared,
+            "escritas_locais": local,
+        }
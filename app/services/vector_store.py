@@ -0,0 +1,671 @@
+import json
+import logging
+import mmap
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from app.services.ivf_index import IVFIndex, write_atomic
+from app.services.parallel_scoring import ShardedScorer
+from app.services.quantization import build_index
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per matrix-matrix product in batched searches (bounds the rows x queries block)
+BATCH_BLOCK_ROWS = 65536
+
+# Scorer used by matrices without a configured one (single thread)
+_SERIAL_SCORER = ShardedScorer(threads=1)
+
+# Embedding column per semantic search version (v3 falls back to v2, as in the SQL path);
+# v3r holds v3 reduced by a PCA projection, valid only for the projection version stored with it
+VECTOR_COLUMNS = {"v2": "objeto_vetor_v2", "v3": "objeto_vetor_v3", "v3r": "objeto_vetor_v3r"}
+VECTOR_FALLBACKS = {"v3": "objeto_vetor_v2"}
+PROJECTION_COLUMNS = {"v3r": "projecao_v3r"}
+
+# On-disk snapshot layout: <directory>/<version>/{vetores.npy, ids.npy, meta.json}
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_VECTORS = "vetores.npy"
+SNAPSHOT_IDS = "ids.npy"
+SNAPSHOT_META = "meta.json"
+
+
+def vector_expression(version: str, alias: str = "dv") -> str:
+    """SQL expression of the embedding for ``version``, with its fallback column"""
+    column = f"{alias}.{VECTOR_COLUMNS[version]}"
+    fallback = VECTOR_FALLBACKS.get(version)
+    return f"COALESCE({column}, {alias}.{fallback})" if fallback else column
+
+
+def _vectors_sql(version: str, select: str, where: str = "") -> str:
+    """One embedding per parceria (same dedup/fallback as the SQL search path)"""
+    vector = vector_expression(version)
+    if version in PROJECTION_COLUMNS:
+        where = f"AND dv.{PROJECTION_COLUMNS[version]} = :projecao {where}"
+    return f"""
+        SELECT DISTINCT ON (dv.parceria_id) dv.parceria_id, {select.format(vector=vector)}
+        FROM documento_vetores dv
+        JOIN instrumentos_parceria p ON p.id = dv.parceria_id
+        WHERE {vector} IS NOT NULL {where}
+        ORDER BY dv.parceria_id, dv.id
+    """
+
+
+def read_data_version(engine) -> Optional[int]:
+    """Current ``versao_dados`` value, or None when the table cannot be read"""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT versao FROM versao_dados")).scalar_one()
+    except Exception:
+        return None
+
+
+def database_fingerprint(conn, version: str, projection: Optional[str] = None) -> Dict[str, int]:
+    """Count and highest parceria id of the vectors of ``version`` in the database"""
+    total, max_id = conn.execute(
+        text(f"SELECT COUNT(*), COALESCE(MAX(parceria_id), 0) FROM ({_vectors_sql(version, '1 AS presente')}) AS v"),
+        {"projecao": projection}
+    ).one()
+    return {"total_banco": int(total), "max_id_banco": int(max_id)}
+
+
+def shared_array(shape: Tuple[int, ...], dtype) -> np.ndarray:
+    """
+    Allocate a NumPy array backed by an anonymous shared mapping.
+
+    Pages of an anonymous ``mmap`` are MAP_SHARED: when the array is filled in
+    the master before the server forks its workers, every worker maps the same
+    physical pages instead of receiving a copy-on-write duplicate.
+    """
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    if nbytes == 0:
+        return np.empty(shape, dtype=dtype)
+    buffer = mmap.mmap(-1, nbytes)
+    # np.frombuffer keeps a reference to the mmap, so it lives as long as the array
+    return np.frombuffer(buffer, dtype=dtype).reshape(shape)
+
+
+class VectorMatrix:
+    """
+    L2-normalized float32 embedding matrix with its parceria ids.
+
+    Cosine similarity against the whole corpus is a single matrix-vector product.
+    """
+
+    def __init__(self, ids: np.ndarray, vectors: np.ndarray, source: str = "banco"):
+        self.ids = ids
+        self.vectors = vectors
+        self.source = source
+        self.loaded_at = time.time()
+        # Optional quantized codes scanned first; the best ``rerank`` rows are rescored exactly
+        self.index = None
+        self.rerank = 0
+        # Exact scoring, optionally sharded across threads (set by VectorStore)
+        self.scorer: Optional[ShardedScorer] = None
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Tuple[int, Sequence[float]]]) -> "VectorMatrix":
+        """Build the matrix in shared memory from ``(parceria_id, vector)`` rows"""
+        rows = [(pid, vec) for pid, vec in rows if vec is not None and len(vec)]
+        dims = len(rows[0][1]) if rows else 0
+        rows = [(pid, vec) for pid, vec in rows if len(vec) == dims]
+
+        ids = shared_array((len(rows),), np.int64)
+        vectors = shared_array((len(rows), dims), np.float32)
+        for i, (pid, vec) in enumerate(rows):
+            ids[i] = pid
+            vectors[i] = vec
+
+        # Normalize once so scoring is a plain dot product; zero vectors are dropped
+        norms = np.linalg.norm(vectors, axis=1) if len(rows) else np.empty(0, dtype=np.float32)
+        keep = norms > 0
+        if not keep.all():
+            kept_ids = shared_array((int(keep.sum()),), np.int64)
+            kept_vectors = shared_array((int(keep.sum()), dims), np.float32)
+            kept_ids[:] = ids[keep]
+            kept_vectors[:] = vectors[keep]
+            ids, vectors, norms = kept_ids, kept_vectors, norms[keep]
+        vectors /= norms[:, None]
+        return cls(ids, vectors)
+
+    @property
+    def dims(self) -> int:
+        return self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def quantize(self, kind: str, rerank: int = 200) -> "VectorMatrix":
+        """Build int8/binary codes (in shared memory) for a first-pass scan"""
+        self.index = build_index(kind, self.vectors, allocate=shared_array)
+        self.rerank = rerank
+        return self
+
+    def search(self, query: Sequence[float], k: int,
+               allowed_ids: Optional[Sequence[int]] = None, exact: bool = False) -> List[Tuple[int, float]]:
+        """
+        Top-k ``(parceria_id, cosine similarity)`` for ``query``, best first.
+
+        With a quantized index, the compressed codes are scanned first and only
+        the best ``rerank`` candidates are scored with the float vectors.
+
+        Args:
+            query: Query embedding (same dimensionality as the matrix)
+            k: Number of results
+            allowed_ids: Restrict the ranking to these ids (e.g. SQL filters)
+            exact: Skip the quantized first pass
+        """
+        q = np.asarray(query, dtype=np.float32)
+        q_norm = np.linalg.norm(q)
+        if k <= 0 or len(self) == 0 or q_norm == 0:
+            return []
+        q = q / q_norm
+
+        rows = None
+        if allowed_ids is not None:
+            rows = np.flatnonzero(np.isin(self.ids, np.asarray(allowed_ids, dtype=np.int64)))
+            if len(rows) == 0:
+                return []
+        n = len(self) if rows is None else len(rows)
+
+        shortlist = max(self.rerank, k)
+        if self.index is not None and not exact and n > shortlist:
+            approx = self.index.scores(q, rows)
+            best = np.argpartition(-approx, shortlist - 1)[:shortlist]
+            rows = best if rows is None else rows[best]
+
+        row_ids, scores = (self.scorer or _SERIAL_SCORER).top_k(self.vectors, q, k, rows)
+        return [(int(self.ids[r]), float(score)) for r, score in zip(row_ids, scores)]
+
+    def search_batch(self, queries: Sequence[Sequence[float]], ks: Sequence[int],
+                     allowed_ids: Optional[Sequence[Optional[Sequence[int]]]] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Exact top-k for several queries with one matrix-matrix product per block of rows.
+
+        Args:
+            queries: Query embeddings (one per row)
+            ks: Number of results per query
+            allowed_ids: Per-query id restriction (None entries are unrestricted)
+        """
+        Q = np.asarray(queries, dtype=np.float32).reshape(len(ks), -1)
+        norms = np.linalg.norm(Q, axis=1)
+        Q = Q / np.where(norms > 0, norms, 1.0)[:, None]
+        masks = [
+            None if allowed is None else np.isin(self.ids, np.asarray(allowed, dtype=np.int64))
+            for allowed in (allowed_ids or [None] * len(ks))
+        ]
+        active = [j for j, k in enumerate(ks) if k > 0 and norms[j] > 0 and len(self)]
+        candidates = {j: ([], []) for j in active}
+
+        for start in range(0, len(self) if active else 0, BATCH_BLOCK_ROWS):
+            block = self.vectors[start:start + BATCH_BLOCK_ROWS] @ Q[active].T
+            for col, j in enumerate(active):
+                scores = block[:, col]
+                positions = np.arange(start, start + len(scores))
+                if masks[j] is not None:
+                    keep = masks[j][start:start + len(scores)]
+                    scores, positions = scores[keep], positions[keep]
+                if len(scores) > ks[j]:
+                    best = np.argpartition(-scores, ks[j] - 1)[:ks[j]]
+                    scores, positions = scores[best], positions[best]
+                candidates[j][0].append(positions)
+                candidates[j][1].append(scores)
+
+        results: List[List[Tuple[int, float]]] = [[] for _ in ks]
+        for j, (positions, scores) in candidates.items():
+            positions, scores = np.concatenate(positions), np.concatenate(scores)
+            order = np.lexsort((positions, -scores))[:ks[j]]
+            results[j] = [(int(self.ids[positions[i]]), float(scores[i])) for i in order]
+        return results
+
+
+class VectorStore:
+    """
+    In-process embedding matrices per semantic search version, loaded from
+    ``documento_vetores``.
+
+    Matrices load on first use (or via ``preload``) and are reloaded after
+    ``reload_seconds`` so that embedding jobs become visible without a restart.
+    When ``snapshot_dir`` holds a snapshot for the version (see
+    ``build_snapshot``) it is memory-mapped instead of querying the database.
+    ``quantization`` (``int8``/``binary``) adds compressed codes for a first-pass
+    scan, re-ranked exactly over the best ``rerank`` candidates. ``projection``
+    is the PCA version whose reduced vectors (v3r) are loaded.
+
+    ``ivf`` returns an IVF index per version, loaded from ``ivf_dir`` or trained
+    from the matrix and persisted there. New vectors are added with ``add``; the
+    index is retrained in the background once it grows by ``ivf_max_growth`` or
+    is older than ``ivf_retrain_seconds``.
+
+    Exact scans of matrices with at least ``parallel_min_rows`` rows are split
+    into shards scored by ``threads`` threads (default 1).
+
+    With ``data_version`` each matrix/index remembers the data version it was
+    loaded at; ``current`` returns None once a write (in any worker) moved the
+    version past it, and refreshes it in the background meanwhile.
+    """
+
+    def __init__(self, engine, reload_seconds: float = 300,
+                 snapshot_dir: Optional[str] = None, model_name: Optional[str] = None,
+                 quantization: str = "none", rerank: int = 200, projection: Optional[str] = None,
+                 ivf_dir: Optional[str] = None, ivf_nlist: Optional[int] = None,
+                 ivf_max_growth: float = 0.2, ivf_retrain_seconds: float = 0,
+                 threads: int = 1, parallel_min_rows: int = 50_000, data_version=None):
+        self.engine = engine
+        self.reload_seconds = reload_seconds
+        self.snapshot_dir = snapshot_dir
+        self.model_name = model_name
+        self.quantization = quantization
+        self.rerank = rerank
+        self.projection = projection
+        self.ivf_dir = ivf_dir
+        self.ivf_nlist = ivf_nlist
+        self.ivf_max_growth = ivf_max_growth
+        self.ivf_retrain_seconds = ivf_retrain_seconds
+        self.scorer = ShardedScorer(threads, parallel_min_rows)
+        self.data_version = data_version
+        self._matrices: Dict[str, VectorMatrix] = {}
+        self._ivf: Dict[str, IVFIndex] = {}
+        # Data version each matrix/IVF index reflects, keyed by (kind, version)
+        self._loaded_at_version: Dict[Tuple[str, str], Any] = {}
+        self._retraining: set = set()
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+
+    def _data_version_now(self) -> Any:
+        return self.data_version.current() if self.data_version is not None else None
+
+    def _load(self, version: str) -> VectorMatrix:
+        start = time.perf_counter()
+        matrix = None
+        if self.snapshot_dir:
+            try:
+                matrix = load_snapshot(self.snapshot_dir, version, self.model_name, self.projection,
+                                       **self._snapshot_expectation(version))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Snapshot de vetores {version} ignorado: {e}")
+        if matrix is None:
+            with self.engine.connect() as conn:
+                rows = conn.execute(text(_vectors_sql(version, "{vector} AS vetor")),
+                                    {"projecao": self.projection}).all()
+            matrix = VectorMatrix.from_rows(rows)
+        matrix.scorer = self.scorer
+        if self.quantization != "none":
+            matrix.quantize(self.quantization, self.rerank)
+        logger.info(f"Matriz de vetores {version} carregada ({matrix.source}): {len(matrix)} x {matrix.dims} "
+                    f"em {time.perf_counter() - start:.2f}s")
+        return matrix
+
+    def _snapshot_expectation(self, version: str) -> Dict[str, Any]:
+        """
+        What a snapshot must match to be current: the shared data version when
+        ``versao_dados`` can be read, else the vector count and highest id in the database
+        """
+        if self.data_version is not None:
+            shared, _ = self.data_version.current()
+            if self.data_version.available:
+                return {"data_version": shared}
+        with self.engine.connect() as conn:
+            return {"fingerprint": database_fingerprint(conn, version, self.projection)}
+
+    def get(self, version: str) -> VectorMatrix:
+        """Matrix for ``version`` (v2/v3), loading or reloading it when needed"""
+        if version not in VECTOR_COLUMNS:
+            raise ValueError(f"Versão de embeddings desconhecida: {version}")
+        matrix = self._matrices.get(version)
+        if matrix is not None and not self._expired(matrix):
+            return matrix
+        with self._lock:
+            matrix = self._matrices.get(version)
+            if matrix is None or self._expired(matrix):
+                loaded_at_version = self._data_version_now()
+                matrix = self._load(version)
+                self._matrices[version] = matrix
+                self._loaded_at_version[("flat", version)] = loaded_at_version
+        return matrix
+
+    def current(self, version: str, kind: str = "flat") -> Optional[Any]:
+        """
+        Matrix (``kind="flat"``) or IVF index (``kind="ivf"``) of ``version`` if it
+        reflects the current data version, else None (callers rank in SQL). A stale
+        one is refreshed in the background: the matrix is reloaded (from the
+        snapshot only if it is current), the IVF index gets the vectors it is missing.
+        """
+        index = self.ivf(version) if kind == "ivf" else self.get(version)
+        if self.data_version is None or self._loaded_at_version.get((kind, version)) == self.data_version.current():
+            return index
+        self._refresh(version, kind)
+        return None
+
+    def _refresh(self, version: str, kind: str) -> None:
+        with self._lock:
+            if (kind, version) in self._refreshing:
+                return
+            self._refreshing.add((kind, version))
+
+        def _run():
+            try:
+                loaded_at_version = self._data_version_now()
+                if kind == "ivf":
+                    self._sync_ivf(version, self._ivf[version])
+                else:
+                    # A snapshot is only used if it is as recent as the database
+                    matrix = self._load(version)
+                    with self._lock:
+                        self._matrices[version] = matrix
+                self._loaded_at_version[(kind, version)] = loaded_at_version
+            except Exception as e:
+                logger.error(f"Falha ao atualizar os vetores {version} ({kind}): {e}", exc_info=True)
+            finally:
+                self._refreshing.discard((kind, version))
+
+        threading.Thread(target=_run, name=f"vector-refresh-{kind}-{version}", daemon=True).start()
+
+    def _expired(self, matrix: VectorMatrix) -> bool:
+        return self.reload_seconds > 0 and time.time() - matrix.loaded_at > self.reload_seconds
+
+    def preload(self, versions: Sequence[str] = ("v3",)) -> None:
+        for version in versions:
+            self.get(version)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._matrices.clear()
+            self._loaded_at_version = {key: v for key, v in self._loaded_at_version.items() if key[0] != "flat"}
+
+    def _ivf_path(self, version: str) -> Optional[Path]:
+        return Path(self.ivf_dir) / version / "ivf" if self.ivf_dir else None
+
+    def _train_ivf(self, version: str) -> IVFIndex:
+        start = time.perf_counter()
+        matrix = self._load(version)
+        index = IVFIndex.train(matrix.ids, np.asarray(matrix.vectors), nlist=self.ivf_nlist)
+        logger.info(f"Índice IVF {version} treinado: {len(index)} vetores em {index.nlist} listas "
+                    f"em {time.perf_counter() - start:.2f}s")
+        self._save_ivf(version, index)
+        return index
+
+    def _save_ivf(self, version: str, index: IVFIndex) -> None:
+        """Persist the index (merging pending adds) so restarts see every vector added so far"""
+        path = self._ivf_path(version)
+        if not path:
+            index.compact()
+            return
+        try:
+            index.save(str(path), {"modelo": self.model_name, "projecao": self.projection})
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar o índice IVF {version}: {e}")
+
+    def _sync_ivf(self, version: str, index: IVFIndex) -> int:
+        """
+        Add the vectors stored in the database but missing from ``index`` (parcerias
+        created after it was saved or trained from an older snapshot). Returns how many.
+        """
+        params = {"projecao": self.projection}
+        with self.engine.connect() as conn:
+            db_ids = np.fromiter((pid for pid, _ in conn.execute(text(_vectors_sql(version, "1 AS presente")), params)),
+                                 dtype=np.int64)
+            missing = np.setdiff1d(db_ids, index.items()[0])
+            rows = conn.execute(
+                text(_vectors_sql(version, "{vector} AS vetor", "AND dv.parceria_id = ANY(:ids)")),
+                {**params, "ids": missing.tolist()}
+            ).all() if len(missing) else []
+        added = 0
+        for pid, vec in rows:
+            if vec is not None and len(vec) == index.dims:
+                index.add(int(pid), vec)
+                added += 1
+        if added:
+            logger.info(f"Índice IVF {version}: {added} vetores do banco ausentes do índice adicionados")
+            self._save_ivf(version, index)
+        return added
+
+    def _load_ivf(self, version: str) -> IVFIndex:
+        index = None
+        path = self._ivf_path(version)
+        if path:
+            try:
+                loaded = IVFIndex.load(str(path))
+                if loaded is not None:
+                    index, meta = loaded
+                    if meta.get("modelo") != self.model_name or meta.get("projecao") != self.projection:
+                        logger.warning(f"Índice IVF {version} gerado com outro modelo/projeção; treinando novamente")
+                        index = None
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Índice IVF {version} ignorado: {e}")
+                index = None
+        if index is None:
+            index = self._train_ivf(version)
+        try:
+            self._sync_ivf(version, index)
+        except Exception as e:
+            logger.warning(f"Não foi possível conferir o índice IVF {version} com o banco: {e}")
+        return index
+
+    def ivf(self, version: str) -> IVFIndex:
+        """IVF index for ``version``, loading or training it on first use"""
+        if version not in VECTOR_COLUMNS:
+            raise ValueError(f"Versão de embeddings desconhecida: {version}")
+        index = self._ivf.get(version)
+        if index is None:
+            with self._lock:
+                index = self._ivf.get(version)
+                if index is None:
+                    loaded_at_version = self._data_version_now()
+                    index = self._load_ivf(version)
+                    self._ivf[version] = index
+                    self._loaded_at_version[("ivf", version)] = loaded_at_version
+        if index.needs_retrain(self.ivf_max_growth, self.ivf_retrain_seconds):
+            self.retrain_ivf(version, background=True)
+        return index
+
+    def retrain_ivf(self, version: str, background: bool = False) -> None:
+        """Retrain the IVF index from the current vectors, keeping adds made meanwhile"""
+        with self._lock:
+            if version in self._retraining:
+                return
+            self._retraining.add(version)
+
+        def _run():
+            try:
+                index = self._train_ivf(version)
+                previous = self._ivf.get(version)
+                if previous is not None:
+                    # Everything the old index had and the new one lacks (adds pending or already
+                    # compacted, when the training read an older snapshot)
+                    ids, vectors = previous.items()
+                    missing = ~np.isin(ids, index.ids)
+                    for pid, vec in zip(ids[missing], vectors[missing]):
+                        index.add(int(pid), vec)
+                    # Replayed adds count as trained, so growth is measured from this point
+                    index.trained_count = len(index)
+                    if missing.any():
+                        self._save_ivf(version, index)
+                self._ivf[version] = index
+            except Exception as e:
+                logger.error(f"Falha ao retreinar o índice IVF {version}: {e}", exc_info=True)
+            finally:
+                self._retraining.discard(version)
+
+        if background:
+            threading.Thread(target=_run, name=f"ivf-retrain-{version}", daemon=True).start()
+        else:
+            _run()
+
+    def add(self, version: str, parceria_id: int, vector: Sequence[float]) -> None:
+        """Add a new/updated vector to the IVF index of ``version`` (if loaded)"""
+        index = self._ivf.get(version)
+        if index is None or len(vector) != index.dims:
+            return
+        index.add(parceria_id, vector)
+        if index.pending >= 1000:
+            # save() merges the pending adds and persists them for the next restart
+            self._save_ivf(version, index)
+
+    def status(self) -> Dict[str, Any]:
+        status = {
+            version: {
+                "vetores": len(matrix),
+                "dimensoes": matrix.dims,
+                "bytes": int(matrix.vectors.nbytes + matrix.ids.nbytes),
+                "origem": matrix.source,
+                "quantizacao": matrix.index.kind if matrix.index is not None else "none",
+                "bytes_codigos": matrix.index.nbytes if matrix.index is not None else 0,
+                "carregado_em": matrix.loaded_at,
+            }
+            for version, matrix in self._matrices.items()
+        }
+        for version, index in self._ivf.items():
+            status.setdefault(version, {})["ivf"] = index.status()
+        return status
+
+
+def _snapshot_path(directory: str, version: str) -> Path:
+    if version not in VECTOR_COLUMNS:
+        raise ValueError(f"Versão de embeddings desconhecida: {version}")
+    return Path(directory) / version
+
+
+def read_snapshot_meta(directory: str, version: str) -> Optional[Dict[str, Any]]:
+    """Snapshot metadata for ``version``, or None when there is no snapshot"""
+    meta_path = _snapshot_path(directory, version) / SNAPSHOT_META
+    if not meta_path.exists():
+        return None
+    with open(meta_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_snapshot(directory: str, version: str, model_name: Optional[str] = None,
+                  projection: Optional[str] = None, data_version: Optional[int] = None,
+                  fingerprint: Optional[Dict[str, int]] = None) -> Optional[VectorMatrix]:
+    """
+    Memory-map the snapshot for ``version`` (read-only, zero-copy).
+
+    Pages come from the OS page cache, so every process mapping the same
+    snapshot shares them. Returns None when there is no snapshot; raises
+    ValueError when it does not match ``model_name``/``projection``, is
+    inconsistent, or is older than the database (``data_version``: the
+    ``versao_dados`` value; ``fingerprint``: see ``database_fingerprint``).
+    """
+    meta = read_snapshot_meta(directory, version)
+    if meta is None:
+        return None
+    if meta.get("formato") != SNAPSHOT_FORMAT:
+        raise ValueError(f"formato {meta.get('formato')} não suportado")
+    if model_name and meta.get("modelo") != model_name:
+        raise ValueError(f"gerado com o modelo {meta.get('modelo')}, esperado {model_name}")
+    if version in PROJECTION_COLUMNS and meta.get("projecao") != projection:
+        raise ValueError(f"gerado com a projeção {meta.get('projecao')}, esperada {projection}")
+    if data_version is not None and meta.get("versao_dados") != data_version:
+        raise ValueError(f"desatualizado: gerado na versao_dados {meta.get('versao_dados')}, banco em {data_version}")
+    if fingerprint is not None and any(meta.get(key) != value for key, value in fingerprint.items()):
+        raise ValueError(f"desatualizado: gerado com {meta.get('total_banco')} vetores (maior id "
+                         f"{meta.get('max_id_banco')}), banco com {fingerprint['total_banco']} "
+                         f"(maior id {fingerprint['max_id_banco']})")
+
+    path = _snapshot_path(directory, version)
+    ids = np.load(path / SNAPSHOT_IDS, mmap_mode="r")
+    vectors = np.load(path / SNAPSHOT_VECTORS, mmap_mode="r")
+    if vectors.dtype != np.float32 or vectors.shape != (meta["total"], meta["dimensoes"]) or len(ids) != meta["total"]:
+        raise ValueError("arquivos não correspondem aos metadados (geração em andamento?)")
+    return VectorMatrix(ids, vectors, source="snapshot")
+
+
+def _write_array(path: Path, array: np.ndarray) -> None:
+    write_atomic(path, lambda f: np.save(f, array))
+
+
+def build_snapshot(engine, directory: str, version: str, model_name: str,
+                   full: bool = False, projection: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Write (or incrementally refresh) the snapshot for ``version`` from ``documento_vetores``.
+
+    The database returns an md5 of each stored vector; only new or changed
+    vectors are fetched and normalized, the rest is copied from the previous
+    snapshot. ``full=True`` (or a model/dimension change) rebuilds everything.
+    For v3r only vectors of the PCA version ``projection`` are included.
+    Arrays are written before the metadata, each replaced atomically. The
+    metadata records the ``versao_dados`` value read before the vectors and the
+    vector count/highest id, so ``load_snapshot`` can reject a stale snapshot.
+    """
+    start = time.perf_counter()
+    path = _snapshot_path(directory, version)
+    path.mkdir(parents=True, exist_ok=True)
+
+    previous = None
+    if not full:
+        try:
+            previous = load_snapshot(directory, version, model_name, projection)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Snapshot anterior ignorado, gerando do zero: {e}")
+    old_hashes = read_snapshot_meta(directory, version)["hashes"] if previous is not None else {}
+    old_rows = {int(pid): i for i, pid in enumerate(previous.ids)} if previous is not None else {}
+
+    # Read before the vectors: writes made meanwhile leave the snapshot behind the database
+    data_version = read_data_version(engine)
+    with engine.connect() as conn:
+        params = {"projecao": projection}
+        hashes = {str(pid): h for pid, h in conn.execute(text(_vectors_sql(version, "md5({vector}::text) AS hash")), params).all()}
+        changed = {int(pid) for pid, h in hashes.items() if old_hashes.get(pid) != h or int(pid) not in old_rows}
+        fresh = VectorMatrix.from_rows(
+            conn.execute(text(_vectors_sql(version, "{vector} AS vetor", "AND dv.parceria_id = ANY(:ids)")),
+                         {**params, "ids": sorted(changed)}).all()
+        ) if changed else None
+
+    dims = fresh.dims if fresh is not None and len(fresh) else (previous.dims if previous is not None else 0)
+    if previous is not None and fresh is not None and len(fresh) and fresh.dims != previous.dims:
+        # Dimension change (new model): nothing from the old snapshot can be reused
+        return build_snapshot(engine, directory, version, model_name, full=True, projection=projection)
+
+    fresh_rows = {int(pid): i for i, pid in enumerate(fresh.ids)} if fresh is not None else {}
+    ids, sources = [], []
+    for pid in sorted(int(p) for p in hashes):
+        if pid in fresh_rows:
+            ids.append(pid)
+            sources.append(fresh.vectors[fresh_rows[pid]])
+        elif pid in old_rows and pid not in changed:
+            ids.append(pid)
+            sources.append(previous.vectors[old_rows[pid]])
+
+    vectors = np.empty((len(ids), dims), dtype=np.float32)
+    for i, vec in enumerate(sources):
+        vectors[i] = vec
+    ids_array = np.asarray(ids, dtype=np.int64)
+    # Release the previous mapping before replacing its files
+    del sources
+    previous = None
+
+    _write_array(path / SNAPSHOT_IDS, ids_array)
+    _write_array(path / SNAPSHOT_VECTORS, vectors)
+    kept = set(ids)
+    meta = {
+        "formato": SNAPSHOT_FORMAT,
+        "versao": version,
+        "coluna": VECTOR_COLUMNS[version],
+        "modelo": model_name,
+        "projecao": projection,
+        "dimensoes": dims,
+        "total": len(ids),
+        "normalizado": True,
+        "gerado_em": time.time(),
+        "versao_dados": data_version,
+        "total_banco": len(hashes),
+        "max_id_banco": max((int(pid) for pid in hashes), default=0),
+        "hashes": {pid: h for pid, h in hashes.items() if int(pid) in kept},
+    }
+    write_atomic(path / SNAPSHOT_META, lambda f: json.dump(meta, f), binary=False)
+
+    return {
+        "versao": version,
+        "total": len(ids),
+        "dimensoes": dims,
+        "recalculados": len(fresh_rows),
+        "reaproveitados": len(ids) - len(fresh_rows),
+        "removidos": len(set(old_rows) - kept),
+        "tempo_s": round(time.perf_counter() - start, 3),
+    }
@@ -0,0 +1,39 @@
+"""
+Configuração do gunicorn para o modo preload-then-fork (Linux).
+
+Os modelos (spaCy, sentence-transformers) e a matriz de vetores são carregados
+uma única vez no processo mestre e herdados pelos workers via fork, em vez de
+cada worker carregar sua própria cópia.
+
+Uso:
+  gunicorn -c gunicorn.conf.py main:app
+  HUB_WORKERS=8 gunicorn -c gunicorn.conf.py main:app
+
+Para medir a memória por worker:
+  python scripts/memory_report.py --nome gunicorn
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("HUB_BIND", "0.0.0.0:8002")
+workers = int(os.getenv("HUB_WORKERS", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("HUB_WORKER_TIMEOUT", "120"))
+
+# Importa main.py no mestre antes do fork
+preload_app = True
+
+# Com a matriz compartilhada entre workers, recarregá-la por TTL criaria cópias privadas;
+# HUB_WORKERS vai para o ambiente da aplicação (HUB_VECTOR_THREADS=0 divide as CPUs entre os workers)
+raw_env = [
+    f"HUB_VECTOR_RELOAD_S={os.getenv('HUB_VECTOR_RELOAD_S', '0')}",
+    f"HUB_WORKERS={workers}",
+]
+
+
+def when_ready(server):
+    """Executado no mestre depois do preload e antes de criar os workers"""
+    import main
+
+    main.preparar_fork()
+
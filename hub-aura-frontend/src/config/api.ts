@@ -5,6 +5,7 @@ export const API_ENDPOINTS = {
   parcerias: {
     busca: `${API_BASE_URL}/api/v1/parcerias/busca`,
     detalhe: (id: number) => `${API_BASE_URL}/api/v1/parcerias/${id}`,
+    porIds: `${API_BASE_URL}/api/v1/parcerias/batch-get`,
     criar: `${API_BASE_URL}/api/v1/parcerias`,
     semanticBusca: `${API_BASE_URL}/api/v1/parcerias/semantic-busca`,
   },
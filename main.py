@@ -2,6 +2,7 @@
 from fastapi import FastAPI, Depends, HTTPException
 import os
 from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker, Session
 from typing import List
 import pydantic
@@ -9,14 +10,34 @@ from datetime import date
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 from fastapi import FastAPI, Depends, HTTPException, File, UploadFile
-import spacy
 from sqlalchemy import text
-import PyPDF2
 import io
+import csv
 import numpy as np
 from numpy.linalg import norm
-import re
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Any
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+import gc
+import json
+
+from app.services.batch_ingestion import BatchIngestor, summarize
+from app.services.compression import CompressionMiddleware
+from app.services.document_processor import (
+    DocumentProcessor,
+    EmptyDocumentError,
+    EXTRACTOR_VERSION,
+)
+from app.services.extraction_cache import ExtractionCache
+from app.services.facets import FacetStore
+from app.services.fast_json import FastJSONResponse, dumps as json_dumps, rows_as_dicts
+from app.services.models import ModelRegistry, ModelUnavailableError
+from app.services.projection import PCAProjection
+from app.services.record_cache import RecordCache
+from app.services.result_cache import DataVersion, ResultCache
+from app.services.vector_store import PROJECTION_COLUMNS, VECTOR_COLUMNS, VectorStore, vector_expression
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -40,6 +61,20 @@ class Parceria(pydantic.BaseModel):
     class Config:
         from_attributes = True
 
+class ParceriaResumo(pydantic.BaseModel):
+    """Parceria sem os textos longos (view=summary): sem plano_de_trabalho e com objeto truncado"""
+    id: int
+    numero_do_termo: str | None
+    ano_do_termo: int | None
+    cpf_cnpj: str | None
+    razao_social: str | None
+    objeto: str | None
+    data_da_assinatura: date | None
+    data_de_publicacao: date | None
+    vigencia: date | None
+    situacao: str | None
+    similarity_score: float | None = None
+
 class ParceriasPorAno(pydantic.BaseModel):
     ano_do_termo: int
     total: int
@@ -51,10 +86,27 @@ class ParceriasPorSituacao(pydantic.BaseModel):
     situacao: str | None
     quantidade: int
 
+class ContagemFaceta(pydantic.BaseModel):
+    valor: int | str | None
+    total: int
+
+class ContagemAnoSituacao(pydantic.BaseModel):
+    ano_do_termo: int | None
+    situacao: str | None
+    total: int
+
+class FacetasResponse(pydantic.BaseModel):
+    total_items: int
+    ano: List[ContagemFaceta]
+    situacao: List[ContagemFaceta]
+    vigencia: List[ContagemFaceta]
+    ano_situacao: List[ContagemAnoSituacao]
+
 # ADICIONE ESTE NOVO MODELO
 class BuscaResponse(pydantic.BaseModel):
     total_items: int
-    items: List[Parceria]
+    items: List[Parceria | ParceriaResumo]
+    facets: Dict[str, List[ContagemFaceta]] | None = None  # Apenas com ?facets=ano,situacao
 
     class Config:
         from_attributes = True
@@ -86,6 +138,86 @@ def get_db():
     finally:
         db.close()
 
+# Busca semântica em memória: matrizes de vetores normalizadas carregadas de documento_vetores,
+# ou mapeadas do snapshot em disco quando existir (gerado por scripts/snapshot_vetores.py).
+# HUB_VECTOR_BACKEND=sql mantém o cálculo de cosseno inteiramente no PostgreSQL.
+VECTOR_BACKEND = os.getenv("HUB_VECTOR_BACKEND", "memory")
+
+# Projeção PCA opcional (scripts/projecao_pca.py): habilita version=v3r na busca semântica
+projection = None
+if os.getenv("HUB_VECTOR_PROJECTION"):
+    try:
+        projection = PCAProjection.load(os.getenv("HUB_VECTOR_PROJECTION"))
+        logger.info(f"Projeção PCA carregada: {projection.version}")
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Não foi possível carregar a projeção PCA: {e}")
+
+def _threads_varredura() -> int:
+    """
+    Threads da varredura exata por worker: HUB_VECTOR_THREADS (padrão 1); 0 divide as CPUs
+    entre os workers da API (HUB_WORKERS, exportado pelo gunicorn.conf.py; senão WEB_CONCURRENCY),
+    para os pools somados não passarem das CPUs.
+    """
+    threads = int(os.getenv("HUB_VECTOR_THREADS", "1"))
+    if threads > 0:
+        return threads
+    workers = int(os.getenv("HUB_WORKERS") or os.getenv("WEB_CONCURRENCY") or "1")
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+# Versão dos dados (tabela versao_dados, incrementada por criação de parcerias, importações e
+# geração de embeddings): invalida os caches e as matrizes de vetores de todos os workers.
+data_version = DataVersion(engine, check_seconds=float(os.getenv("HUB_DATA_VERSION_CHECK_S", "1")))
+
+vector_store = VectorStore(
+    engine,
+    reload_seconds=float(os.getenv("HUB_VECTOR_RELOAD_S", "300")),
+    snapshot_dir=os.getenv("HUB_VECTOR_SNAPSHOT_DIR", ".cache/vetores") or None,
+    model_name="paraphrase-multilingual-MiniLM-L12-v2",
+    quantization=os.getenv("HUB_VECTOR_QUANTIZATION", "none"),
+    rerank=int(os.getenv("HUB_VECTOR_RERANK", "200")),
+    projection=projection.version if projection else None,
+    ivf_dir=os.getenv("HUB_VECTOR_INDEX_DIR", os.getenv("HUB_VECTOR_SNAPSHOT_DIR", ".cache/vetores")) or None,
+    ivf_nlist=int(os.getenv("HUB_IVF_NLIST", "0")) or None,
+    ivf_max_growth=float(os.getenv("HUB_IVF_RETRAIN_GROWTH", "0.2")),
+    ivf_retrain_seconds=float(os.getenv("HUB_IVF_RETRAIN_S", "0")),
+    threads=_threads_varredura(),
+    parallel_min_rows=int(os.getenv("HUB_VECTOR_PARALLEL_MIN_ROWS", "50000")),
+    data_version=data_version
+)
+
+# Cache de resultados de busca e estatísticas (HUB_RESULT_CACHE_MAX=0 desabilita). As entradas
+# valem até HUB_RESULT_CACHE_TTL_S ou até a versão dos dados mudar.
+result_cache = ResultCache(
+    data_version,
+    max_entries=int(os.getenv("HUB_RESULT_CACHE_MAX", "1024")),
+    ttl_seconds=float(os.getenv("HUB_RESULT_CACHE_TTL_S", "300"))
+)
+
+# Cache das parcerias lidas por /api/v1/parcerias/{id} (HUB_RECORD_CACHE_MAX=0 desabilita), invalidado
+# pela versão dos dados como o cache de resultados. Com HUB_RECORD_CACHE_PATH (ex.: .cache/parcerias.sqlite3)
+# os workers compartilham as linhas lidas por um arquivo SQLite local (HUB_RECORD_CACHE_DISK_MAX linhas).
+record_cache = RecordCache(
+    data_version,
+    max_entries=int(os.getenv("HUB_RECORD_CACHE_MAX", "4096")),
+    path=os.getenv("HUB_RECORD_CACHE_PATH") or None,
+    max_disk_entries=int(os.getenv("HUB_RECORD_CACHE_DISK_MAX", "50000"))
+)
+
+# Facetas das buscas (?facets=ano,situacao) -> coluna de instrumentos_parceria. A busca semântica
+# conta e filtra por bitmaps em memória, recarregados quando a versão dos dados muda.
+FACETAS_BUSCA = {"ano": "ano_do_termo", "situacao": "situacao"}
+facet_store = FacetStore(engine, FACETAS_BUSCA, data_version)
+
+# Índice da busca em memória: "flat" (varredura exata) ou "ivf" (listas invertidas por k-means,
+# sondando as IVF_NPROBE listas mais próximas; sublinear no tamanho do acervo)
+VECTOR_INDEX = os.getenv("HUB_VECTOR_INDEX", "flat")
+IVF_NPROBE = int(os.getenv("HUB_IVF_NPROBE", "8"))
+
+# Respostas grandes (listagem, buscas, detalhe) serializadas por orjson direto dos dicts montados
+# das linhas do banco, sem a validação do response_model. HUB_FAST_JSON=0 volta a validar e
+# serializar pelos modelos Pydantic.
+FAST_JSON = os.getenv("HUB_FAST_JSON", "1") != "0"
+
 # 2. Em seguida, a criação e definição da variável 'app'
 app = FastAPI(
     title="HUB Aura API",
@@ -110,20 +242,64 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-After-Id", "ETag"],
 )
 
-# Carrega o modelo de IA na inicialização da API
-nlp = spacy.load("pt_core_news_lg")
-logger.info("Modelo de IA (spaCy) carregado com sucesso.")
+# Compressão gzip/brotli (brotli se o pacote estiver instalado) das respostas a partir de
+# HUB_COMPRESSION_MIN_BYTES (padrão 1024); HUB_COMPRESSION=0 desabilita
+if os.getenv("HUB_COMPRESSION", "1") != "0":
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=int(os.getenv("HUB_COMPRESSION_MIN_BYTES", "1024")),
+        gzip_level=int(os.getenv("HUB_GZIP_LEVEL", "6")),
+        brotli_quality=int(os.getenv("HUB_BROTLI_QUALITY", "4"))
+    )
+
+# Modelos de IA carregados sob demanda (ou no warmup), conforme o papel da instância:
+# HUB_ENABLE_NLP=0 desabilita o spaCy (extração de documentos, vetores spaCy) e
+# HUB_ENABLE_EMBEDDINGS=0 o sentence-transformers (busca semântica). Réplicas somente
+# leitura (listagem/estatísticas) sobem sem importar spaCy/torch.
+models = ModelRegistry(
+    spacy_model="pt_core_news_lg",
+    sentence_model="paraphrase-multilingual-MiniLM-L12-v2"
+)
+
+@app.on_event("startup")
+def aquecer_modelos():
+    """
+    Warmup explícito: com HUB_WARMUP=1 os modelos habilitados são carregados em
+    segundo plano logo na subida (a API já responde enquanto isso).
+    """
+    if os.getenv("HUB_WARMUP", "0") == "1":
+        models.warmup(background=True)
+
+def preparar_fork():
+    """
+    Modo preload-then-fork (gunicorn com preload_app, ver gunicorn.conf.py): chamado
+    no processo mestre antes de criar os workers.
 
-# Carrega sentence-transformers para embeddings v2 (usado na busca semântica)
-sentence_model = None
-try:
-    from sentence_transformers import SentenceTransformer
-    sentence_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-    logger.info("Modelo sentence-transformers carregado com sucesso (384 dims).")
-except Exception as e:
-    logger.warning(f"sentence-transformers não disponível, usando spaCy como fallback: {e}")
+    Carrega os modelos e a matriz de vetores (em memória compartilhada) uma única vez,
+    fecha as conexões do pool (não podem ser herdadas pelos workers) e congela o
+    heap atual com gc.freeze(), para que o coletor de lixo dos workers não escreva
+    nos objetos herdados e force a cópia das páginas compartilhadas.
+    """
+    models.warmup()
+    if VECTOR_BACKEND == "memory":
+        try:
+            if VECTOR_INDEX == "ivf":
+                vector_store.ivf("v3")
+            else:
+                vector_store.preload(["v3"])
+        except Exception as e:
+            logger.warning(f"Não foi possível pré-carregar a matriz de vetores: {e}")
+    engine.dispose()
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Pré-carga concluída; {gc.get_freeze_count()} objetos congelados antes do fork")
+
+@app.exception_handler(ModelUnavailableError)
+async def modelo_indisponivel(request, exc: ModelUnavailableError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
 
 # ... (resto do seu código com os @app.get)
 
@@ -132,106 +308,528 @@ except Exception as e:
 def read_root():
     return {"status": "HUB Aura API está no ar!", "docs": "/docs"}
 
+@app.get("/api/v1/prontidao")
+def obter_prontidao():
+    """
+    Readiness: estado de carga de cada modelo (habilitado, carregado, tempo de carga).
+    Responde 503 enquanto um warmup solicitado não termina ou se um modelo falhou.
+    """
+    status = models.status()
+    return JSONResponse(status_code=200 if status["pronto"] else 503, content=status)
+
+@app.post("/api/v1/prontidao/warmup")
+def solicitar_warmup():
+    """
+    Dispara o carregamento dos modelos habilitados em segundo plano.
+    """
+    models.warmup(background=True)
+    return models.status()
+
 # --- 4. ENDPOINTS DA API ---
 
-@app.get("/api/v1/parcerias", response_model=List[Parceria])
-def listar_parcerias(db: Session = Depends(get_db), skip: int = 0, limit: int = 100):
+def _resposta_json(conteudo, response: Response | None = None, headers: dict | None = None):
+    """
+    Conteúdo (dicts de linhas confiáveis do banco) como FastJSONResponse; com HUB_FAST_JSON=0
+    devolve o conteúdo para o FastAPI validar pelo response_model, com os headers em response.
+    """
+    if FAST_JSON:
+        return FastJSONResponse(conteudo, headers=headers)
+    if response is not None and headers:
+        response.headers.update(headers)
+    return conteudo
+
+def _verificar_etag(request: Request, dia: str | None = None) -> dict:
+    """
+    Headers de validação da resposta: ETag da versão dos dados (muda a cada escrita registrada
+    em versao_dados, a mesma para todos os workers) e Cache-Control: no-cache para o navegador
+    sempre revalidar. Se o cliente já tem essa versão (If-None-Match), responde 304 sem consultar
+    o banco. Sem versao_dados legível só o contador local do worker mudaria, então nenhum ETag é
+    enviado (e nunca há 304). Respostas que dependem da data atual passam o `dia`, que entra no ETag.
+    """
+    headers = {"Cache-Control": "no-cache"}
+    shared, _ = data_version.current()
+    if not data_version.available:
+        return headers
+    etag = f'W/"dados-{shared}-{dia}"' if dia else f'W/"dados-{shared}"'
+    headers["ETag"] = etag
+    pedidos = request.headers.get("if-none-match")
+    if pedidos:
+        tags = {tag.strip().removeprefix("W/") for tag in pedidos.split(",")}
+        if "*" in tags or etag.removeprefix("W/") in tags:
+            raise HTTPException(status_code=304, headers=headers)
+    return headers
+
+# Colunas de instrumentos_parceria que podem ser pedidas em ?fields= (as do modelo Parceria)
+PARCERIA_COLUNAS = [nome for nome in Parceria.model_fields if nome != "similarity_score"]
+
+def _colunas_pedidas(fields: str | None) -> List[str] | None:
+    """Valida ?fields=id,razao_social,... (None = todas as colunas; o id é sempre incluído)"""
+    if not fields:
+        return None
+    pedidas = [f.strip() for f in fields.split(",") if f.strip()]
+    desconhecidas = [f for f in pedidas if f not in PARCERIA_COLUNAS]
+    if desconhecidas:
+        raise HTTPException(status_code=400, detail=f"Campos desconhecidos: {', '.join(desconhecidas)} (use {', '.join(PARCERIA_COLUNAS)})")
+    return list(dict.fromkeys(["id"] + pedidas))
+
+# view=summary: caracteres de objeto mantidos (o texto truncado termina com "…")
+RESUMO_OBJETO_CHARS = int(os.getenv("HUB_RESUMO_OBJETO_CHARS", "200"))
+
+def _validar_view(view: str) -> str:
+    if view not in ("summary", "full"):
+        raise HTTPException(status_code=400, detail="view inválida (use summary ou full)")
+    return view
+
+def _colunas_view(view: str, alias: str = "") -> str:
+    """
+    Lista do SELECT de instrumentos_parceria para a view: "full" traz as colunas do modelo
+    Parceria (nunca *, já que o caminho rápido serializa as linhas sem validação e colunas
+    novas da tabela vazariam na resposta); "summary" omite plano_de_trabalho e trunca objeto já no banco (menos dados lidos e enviados).
+    """
+    prefixo = f"{alias}." if alias else ""
+    if view == "full":
+        return ", ".join(f"{prefixo}{nome}" for nome in PARCERIA_COLUNAS)
+    colunas = [
+        f"CASE WHEN length({prefixo}objeto) > {RESUMO_OBJETO_CHARS} "
+        f"THEN substr({prefixo}objeto, 1, {RESUMO_OBJETO_CHARS}) || '…' ELSE {prefixo}objeto END AS objeto"
+        if nome == "objeto" else f"{prefixo}{nome}"
+        for nome in ParceriaResumo.model_fields if nome != "similarity_score"
+    ]
+    return ", ".join(colunas)
+
+@app.get("/api/v1/parcerias", response_model=List[Parceria | ParceriaResumo])
+def listar_parcerias(request: Request, response: Response, db: Session = Depends(get_db), skip: int = 0, limit: int = 100,
+                     after_id: int | None = None, fields: str | None = None, view: str = "full"):
     """
     Lista todos os instrumentos de parceria armazenados no banco de dados.
+
+    Args:
+        skip: Offset para paginação (ignorado com after_id)
+        limit: Limite de resultados
+        after_id: Cursor: retorna as parcerias com id maior que este (percorre o acervo pelo
+            índice da chave primária, com custo constante por página)
+        fields: Colunas a retornar, separadas por vírgula (ex.: "id,razao_social,ano_do_termo")
+        view: "full" (padrão) ou "summary" (sem plano_de_trabalho, objeto truncado); ignorado com fields
+
+    Quando a página está cheia, o cabeçalho X-Next-After-Id traz o cursor da próxima página.
+    Com If-None-Match igual ao ETag (versão dos dados), responde 304 sem consultar o banco.
     """
+    colunas = _colunas_pedidas(fields)
+    _validar_view(view)
+    headers = _verificar_etag(request)
     try:
-        query = text("SELECT * FROM instrumentos_parceria ORDER BY id LIMIT :limit OFFSET :skip")
-        result = db.execute(query, {"limit": limit, "skip": skip})
-        return result.mappings().all()
+        select_sql = ", ".join(colunas) if colunas else _colunas_view(view)
+        if after_id is not None:
+            query = text(f"SELECT {select_sql} FROM instrumentos_parceria WHERE id > :after_id ORDER BY id LIMIT :limit")
+            params = {"after_id": after_id, "limit": limit}
+        else:
+            query = text(f"SELECT {select_sql} FROM instrumentos_parceria ORDER BY id LIMIT :limit OFFSET :skip")
+            params = {"limit": limit, "skip": skip}
+        rows = rows_as_dicts(db.execute(query, params))
+
+        if rows and len(rows) == limit:
+            headers["X-Next-After-Id"] = str(rows[-1]["id"])
+        if colunas:
+            # Projeção parcial: fora do modelo Parceria (que exige todas as colunas)
+            return FastJSONResponse(rows, headers=headers)
+        return _resposta_json(rows, response, headers)
 
     except Exception as e:
         logger.error(f"Erro ao listar parcerias: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Erro ao consultar o banco de dados")
 
 @app.get("/api/v1/estatisticas/parcerias_por_ano", response_model=List[ParceriasPorAno])
-def obter_parcerias_por_ano(db: Session = Depends(get_db)):
+def obter_parcerias_por_ano(request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Retorna a contagem de parcerias agrupadas por ano.
+    Lê os totais pré-calculados de estatisticas_parcerias (mantidos por triggers).
+    Com If-None-Match igual ao ETag (versão dos dados), responde 304.
     """
+    headers = _verificar_etag(request)
     try:
         query = text("""
-            SELECT ano_do_termo, COUNT(id) AS total
-            FROM instrumentos_parceria
+            SELECT ano_do_termo, SUM(total)::bigint AS total
+            FROM estatisticas_parcerias
             WHERE ano_do_termo IS NOT NULL
             GROUP BY ano_do_termo
             ORDER BY ano_do_termo DESC;
         """)
-        result = db.execute(query)
-        return result.mappings().all()
+        return _resposta_json(result_cache.get_or_compute(
+            ResultCache.make_key("parcerias_por_ano"),
+            lambda: rows_as_dicts(db.execute(query))
+        ), response, headers)
 
     except Exception as e:
         logger.error(f"Erro ao calcular estatísticas por ano: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Ocorreu um erro interno ao processar sua solicitação.")
 
+# Predicado da busca textual (parâmetro :termo = "%termo%"). Usamos unaccent + lower para
+# permitir buscas sem acentos (ex: "inteligencia" encontra "inteligência")
+BUSCA_TEXTUAL_WHERE = """
+    unaccent(lower(coalesce(numero_do_termo, ''))) ILIKE unaccent(lower(:termo)) OR
+    unaccent(lower(coalesce(razao_social, ''))) ILIKE unaccent(lower(:termo)) OR
+    unaccent(lower(coalesce(objeto, ''))) ILIKE unaccent(lower(:termo))
+"""
+
+def _facetas_pedidas(facets: str | None) -> List[str]:
+    """Valida ?facets=ano,situacao (400 para facetas desconhecidas)"""
+    pedidas = [f.strip() for f in (facets or "").split(",") if f.strip()]
+    desconhecidas = [f for f in pedidas if f not in FACETAS_BUSCA]
+    if desconhecidas:
+        raise HTTPException(status_code=400, detail=f"Facetas desconhecidas: {', '.join(desconhecidas)} (use {', '.join(FACETAS_BUSCA)})")
+    return list(dict.fromkeys(pedidas))
+
+def _buscar_parcerias(db: Session, termo: str, skip: int, limit: int, ano: int | None = None,
+                      situacao: str | None = None, facetas: List[str] = (), view: str = "full") -> dict:
+    """Total, facetas e itens da página da busca textual (sem cache)"""
+    where_sql = f"({BUSCA_TEXTUAL_WHERE})"
+    params = {"termo": f"%{termo}%"}
+    if ano is not None:
+        where_sql += " AND ano_do_termo = :ano"
+        params["ano"] = ano
+    if situacao is not None:
+        where_sql += " AND situacao = :situacao"
+        params["situacao"] = situacao
+
+    # --- PRIMEIRA CONSULTA: Contar o total de itens ---
+    # Com facetas, a mesma varredura conta o total (conjunto vazio) e cada faceta (GROUPING SETS)
+    facets = None
+    if facetas:
+        # Só as colunas pedidas: as do SELECT e do GROUPING precisam estar nos GROUPING SETS
+        colunas = [FACETAS_BUSCA[f] for f in facetas]
+        conjuntos = ", ".join(f"({c})" for c in colunas)
+        count_query = text(f"""
+            SELECT {", ".join(colunas)}, GROUPING({", ".join(colunas)}) AS grupo, COUNT(*) AS total
+            FROM instrumentos_parceria
+            WHERE {where_sql}
+            GROUP BY GROUPING SETS ({conjuntos}, ())
+            ORDER BY total DESC
+        """)
+        # Bit da coluna no GROUPING (1 = agregada): a faceta f tem todas as outras colunas agregadas
+        grupos = {(2 ** len(colunas) - 1) ^ (1 << (len(colunas) - 1 - n)): nome
+                  for n, nome in enumerate(facetas)}
+        facets = {f: [] for f in facetas}
+        total_items = 0
+        for row in db.execute(count_query, params).mappings():
+            if row["grupo"] == 2 ** len(colunas) - 1:
+                total_items = row["total"]
+            else:
+                nome = grupos[row["grupo"]]
+                facets[nome].append({"valor": row[FACETAS_BUSCA[nome]], "total": row["total"]})
+    else:
+        count_query = text(f"""
+            SELECT COUNT(*) FROM instrumentos_parceria 
+            WHERE {where_sql}
+        """)
+        total_items = db.execute(count_query, params).scalar_one()
+
+    # --- SEGUNDA CONSULTA: Buscar os itens da página atual ---
+    data_query = text(f"""
+        SELECT {_colunas_view(view)} FROM instrumentos_parceria 
+        WHERE {where_sql}
+        ORDER BY id 
+        LIMIT :limit OFFSET :skip
+    """)
+    items = rows_as_dicts(db.execute(data_query, {**params, "limit": limit, "skip": skip}))
+
+    # Retorna o objeto completo, conforme o modelo BuscaResponse
+    return {"total_items": total_items, "items": items, "facets": facets}
+
 # VERSÃO CORRETA E ATUALIZADA
 @app.get("/api/v1/parcerias/busca", response_model=BuscaResponse)
-def buscar_parcerias(termo: str, db: Session = Depends(get_db), skip: int = 0, limit: int = 10):
+def buscar_parcerias(termo: str, db: Session = Depends(get_db), skip: int = 0, limit: int = 10,
+                     ano: int | None = None, situacao: str | None = None, facets: str | None = None,
+                     view: str = "full"):
     """
     Pesquisa parcerias por termo em vários campos com paginação.
     Retorna a lista de itens da página e o total de itens encontrados.
+    Resultados repetidos vêm do cache de resultados.
+
+    Com facets=ano,situacao a resposta traz as contagens de cada faceta no conjunto encontrado,
+    calculadas na mesma consulta do total; ano e situacao restringem a busca.
+    view=summary omite plano_de_trabalho e trunca objeto (páginas de resultados mais leves).
     """
+    facetas = _facetas_pedidas(facets)
+    _validar_view(view)
     try:
-        termo_busca = f"%{termo}%"
-        
-        # --- PRIMEIRA CONSULTA: Contar o total de itens ---
-        # Usamos unaccent + lower para permitir buscas sem acentos (ex: "inteligencia" encontra "inteligência")
-        count_query = text("""
-            SELECT COUNT(*) FROM instrumentos_parceria 
-            WHERE 
-                unaccent(lower(coalesce(numero_do_termo, ''))) ILIKE unaccent(lower(:termo)) OR
-                unaccent(lower(coalesce(razao_social, ''))) ILIKE unaccent(lower(:termo)) OR
-                unaccent(lower(coalesce(objeto, ''))) ILIKE unaccent(lower(:termo))
-        """)
-        total_items = db.execute(count_query, {"termo": termo_busca}).scalar_one()
-
-        # --- SEGUNDA CONSULTA: Buscar os itens da página atual ---
-        data_query = text("""
-            SELECT * FROM instrumentos_parceria 
-            WHERE 
-                unaccent(lower(coalesce(numero_do_termo, ''))) ILIKE unaccent(lower(:termo)) OR
-                unaccent(lower(coalesce(razao_social, ''))) ILIKE unaccent(lower(:termo)) OR
-                unaccent(lower(coalesce(objeto, ''))) ILIKE unaccent(lower(:termo))
-            ORDER BY id 
-            LIMIT :limit OFFSET :skip
-        """)
-        params = {"termo": termo_busca, "limit": limit, "skip": skip}
-        result = db.execute(data_query, params)
-        items = result.mappings().all()
-        
-        # Retorna o objeto completo, conforme o modelo BuscaResponse
-        return {"total_items": total_items, "items": items}
+        # O ILIKE não diferencia maiúsculas: termos que só diferem na caixa compartilham a entrada
+        chave = ResultCache.make_key("busca", termo=termo.lower(), skip=skip, limit=limit, ano=ano,
+                                     situacao=situacao, facets=facetas, view=view)
+        return _resposta_json(result_cache.get_or_compute(
+            chave, lambda: _buscar_parcerias(db, termo, skip, limit, ano, situacao, facetas, view)
+        ))
 
     except Exception as e:
         logger.error(f"Erro ao buscar parcerias: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Erro ao realizar a busca no banco de dados")
 
 @app.get("/api/v1/estatisticas/situacao", response_model=List[ParceriasPorSituacao])
-def obter_parcerias_por_situacao(db: Session = Depends(get_db)):
+def obter_parcerias_por_situacao(request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Retorna a contagem de parcerias agrupadas por situação.
+    Lê os totais pré-calculados de estatisticas_parcerias (mantidos por triggers).
+    Com If-None-Match igual ao ETag (versão dos dados), responde 304.
     """
+    headers = _verificar_etag(request)
     try:
         query = text("""
-            SELECT situacao, COUNT(*) as quantidade
-            FROM instrumentos_parceria 
+            SELECT situacao, SUM(total)::bigint as quantidade
+            FROM estatisticas_parcerias
             GROUP BY situacao 
             ORDER BY quantidade DESC
         """)
-        result = db.execute(query)
-        return result.mappings().all()
+        return _resposta_json(result_cache.get_or_compute(
+            ResultCache.make_key("situacao"),
+            lambda: rows_as_dicts(db.execute(query))
+        ), response, headers)
         
     except Exception as e:
         logger.error(f"Erro ao obter estatísticas por situação: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Erro ao consultar o banco de dados")
 
+# Bits de GROUPING(ano_do_termo, situacao, status_vigencia) de cada conjunto (1 = coluna agregada)
+_GRUPOS_FACETAS = {0b011: "ano", 0b101: "situacao", 0b110: "vigencia", 0b001: "ano_situacao", 0b111: "total"}
+
+def _filtros_parcerias(termo: str | None, ano: int | None, situacao: str | None) -> Tuple[str, dict]:
+    """Cláusula WHERE (vazia sem filtros) e parâmetros dos filtros comuns de instrumentos_parceria"""
+    filtros, params = [], {}
+    if termo:
+        filtros.append(f"({BUSCA_TEXTUAL_WHERE})")
+        params["termo"] = f"%{termo}%"
+    if ano is not None:
+        filtros.append("ano_do_termo = :ano")
+        params["ano"] = ano
+    if situacao is not None:
+        filtros.append("situacao = :situacao")
+        params["situacao"] = situacao
+    return (f"WHERE {' AND '.join(filtros)}" if filtros else ""), params
+
+def _calcular_facetas(db: Session, termo: str | None, ano: int | None, situacao: str | None) -> dict:
+    """Todas as facetas em uma única passada (GROUPING SETS) sobre as parcerias filtradas"""
+    where_sql, params = _filtros_parcerias(termo, ano, situacao)
+
+    query = text(f"""
+        SELECT ano_do_termo, situacao, status_vigencia,
+               GROUPING(ano_do_termo, situacao, status_vigencia) AS grupo,
+               COUNT(*) AS total
+        FROM (
+            SELECT ano_do_termo, situacao,
+                   CASE
+                       WHEN vigencia IS NULL THEN 'sem_vigencia'
+                       WHEN vigencia >= CURRENT_DATE THEN 'vigente'
+                       ELSE 'vencida'
+                   END AS status_vigencia
+            FROM instrumentos_parceria
+            {where_sql}
+        ) p
+        GROUP BY GROUPING SETS ((ano_do_termo), (situacao), (status_vigencia), (ano_do_termo, situacao), ())
+        ORDER BY total DESC
+    """)
+    facetas = {"total_items": 0, "ano": [], "situacao": [], "vigencia": [], "ano_situacao": []}
+    for row in db.execute(query, params).mappings():
+        faceta = _GRUPOS_FACETAS[row["grupo"]]
+        if faceta == "total":
+            facetas["total_items"] = row["total"]
+        elif faceta == "ano_situacao":
+            facetas[faceta].append({"ano_do_termo": row["ano_do_termo"], "situacao": row["situacao"], "total": row["total"]})
+        else:
+            coluna = {"ano": "ano_do_termo", "vigencia": "status_vigencia"}.get(faceta, faceta)
+            facetas[faceta].append({"valor": row[coluna], "total": row["total"]})
+    return facetas
+
+@app.get("/api/v1/estatisticas/facetas", response_model=FacetasResponse)
+def obter_facetas(request: Request, response: Response, db: Session = Depends(get_db), termo: str | None = None,
+                  ano: int | None = None, situacao: str | None = None):
+    """
+    Retorna em uma requisição as contagens por ano, situação, ano × situação e status de
+    vigência (vigente, vencida, sem_vigencia), calculadas em uma única varredura.
+
+    Args:
+        termo: Filtro opcional com o mesmo critério da busca textual (/parcerias/busca)
+        ano: Filtro opcional por ano do termo
+        situacao: Filtro opcional por situação
+
+    Com If-None-Match igual ao ETag (versão dos dados e dia), responde 304. O status de vigência
+    depende da data atual, então o ETag e a chave do cache mudam a cada dia.
+    """
+    hoje = date.today().isoformat()
+    headers = _verificar_etag(request, dia=hoje)
+    try:
+        chave = ResultCache.make_key("facetas", termo=termo.lower() if termo else None, ano=ano, situacao=situacao,
+                                     dia=hoje)
+        return _resposta_json(
+            result_cache.get_or_compute(chave, lambda: _calcular_facetas(db, termo, ano, situacao)), response, headers
+        )
+
+    except Exception as e:
+        logger.error(f"Erro ao calcular facetas: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Erro ao consultar o banco de dados")
+
+def _indice_vetores(versao: str, dims: int):
+    """
+    Índice em memória (matriz ou IVF) da versão, ou None se indisponível/incompatível ou
+    anterior à versão dos dados (parcerias criadas por qualquer worker entram no ranking SQL
+    enquanto o índice é atualizado em segundo plano)
+    """
+    try:
+        indice = vector_store.current(versao, "ivf" if VECTOR_INDEX == "ivf" else "flat")
+    except Exception as e:
+        logger.warning(f"Índice de vetores {versao} indisponível, usando SQL: {e}")
+        return None
+    return indice if indice is not None and indice.dims == dims else None
+
+def _linhas_ranqueadas(db: Session, rankings: List[List[Tuple[int, float]]], view: str = "full") -> List[List[dict]]:
+    """Busca em uma única consulta as linhas de todos os rankings, preservando a ordem de cada um"""
+    ids = {pid for ranking in rankings for pid, _ in ranking}
+    if not ids:
+        return [[] for _ in rankings]
+    result = db.execute(
+        text(f"SELECT {_colunas_view(view)} FROM instrumentos_parceria WHERE id = ANY(:ids)"),
+        {"ids": list(ids)}
+    )
+    keys = list(result.keys())
+    por_id = {row.id: row for row in result}
+    # Um dict por item, montado direto da tupla da linha (a mesma linha pode estar em vários rankings)
+    return [
+        [dict(zip(keys, por_id[pid]), similarity_score=round(float(score), 4)) for pid, score in ranking if pid in por_id]
+        for ranking in rankings
+    ]
+
+def _busca_semantica_memoria(db: Session, qvec: List[float], versao: str, skip: int, limit: int,
+                             permitidos: np.ndarray | None, nprobe: int | None = None, view: str = "full"):
+    """
+    Ranqueia pela matriz de vetores em memória (ou pelo índice IVF) e busca no banco apenas
+    as linhas da página. Retorna None quando o índice não está disponível (o chamador usa o
+    cálculo em SQL).
+    """
+    indice = _indice_vetores(versao, len(qvec))
+    if indice is None:
+        return None
+
+    if VECTOR_INDEX == "ivf":
+        ranking = indice.search(qvec, skip + limit, nprobe=nprobe or IVF_NPROBE, allowed_ids=permitidos)[skip:]
+    else:
+        ranking = indice.search(qvec, skip + limit, allowed_ids=permitidos)[skip:]
+    return _linhas_ranqueadas(db, [ranking], view)[0]
+
+def _busca_semantica_sql(db: Session, qvec: List[float], versao: str, skip: int, limit: int, ano: int | None,
+                         situacao: str | None = None, view: str = "full"):
+    """Ranqueia calculando o cosseno no PostgreSQL (HUB_VECTOR_BACKEND=sql ou índice em memória indisponível)"""
+    # Pré-calcular a norma do vetor de consulta (para cosseno)
+    q_norm = float(np.sqrt(np.sum(np.square(np.array(qvec, dtype=np.float64))))) if qvec else 1.0
+
+    params = {"query_vector": qvec, "q_norm": q_norm, "limit": limit, "skip": skip}
+    p_filters = []
+    if ano:
+        p_filters.append("p.ano_do_termo = :ano")
+        params["ano"] = ano
+    if situacao is not None:
+        p_filters.append("p.situacao = :situacao")
+        params["situacao"] = situacao
+    p_where_sql = ("WHERE " + " AND ".join(p_filters)) if p_filters else ""
+
+    # Escolher coluna de vetor baseado na versão (v3r: apenas vetores da projeção atual)
+    vetor_expr = vector_expression(versao, alias="documento_vetores")
+    dv_filtro = ""
+    if versao in PROJECTION_COLUMNS:
+        dv_filtro = f"AND {PROJECTION_COLUMNS[versao]} = :projecao"
+        params["projecao"] = projection.version
+    
+    # IMPORTANTE: A coluna objeto_vetor_v3 é FLOAT[]; portanto não podemos usar operador <=> do pgvector.
+    # Calculamos a similaridade do cosseno via unnest das arrays e ordenamos pela maior similaridade.
+    # DEDUPLICAÇÃO: Usa DISTINCT ON para garantir apenas um embedding por parceria_id
+    # FALLBACK: Se v3 não existir, tenta v2
+    sql = text(f"""
+        WITH q AS (
+            SELECT CAST(:query_vector AS float8[]) AS v, CAST(:q_norm AS float8) AS qn
+        ),
+        deduplicated_vectors AS (
+            SELECT DISTINCT ON (parceria_id) 
+                parceria_id, 
+                {vetor_expr} as vetor
+            FROM documento_vetores
+            WHERE {vetor_expr} IS NOT NULL {dv_filtro}
+            ORDER BY parceria_id
+        ),
+        agg AS (
+            SELECT 
+                dv.parceria_id,
+                SUM(dv_elt.dv_v * q_elt.q_v) AS dot,
+                sqrt(SUM(dv_elt.dv_v * dv_elt.dv_v)) AS dn
+            FROM deduplicated_vectors dv
+            JOIN q ON TRUE
+            JOIN LATERAL unnest(dv.vetor) WITH ORDINALITY AS dv_elt(dv_v, idx) ON TRUE
+            JOIN LATERAL unnest((SELECT v FROM q)) WITH ORDINALITY AS q_elt(q_v, idx2) ON idx = idx2
+            GROUP BY dv.parceria_id
+        )
+        SELECT {_colunas_view(view, "p")}, (dot / NULLIF(dn * (SELECT qn FROM q), 0)) AS similarity_score
+        FROM agg a
+        JOIN instrumentos_parceria p ON p.id = a.parceria_id
+        {p_where_sql}
+        ORDER BY similarity_score DESC NULLS LAST
+        LIMIT :limit OFFSET :skip
+    """)
+
+    items = rows_as_dicts(db.execute(sql, params))
+
+    # Arredondar similarity_score para 4 casas decimais
+    for item in items:
+        if item['similarity_score'] is not None:
+            item['similarity_score'] = round(float(item['similarity_score']), 4)
+
+    return items
+
+def _busca_semantica(db: Session, termo: str, versao: str, skip: int, limit: int, ano: int | None,
+                     nprobe: int | None, situacao: str | None = None, facetas: List[str] = (),
+                     view: str = "full") -> dict:
+    """Gera o embedding do termo e executa a busca semântica (sem cache)"""
+    # Modelo de embeddings (carregado sob demanda); sem ele, cai para o spaCy
+    sentence_model = models.get_sentence_model()
+    nlp = models.get_nlp() if sentence_model is None else None
+
+    try:
+        # Gerar embedding do termo usando o modelo global cacheado
+        if sentence_model is not None:
+            qvec = sentence_model.encode(termo).tolist()
+            logger.info(f"Usando sentence-transformers para gerar embedding da query: '{termo}' ({len(qvec)} dims)")
+        else:
+            # Fallback para spaCy - mas isso gerará incompatibilidade de dimensões!
+            qvec = nlp(termo).vector.tolist()
+            logger.warning(f"sentence-transformers não disponível; usando spaCy para embedding (fallback). Dimensões podem não coincidir!")
+
+        # v3r: a consulta passa pela mesma projeção PCA dos vetores armazenados
+        if versao in PROJECTION_COLUMNS:
+            qvec = projection.transform(qvec).tolist()
+
+        # Filtros e facetas pelos bitmaps em memória (sem consultar o banco); a busca semântica
+        # ranqueia todo o acervo, então as facetas contam todas as parcerias que passam nos filtros
+        selecao, permitidos, facets = None, None, None
+        if ano or situacao is not None or facetas:
+            bitmaps = facet_store.get()
+            selecao = bitmaps.select(ano=ano or None, situacao=situacao)
+            if ano or situacao is not None:
+                permitidos = bitmaps.ids_of(selecao)
+            if facetas:
+                facets = bitmaps.counts(selecao, facetas)
+
+        # Caminho em memória (padrão): um produto matriz-vetor sobre os vetores normalizados
+        if VECTOR_BACKEND == "memory":
+            items = _busca_semantica_memoria(db, qvec, versao, skip, limit, permitidos, nprobe, view)
+            if items is not None:
+                return {"total_items": len(items), "items": items, "facets": facets}
+
+        items = _busca_semantica_sql(db, qvec, versao, skip, limit, ano, situacao, view)
+        return {"total_items": len(items), "items": items, "facets": facets}
+
+    except Exception as e:
+        logger.error(f"Erro na busca semântica: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro ao executar busca semântica: {str(e)}")
+
 # BUSCA SEMÂNTICA (deve vir ANTES de rotas com path parameters como {parceria_id})
 @app.get("/api/v1/parcerias/semantic-busca", response_model=BuscaResponse)
-def busca_semantica(termo: str, db: Session = Depends(get_db), skip: int = 0, limit: int = 10, ano: int | None = None, version: str = "v3"):
+def busca_semantica(termo: str, db: Session = Depends(get_db), skip: int = 0, limit: int = 10, ano: int | None = None, version: str = "v3",
+                    nprobe: int | None = None, situacao: str | None = None, facets: str | None = None,
+                    view: str = "full"):
     """
     Busca semântica que utiliza embeddings enriquecidos (objeto + plano_de_trabalho) para retornar parcerias ordenadas por similaridade.
     
@@ -240,101 +838,253 @@ def busca_semantica(termo: str, db: Session = Depends(get_db), skip: int = 0, li
         skip: Offset para paginação
         limit: Limite de resultados
         ano: Filtro opcional por ano
-        version: Versão dos embeddings (v2=apenas objeto, v3=objeto+plano). Default: v3
+        version: Versão dos embeddings (v2=apenas objeto, v3=objeto+plano, v3r=v3 reduzido por PCA). Default: v3
+        nprobe: Listas sondadas com HUB_VECTOR_INDEX=ivf (mais listas = mais recall, mais lento). Default: HUB_IVF_NPROBE
+        situacao: Filtro opcional por situação
+        facets: Facetas a contar entre as parcerias filtradas (ex.: "ano,situacao"), via bitmaps em memória
+        view: "full" (padrão) ou "summary" (sem plano_de_trabalho, objeto truncado)
     """
+    facetas = _facetas_pedidas(facets)
+    _validar_view(view)
+    versao = version if version in VECTOR_COLUMNS else "v2"
+    if versao in PROJECTION_COLUMNS and projection is None:
+        raise HTTPException(status_code=400, detail="Projeção PCA não configurada (HUB_VECTOR_PROJECTION)")
+
+    # Consultas repetidas não geram embedding nem varrem os vetores novamente
+    chave = ResultCache.make_key("semantic-busca", termo=termo, skip=skip, limit=limit, ano=ano,
+                                 versao=versao, nprobe=nprobe, situacao=situacao, facets=facetas, view=view)
+    return _resposta_json(result_cache.get_or_compute(
+        chave, lambda: _busca_semantica(db, termo, versao, skip, limit, ano, nprobe, situacao, facetas, view)
+    ))
+
+# --- BUSCA SEMÂNTICA EM LOTE ---
+# Limite de consultas por requisição da busca semântica em lote
+SEMANTIC_BATCH_MAX = int(os.getenv("HUB_SEMANTIC_BATCH_MAX", "100"))
+
+class ConsultaSemantica(pydantic.BaseModel):
+    termo: str
+    skip: int = 0
+    limit: int = 10
+    ano: int | None = None
+
+class BuscaSemanticaLote(pydantic.BaseModel):
+    consultas: List[ConsultaSemantica]
+    version: str = "v3"
+    nprobe: int | None = None
+    view: str = "full"
+
+class BuscaSemanticaLoteResponse(pydantic.BaseModel):
+    resultados: List[BuscaResponse]
+
+
+def _ranking_semantico_lote(vetores: np.ndarray, versao: str,
+                            consultas: List[ConsultaSemantica], nprobe: int | None):
+    """
+    Rankings (já paginados) de todas as consultas pelo índice em memória; a matriz exata
+    pontua o lote inteiro com um produto matriz-matriz. None se o índice não está disponível.
+    """
+    indice = _indice_vetores(versao, vetores.shape[1])
+    if indice is None:
+        return None
+
+    # Filtro por ano pelos bitmaps de facetas (um conjunto de ids por ano pedido)
+    anos = {c.ano for c in consultas if c.ano}
+    ids_por_ano: Dict[int, np.ndarray] = {}
+    if anos:
+        bitmaps = facet_store.get()
+        ids_por_ano = {ano: bitmaps.ids_of(bitmaps.select(ano=ano)) for ano in anos}
+    permitidos = [ids_por_ano[c.ano] if c.ano else None for c in consultas]
+
+    if VECTOR_INDEX == "ivf":
+        rankings = [
+            indice.search(q, c.skip + c.limit, nprobe=nprobe or IVF_NPROBE, allowed_ids=p)
+            for q, c, p in zip(vetores, consultas, permitidos)
+        ]
+    else:
+        rankings = indice.search_batch(vetores, [c.skip + c.limit for c in consultas], permitidos)
+    return [ranking[c.skip:] for ranking, c in zip(rankings, consultas)]
+
+
+@app.post("/api/v1/parcerias/semantic-busca/batch", response_model=BuscaSemanticaLoteResponse)
+def busca_semantica_lote(lote: BuscaSemanticaLote, db: Session = Depends(get_db)):
+    """
+    Executa várias buscas semânticas em uma requisição (relatórios e ferramentas de qualidade).
+
+    Todos os termos são codificados em um único lote do modelo e pontuados juntos
+    (um produto matriz-matriz sobre a matriz em memória); cada consulta tem seus
+    próprios skip, limit e ano. Os resultados vêm na mesma ordem das consultas.
+    """
+    if len(lote.consultas) > SEMANTIC_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"Lote muito grande. Máximo de {SEMANTIC_BATCH_MAX} consultas por requisição.")
+    if not lote.consultas:
+        return {"resultados": []}
+
+    _validar_view(lote.view)
+    versao = lote.version if lote.version in VECTOR_COLUMNS else "v2"
+    if versao in PROJECTION_COLUMNS and projection is None:
+        raise HTTPException(status_code=400, detail="Projeção PCA não configurada (HUB_VECTOR_PROJECTION)")
+
+    sentence_model = models.get_sentence_model()
+    nlp = models.get_nlp() if sentence_model is None else None
+
     try:
-        # Gerar embedding do termo usando o modelo global cacheado
+        termos = [c.termo for c in lote.consultas]
         if sentence_model is not None:
-            qvec = sentence_model.encode(termo).tolist()
-            logger.info(f"Usando sentence-transformers para gerar embedding da query: '{termo}' ({len(qvec)} dims)")
+            vetores = np.asarray(sentence_model.encode(termos, batch_size=64), dtype=np.float32)
         else:
-            # Fallback para spaCy (já carregado) - mas isso gerará incompatibilidade de dimensões!
-            qvec = nlp(termo).vector.tolist()
-            logger.warning(f"sentence-transformers não disponível; usando spaCy para embedding (fallback). Dimensões podem não coincidir!")
+            vetores = np.asarray([doc.vector for doc in nlp.pipe(termos)], dtype=np.float32)
+            logger.warning("sentence-transformers não disponível; usando spaCy para embedding (fallback).")
+        if versao in PROJECTION_COLUMNS:
+            vetores = projection.transform(vetores)
+
+        rankings = None
+        if VECTOR_BACKEND == "memory":
+            rankings = _ranking_semantico_lote(vetores, versao, lote.consultas, lote.nprobe)
+        if rankings is not None:
+            listas = _linhas_ranqueadas(db, rankings, lote.view)
+        else:
+            listas = [_busca_semantica_sql(db, q.tolist(), versao, c.skip, c.limit, c.ano, view=lote.view)
+                      for q, c in zip(vetores, lote.consultas)]
+        return _resposta_json({"resultados": [{"total_items": len(items), "items": items} for items in listas]})
 
-        # Pré-calcular a norma do vetor de consulta (para cosseno)
-        q_norm = float(np.sqrt(np.sum(np.square(np.array(qvec, dtype=np.float64))))) if qvec else 1.0
+    except Exception as e:
+        logger.error(f"Erro na busca semântica em lote: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro ao executar busca semântica em lote: {str(e)}")
 
-        params = {"query_vector": qvec, "q_norm": q_norm, "limit": limit, "skip": skip}
-        p_filters = []
-        if ano:
-            p_filters.append("p.ano_do_termo = :ano")
-            params["ano"] = ano
-        p_where_sql = ("WHERE " + " AND ".join(p_filters)) if p_filters else ""
+# --- LEITURA EM LOTE POR IDS ---
+# Limite de ids por requisição de /api/v1/parcerias/batch-get
+BATCH_GET_MAX_IDS = int(os.getenv("HUB_BATCH_GET_MAX_IDS", "1000"))
 
-        # Escolher coluna de vetor baseado na versão
-        vetor_col = "objeto_vetor_v3" if version == "v3" else "objeto_vetor_v2"
-        
-        # IMPORTANTE: A coluna objeto_vetor_v3 é FLOAT[]; portanto não podemos usar operador <=> do pgvector.
-        # Calculamos a similaridade do cosseno via unnest das arrays e ordenamos pela maior similaridade.
-        # DEDUPLICAÇÃO: Usa DISTINCT ON para garantir apenas um embedding por parceria_id
-        # FALLBACK: Se v3 não existir, tenta v2
-        sql = text(f"""
-            WITH q AS (
-                SELECT CAST(:query_vector AS float8[]) AS v, CAST(:q_norm AS float8) AS qn
-            ),
-            deduplicated_vectors AS (
-                SELECT DISTINCT ON (parceria_id) 
-                    parceria_id, 
-                    COALESCE({vetor_col}, objeto_vetor_v2) as vetor
-                FROM documento_vetores
-                WHERE COALESCE({vetor_col}, objeto_vetor_v2) IS NOT NULL
-                ORDER BY parceria_id
-            ),
-            agg AS (
-                SELECT 
-                    dv.parceria_id,
-                    SUM(dv_elt.dv_v * q_elt.q_v) AS dot,
-                    sqrt(SUM(dv_elt.dv_v * dv_elt.dv_v)) AS dn
-                FROM deduplicated_vectors dv
-                JOIN q ON TRUE
-                JOIN LATERAL unnest(dv.vetor) WITH ORDINALITY AS dv_elt(dv_v, idx) ON TRUE
-                JOIN LATERAL unnest((SELECT v FROM q)) WITH ORDINALITY AS q_elt(q_v, idx2) ON idx = idx2
-                GROUP BY dv.parceria_id
-            )
-            SELECT p.*, (dot / NULLIF(dn * (SELECT qn FROM q), 0)) AS similarity_score
-            FROM agg a
-            JOIN instrumentos_parceria p ON p.id = a.parceria_id
-            {p_where_sql}
-            ORDER BY similarity_score DESC NULLS LAST
-            LIMIT :limit OFFSET :skip
-        """)
+class ParceriasPorIds(pydantic.BaseModel):
+    ids: List[int]
+    view: str = "full"
 
-        result = db.execute(sql, params)
-        rows = result.mappings().all()
+class ParceriasPorIdsResponse(pydantic.BaseModel):
+    items: List[Parceria | ParceriaResumo]
+    ids_nao_encontrados: List[int]
 
-        # Inclui o score de similaridade nos resultados
-        items = []
-        for r in rows:
-            item = dict(r)
-            # Arredondar similarity_score para 4 casas decimais
-            if 'similarity_score' in item and item['similarity_score'] is not None:
-                item['similarity_score'] = round(float(item['similarity_score']), 4)
-            items.append(item)
 
-        total_items = len(items)
-        return {"total_items": total_items, "items": items}
+@app.post("/api/v1/parcerias/batch-get", response_model=ParceriasPorIdsResponse)
+def obter_parcerias_por_ids(pedido: ParceriasPorIds, db: Session = Depends(get_db)):
+    """
+    Obtém várias parcerias pelos ids em uma única consulta (painéis de similares, listas
+    montadas no frontend), em vez de uma requisição a /parcerias/{id} por parceria.
+
+    Os itens vêm na ordem dos ids pedidos (ids repetidos aparecem uma vez); os ids que não
+    existem vão para ids_nao_encontrados. view=summary omite plano_de_trabalho e trunca objeto.
+    """
+    ids = list(dict.fromkeys(pedido.ids))
+    if len(ids) > BATCH_GET_MAX_IDS:
+        raise HTTPException(status_code=413, detail=f"Lote muito grande. Máximo de {BATCH_GET_MAX_IDS} ids por requisição.")
+    _validar_view(pedido.view)
+    if not ids:
+        return _resposta_json({"items": [], "ids_nao_encontrados": []})
+
+    try:
+        result = db.execute(
+            text(f"SELECT {_colunas_view(pedido.view)} FROM instrumentos_parceria WHERE id = ANY(:ids)"),
+            {"ids": ids}
+        )
+        por_id = {item["id"]: item for item in rows_as_dicts(result)}
+        return _resposta_json({
+            "items": [por_id[pid] for pid in ids if pid in por_id],
+            "ids_nao_encontrados": [pid for pid in ids if pid not in por_id],
+        })
 
     except Exception as e:
-        logger.error(f"Erro na busca semântica: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Erro ao executar busca semântica: {str(e)}")
+        logger.error(f"Erro ao obter parcerias por ids: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Erro ao consultar o banco de dados")
+
+# --- EXPORTAÇÃO (deve vir ANTES de /api/v1/parcerias/{parceria_id}) ---
+# Linhas buscadas por vez do cursor do servidor durante a exportação
+EXPORT_FETCH_ROWS = int(os.getenv("HUB_EXPORT_FETCH_ROWS", "1000"))
+
+def _gerar_exportacao(query, params: dict, colunas: List[str] | None, formato: str):
+    """
+    Gera o arquivo em blocos de EXPORT_FETCH_ROWS linhas lidas de um cursor do servidor.
+    Usa uma conexão própria: a sessão da requisição é fechada antes de a resposta terminar.
+    """
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_FETCH_ROWS).execute(query, params)
+        nomes = colunas or list(result.keys())
+        cabecalho = formato == "csv"
+        for bloco in result.mappings().partitions():
+            if formato == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                if cabecalho:
+                    writer.writerow(nomes)
+                    cabecalho = False
+                writer.writerows([row[n] for n in nomes] for row in bloco)
+                yield buffer.getvalue()
+            else:
+                yield b"".join(json_dumps(dict(row)) + b"\n" for row in bloco)
+        if cabecalho:
+            # Exportação vazia: CSV só com o cabeçalho
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow(nomes)
+            yield buffer.getvalue()
+
+@app.get("/api/v1/parcerias/export")
+def exportar_parcerias(format: str = "ndjson", fields: str | None = None, termo: str | None = None,
+                       ano: int | None = None, situacao: str | None = None):
+    """
+    Exporta as parcerias (ordenadas por id) em NDJSON ou CSV, em streaming.
+
+    As linhas são lidas de um cursor do servidor em blocos fixos e enviadas à medida
+    que chegam, então exportações completas usam memória constante no servidor e no
+    cliente.
+
+    Args:
+        format: "ndjson" (um objeto JSON por linha) ou "csv"
+        fields: Colunas a exportar, separadas por vírgula (padrão: todas)
+        termo: Filtro opcional com o mesmo critério da busca textual
+        ano: Filtro opcional por ano do termo
+        situacao: Filtro opcional por situação
+    """
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Formato inválido (use ndjson ou csv)")
+    colunas = _colunas_pedidas(fields)
+    where_sql, params = _filtros_parcerias(termo, ano, situacao)
+    query = text(f"""
+        SELECT {", ".join(colunas or PARCERIA_COLUNAS)}
+        FROM instrumentos_parceria
+        {where_sql}
+        ORDER BY id
+    """)
+
+    if format == "csv":
+        return StreamingResponse(
+            _gerar_exportacao(query, params, colunas, format),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="parcerias.csv"'}
+        )
+    return StreamingResponse(_gerar_exportacao(query, params, colunas, format), media_type="application/x-ndjson")
 
 # NOVO ENDPOINT PARA VISUALIZAÇÃO DETALHADA
 @app.get("/api/v1/parcerias/{parceria_id}", response_model=Parceria)
-def obter_parceria_por_id(parceria_id: int, db: Session = Depends(get_db)):
+def obter_parceria_por_id(parceria_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Obtém os detalhes de um instrumento de parceria específico pelo seu ID.
+    Com If-None-Match igual ao ETag (versão dos dados), responde 304 sem consultar o banco.
+    Parcerias já lidas vêm do cache de registros enquanto a versão dos dados não muda.
     """
-    try:
-        query = text("SELECT * FROM instrumentos_parceria WHERE id = :id")
+    headers = _verificar_etag(request)
+
+    def carregar():
+        query = text(f"SELECT {_colunas_view('full')} FROM instrumentos_parceria WHERE id = :id")
         result = db.execute(query, {"id": parceria_id})
-        parceria = result.mappings().first() # .first() para pegar apenas um resultado
+        row = result.first() # .first() para pegar apenas um resultado
+        return dict(zip(result.keys(), row)) if row else None
+
+    try:
+        parceria = record_cache.get_or_load(parceria_id, carregar)
 
         if not parceria:
             # Se nenhum resultado for encontrado, lança um erro 404
             raise HTTPException(status_code=404, detail="Parceria não encontrada")
         
-        return parceria
+        return _resposta_json(parceria, response, headers)
 
     except HTTPException:
         # Re-lança a exceção HTTP 404 para que o FastAPI a capture
@@ -347,6 +1097,26 @@ def obter_parceria_por_id(parceria_id: int, db: Session = Depends(get_db)):
 
 # ... (seus imports, incluindo 'import re')
 
+# Extração de campos centralizada no DocumentProcessor (padrões pré-compilados, spaCy só com NER),
+# criado no primeiro uso para não carregar o spaCy na subida da API
+_document_processor = None
+
+def get_document_processor() -> DocumentProcessor:
+    global _document_processor
+    if _document_processor is None:
+        _document_processor = DocumentProcessor(models.get_nlp())
+    return _document_processor
+
+# Cache de resultados de extração por SHA-256 do PDF (HUB_EXTRACTION_CACHE_MAX=0 desabilita)
+extraction_cache = ExtractionCache(
+    os.getenv("HUB_EXTRACTION_CACHE_PATH", os.path.join(".cache", "extracao.sqlite3")),
+    max_entries=int(os.getenv("HUB_EXTRACTION_CACHE_MAX", "512"))
+)
+
+# Validações de upload compartilhadas pelos endpoints de processamento de documentos
+PDF_CONTENT_TYPES = {"application/pdf", "application/x-pdf", "application/acrobat", "applications/pdf", "text/pdf"}
+MAX_FILE_SIZE = 10 * 1024 * 1024
+
 @app.post("/api/v1/processar-documento")
 async def processar_documento(file: UploadFile = File(...)):
     """
@@ -355,169 +1125,103 @@ async def processar_documento(file: UploadFile = File(...)):
     """
     logger.info(f"Recebido arquivo para análise final por proximidade: {file.filename}")
 
-    TRIBUNAL_CNPJ = "21.154.877/0001-07"
-
     try:
         # --- VALIDAÇÕES INICIAIS DO UPLOAD ---
         # 1) Verificar content-type informado
-        allowed_types = {"application/pdf", "application/x-pdf", "application/acrobat", "applications/pdf", "text/pdf"}
-        if file.content_type and file.content_type.lower() not in allowed_types:
+        if file.content_type and file.content_type.lower() not in PDF_CONTENT_TYPES:
             raise HTTPException(status_code=415, detail="Tipo de arquivo não suportado. Envie um PDF.")
 
-        # --- ETAPA 1: Extração e Limpeza (sem alterações) ---
         conteudo_arquivo = await file.read()
 
         # 2) Verificar tamanho máximo (10MB)
-        MAX_FILE_SIZE = 10 * 1024 * 1024
         if len(conteudo_arquivo) > MAX_FILE_SIZE:
             raise HTTPException(status_code=413, detail="Arquivo muito grande. Tamanho máximo: 10MB.")
 
-        pdf_stream = io.BytesIO(conteudo_arquivo)
-        reader = PyPDF2.PdfReader(pdf_stream)
-        texto_completo_original = "".join([page.extract_text() or "" for page in reader.pages])
-
-        if not texto_completo_original.strip():
-            raise HTTPException(status_code=400, detail="Não foi possível extrair texto do PDF.")
-
-        texto_limpo_para_analise = re.sub(r'\s+', ' ', texto_completo_original.replace('\n', ' '))
-
-        # --- ETAPA 2: LÓGICA DE EXTRAÇÃO FINAL ---
-
-        # 2.1 - Extração do OBJETO (sem alterações)
-        match_objeto = re.search(
-            r'CLÁUSULA\s*PRIMEIRA\s*–\s*DO\s*OBJETO\s*(.*?)(?=\s*CLÁUSULA\s*SEGUNDA|\Z)',
-            texto_completo_original,
-            re.DOTALL | re.IGNORECASE
-        )
-        objeto_sugerido = match_objeto.group(1).strip() if match_objeto else texto_completo_original[:1000]
-
-        # 2.2 - Extração de CNPJ do Parceiro (sem alterações)
-        todos_cnpjs = re.findall(r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}', texto_limpo_para_analise)
-        cnpjs_parceiros = [cnpj for cnpj in todos_cnpjs if cnpj != TRIBUNAL_CNPJ]
-        cnpj_sugerido = ", ".join(list(set(cnpjs_parceiros)))
-
-        # 2.3 - Extração da RAZÃO SOCIAL (centrada no CNPJ do parceiro)
-        # Estratégia:
-        # - Para cada CNPJ de parceiro encontrado, construir uma janela ao redor do CNPJ
-        # - Procurar primeiro por blocos em MAIÚSCULAS imediatamente anteriores ao CNPJ
-        # - Se não encontrar, usar spaCy para localizar entidades ORG na janela e escolher a mais próxima ao CNPJ
-        # - Escolher o candidato com menor distância ao CNPJ e que não pareça um título de documento
-        razao_social_sugerida = ""
-        regex_upper = re.compile(r"([A-ZÀ-Ú]{2,}(?:\s+[A-ZÀ-Ú]{2,}){1,})")
-
-        def is_junk(c: str) -> bool:
-            up = c.upper()
-            # termos genéricos ou típicos de cabeçalho/título
-            junk = {"UNIÃO", "ESTADO", "MUNICÍPIO", "GOVERNO", "PREFEITURA", "TERMO", "ADITIVO", "ACORDO", "COOPERAÇÃO", "COOPERACAO", "PRORROGAÇÃO", "PRORROGACAO", "OBJETO", "CELEBRAM"}
-            if any(j in up for j in junk):
-                return True
-            if len(c.split()) < 2:
-                return True
-            return False
-
-        best_global = None
-        best_global_dist = float('inf')
-        best_global_score = 0.0
-
-        for parceiro_cnpj in cnpjs_parceiros:
-            posicao = texto_limpo_para_analise.find(parceiro_cnpj)
-            if posicao == -1:
-                continue
-
-            # janela única para análise (antes e um pouco depois do CNPJ)
-            left = max(0, posicao - 500)
-            right = min(len(texto_limpo_para_analise), posicao + 200)
-            window = texto_limpo_para_analise[left:right]
-
-            # 1) buscar nomes de organizações antes do CNPJ
-            chosen = None
-            chosen_dist = float('inf')
-            
-            # 1.a) primeiro tentar matches em MAIÚSCULAS (mais confiável em docs oficiais)
-            upper_matches = regex_upper.findall(window)
-            if upper_matches:
-                for m in upper_matches:
-                    idx = window.rfind(m)
-                    if idx >= 0:
-                        end_idx = idx + len(m)
-                        dist = posicao - (left + end_idx)
-                        if dist >= 0 and dist < chosen_dist:
-                            candidate = m.strip()
-                            if not is_junk(candidate):
-                                chosen = candidate
-                                chosen_dist = dist
-
-            # 1.b) se não achou em MAIÚSCULAS, procurar padrões em minúsculas
-            if not chosen:
-                # regex para nomes com conectores típicos (de, do, da, etc.)
-                org_patterns = [
-                    r'(?:instituto|universidade|fundação|fundacao|empresa|companhia|hospital|secretaria|faculdade|centro|associação|associacao)\s+(?:[\w\s]+(?:\s+(?:de|do|da|dos|das)\s+[\w\s]+)*)',
-                    r'(?:[\w\s]+(?:\s+(?:de|do|da|dos|das)\s+[\w\s]+)*(?:\s+(?:ltda|s\.?/?a|sociedade|instituto|empresa)))'
-                ]
-                for pattern in org_patterns:
-                    matches = re.finditer(pattern, window, re.IGNORECASE)
-                    for m in matches:
-                        idx = m.start()
-                        end_idx = m.end()
-                        dist = posicao - (left + end_idx)
-                        if dist >= 0 and dist < chosen_dist:
-                            candidate = m.group().strip()
-                            # normaliza capitalização para nomes próprios
-                            candidate = ' '.join(word.capitalize() if not word in ['de', 'do', 'da', 'dos', 'das'] else word.lower() 
-                                            for word in candidate.split())
-                            if not is_junk(candidate):
-                                chosen = candidate
-                                chosen_dist = dist
-
-            # 2) se não encontrou nome válido ainda, usar spaCy
-            if not chosen:
-                doc = nlp(window)
-                for ent in doc.ents:
-                    if ent.label_ == 'ORG':
-                        ent_text = ent.text.strip()
-                        # posição absoluta aproximada
-                        ent_start_abs = left + ent.start_char
-                        ent_end_abs = left + ent.end_char
-                        dist = min(abs(ent_start_abs - posicao), abs(ent_end_abs - posicao))
-                        if not is_junk(ent_text):
-                            # prefer closer entities
-                            if dist < chosen_dist:
-                                chosen = ent_text
-                                chosen_dist = dist
-
-            # scoring: prefer closer and longer
-            if chosen:
-                score = (1.0 / (1 + chosen_dist)) + (len(chosen.split()) / 10.0)
-                # uppercase bonus (but not too strong)
-                if sum(1 for ch in chosen if ch.isupper()) / max(1, len(chosen)) > 0.4:
-                    score += 0.2
-
-                # keep best by distance primarily
-                if chosen_dist < best_global_dist or (chosen_dist == best_global_dist and score > best_global_score):
-                    best_global = chosen
-                    best_global_dist = chosen_dist
-                    best_global_score = score
-
-        if best_global:
-            razao_social_sugerida = best_global
-
-        # 2.4 - Extração do ANO DO TERMO (sem alterações)
-        match_ano = re.search(r'Nº\s*\d+/(\d{4})', texto_limpo_para_analise, re.IGNORECASE)
-        ano_do_termo_sugerido = match_ano.group(1) if match_ano else ""
-        
-        return {
-            "razao_social_sugerida": razao_social_sugerida,
-            "objeto_sugerido": objeto_sugerido,
-            "cnpj_sugerido": cnpj_sugerido,
-            "ano_do_termo_sugerido": ano_do_termo_sugerido
-        }
-
+        # 3) Reenvio do mesmo arquivo: devolve o resultado já extraído
+        chave_cache = ExtractionCache.make_key(conteudo_arquivo, EXTRACTOR_VERSION)
+        resultado_cache = extraction_cache.get(chave_cache)
+        if resultado_cache is not None:
+            logger.info(f"Resultado de extração obtido do cache para {file.filename}")
+            return resultado_cache
+
+        # --- EXTRAÇÃO: OBJETO, CNPJ do parceiro, RAZÃO SOCIAL (proximidade ao CNPJ) e ANO ---
+        # Em uma thread do pool: a extração (e a espera pelo pool de páginas) não bloqueia o event loop
+        try:
+            resultado = await run_in_threadpool(get_document_processor().extract, conteudo_arquivo)
+        except EmptyDocumentError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        extraction_cache.put(chave_cache, resultado)
+        return resultado
+
+    except (HTTPException, ModelUnavailableError):
+        # Erros de validação (415/413/400) e modelo indisponível (503) seguem com o status original
+        raise
     except Exception as e:
         logger.error(f"Erro na análise final do arquivo {file.filename}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Ocorreu um erro interno ao processar o arquivo: {str(e)}")
     
     # Crie um novo modelo Pydantic para receber os dados do formulário
 
+# Processamento em lote: pool de processos com um DocumentProcessor (e um modelo spaCy) por worker
+BATCH_MAX_FILES = int(os.getenv("HUB_BATCH_MAX_FILES", "50"))
+batch_ingestor = BatchIngestor(model_name="pt_core_news_lg", workers=int(os.getenv("HUB_BATCH_WORKERS", "0")) or None)
+
+@app.post("/api/v1/processar-documentos")
+async def processar_documentos(files: List[UploadFile] = File(...)):
+    """
+    Recebe vários PDFs e processa todos em paralelo no pool de workers.
+
+    A resposta é NDJSON: uma linha por arquivo, enviada assim que ele termina
+    (com o tempo de processamento), e uma linha final com o resumo da execução
+    (total, erros, tempo total e arquivos por segundo).
+    """
+    if not models.nlp.enabled:
+        raise ModelUnavailableError("Processamento de documentos desabilitado nesta instância (HUB_ENABLE_NLP=0).")
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"Máximo de {BATCH_MAX_FILES} arquivos por requisição.")
+
+    # Arquivos inválidos viram linhas de erro, sem bloquear o restante do lote
+    rejeitados = []
+    validos = []
+    for file in files:
+        conteudo = await file.read()
+        if file.content_type and file.content_type.lower() not in PDF_CONTENT_TYPES:
+            rejeitados.append({"arquivo": file.filename, "status": "erro", "erro": "Tipo de arquivo não suportado. Envie um PDF.", "tempo_ms": 0.0})
+        elif len(conteudo) > MAX_FILE_SIZE:
+            rejeitados.append({"arquivo": file.filename, "status": "erro", "erro": "Arquivo muito grande. Tamanho máximo: 10MB.", "tempo_ms": 0.0})
+        else:
+            validos.append((file.filename, conteudo))
+
+    logger.info(f"Lote recebido: {len(validos)} PDFs válidos, {len(rejeitados)} rejeitados")
+
+    def gerar_ndjson():
+        for registro in rejeitados:
+            yield json.dumps(registro, ensure_ascii=False) + "\n"
+        if validos:
+            for registro in batch_ingestor.process(validos):
+                if "resumo" in registro:
+                    registro["resumo"]["erros"] += len(rejeitados)
+                    registro["resumo"]["total_arquivos"] += len(rejeitados)
+                yield json.dumps(registro, ensure_ascii=False) + "\n"
+        else:
+            yield json.dumps({"resumo": summarize(0, len(rejeitados), [], 0.0)}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(gerar_ndjson(), media_type="application/x-ndjson")
+
+@app.get("/api/v1/metricas")
+def obter_metricas():
+    """
+    Retorna métricas internas da API (ex.: taxa de acerto dos caches de extração e de resultados).
+    """
+    return {
+        "cache_extracao": extraction_cache.stats(),
+        "cache_resultados": result_cache.stats(),
+        "cache_registros": record_cache.stats(),
+        "vetores": vector_store.status(),
+        "projecao": projection.info() if projection else None,
+    }
+
 class ParceriaCreate(pydantic.BaseModel):
     razao_social: str
     objeto: str
@@ -599,11 +1303,28 @@ def obter_documentos_similares(
         raise HTTPException(status_code=500, detail="Erro ao consultar similaridades")
 
 
+def _texto_embedding_v3(objeto: str | None, plano: str | None) -> str:
+    """Texto do embedding v3 (mesma combinação de scripts/generate_embeddings_v3.py)"""
+    objeto_limpo = (objeto or '').strip()
+    plano_limpo = (plano or '').strip()
+    if not plano_limpo or not objeto_limpo:
+        return objeto_limpo or plano_limpo
+    texto = f"{objeto_limpo}. {plano_limpo}"
+    if len(texto) > 3000:
+        texto = objeto_limpo + ". " + plano_limpo[:2000]
+    return texto
+
+
 @app.post("/api/v1/parcerias", response_model=Parceria)
 def criar_parceria(parceria: ParceriaCreate, db: Session = Depends(get_db)):
     """
     Cria um novo registro de parceria com os dados validados e calcula similaridades usando pgvector.
+    O embedding v3 (se o modelo estiver habilitado) é gravado e adicionado ao índice IVF em memória.
     """
+    # Vetor do documento usa o spaCy (503 se desabilitado nesta instância)
+    nlp = models.get_nlp()
+    sentence_model = models.get_sentence_model()
+
     try:
         # 1. Inserir a parceria
         query = text("""
@@ -623,16 +1344,29 @@ def criar_parceria(parceria: ParceriaCreate, db: Session = Depends(get_db)):
         novo_registro = result.mappings().first()
         
         # 2. Gerar e salvar vetor do documento usando o tipo nativo vector do pgvector
+        vetores_v3 = {}
         if parceria.objeto:
             doc_vetor = nlp(parceria.objeto).vector.tolist()
-            vetor_query = text("""
-                INSERT INTO documento_vetores (parceria_id, objeto_vetor)
-                VALUES (:parceria_id, :vetor::vector);
+            colunas, valores = ["parceria_id", "objeto_vetor"], [":parceria_id", ":vetor::vector"]
+            vetor_params = {"parceria_id": novo_registro["id"], "vetor": doc_vetor}
+            if sentence_model is not None:
+                # Embedding v3 (e v3r, com projeção PCA) para a busca semântica
+                vetores_v3["v3"] = sentence_model.encode(
+                    _texto_embedding_v3(parceria.objeto, parceria.plano_de_trabalho)
+                ).tolist()
+                colunas.append("objeto_vetor_v3")
+                valores.append(":vetor_v3")
+                vetor_params["vetor_v3"] = vetores_v3["v3"]
+                if projection is not None:
+                    vetores_v3["v3r"] = projection.transform(vetores_v3["v3"]).tolist()
+                    colunas += ["objeto_vetor_v3r", "projecao_v3r"]
+                    valores += [":vetor_v3r", ":projecao"]
+                    vetor_params.update(vetor_v3r=vetores_v3["v3r"], projecao=projection.version)
+            vetor_query = text(f"""
+                INSERT INTO documento_vetores ({", ".join(colunas)})
+                VALUES ({", ".join(valores)});
             """)
-            db.execute(vetor_query, {
-                "parceria_id": novo_registro["id"],
-                "vetor": doc_vetor
-            })
+            db.execute(vetor_query, vetor_params)
             
             # 3. Calcular similaridades com documentos existentes usando operador cosine_similarity do pgvector
             sim_query = text("""
@@ -657,8 +1391,184 @@ def criar_parceria(parceria: ParceriaCreate, db: Session = Depends(get_db)):
             db.execute(sim_inverso_query, {"novo_id": novo_registro["id"]})
         
         db.commit()
+        data_version.bump()
+
+        # 4. Disponibilizar o novo vetor no índice IVF sem retreinar
+        for versao, vetor in vetores_v3.items():
+            vector_store.add(versao, novo_registro["id"], vetor)
         return novo_registro
     except Exception as e:
         db.rollback()
         logger.error(f"Erro ao criar parceria: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Erro ao salvar no banco de dados.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Erro ao salvar no banco de dados.")
+
+# --- CRIAÇÃO EM LOTE ---
+# Limite de itens por requisição de criação em lote (evita transações gigantes)
+BULK_MAX_ITEMS = int(os.getenv("HUB_BULK_MAX_ITEMS", "500"))
+
+class ResultadoItemLote(pydantic.BaseModel):
+    indice: int
+    id: int | None = None
+    erro: str | None = None
+
+class ParceriaBulkResponse(pydantic.BaseModel):
+    total_recebidos: int
+    total_criados: int
+    total_erros: int
+    resultados: List[ResultadoItemLote]
+
+
+def _inserir_parcerias(db: Session, parcerias: List[ParceriaCreate]) -> List[int]:
+    """
+    Insere as parcerias com um único INSERT multi-linha e retorna os ids na ordem da lista.
+    A ordem do RETURNING não é garantida: as linhas são inseridas ordenadas pelo ordinal n,
+    então os ids (sequência) crescem na ordem dos itens e são associados já ordenados.
+    """
+    params = {"situacao": "Cadastrado via IA"}
+    valores = []
+    for n, parceria in enumerate(parcerias):
+        valores.append(f"({n}, :razao_social_{n}, :objeto_{n}, :cpf_cnpj_{n}, "
+                       f"CAST(:ano_do_termo_{n} AS INTEGER), :plano_de_trabalho_{n})")
+        params[f"razao_social_{n}"] = parceria.razao_social
+        params[f"objeto_{n}"] = parceria.objeto
+        params[f"cpf_cnpj_{n}"] = parceria.cpf_cnpj
+        params[f"ano_do_termo_{n}"] = parceria.ano_do_termo
+        params[f"plano_de_trabalho_{n}"] = parceria.plano_de_trabalho
+    query = text(f"""
+        INSERT INTO instrumentos_parceria (razao_social, objeto, cpf_cnpj, ano_do_termo, situacao, plano_de_trabalho)
+        SELECT razao_social, objeto, cpf_cnpj, ano_do_termo, :situacao, plano_de_trabalho
+        FROM (VALUES {", ".join(valores)}) AS v (n, razao_social, objeto, cpf_cnpj, ano_do_termo, plano_de_trabalho)
+        ORDER BY n
+        RETURNING id;
+    """)
+    return sorted(row[0] for row in db.execute(query, params))
+
+def _erro_banco(e: DBAPIError) -> str:
+    """Primeira linha da mensagem do banco (ex.: valor longo demais para a coluna)"""
+    return str(e.orig or e).strip().splitlines()[0]
+
+@app.post("/api/v1/parcerias/bulk", response_model=ParceriaBulkResponse)
+def criar_parcerias_em_lote(itens: List[ParceriaCreate], db: Session = Depends(get_db)):
+    """
+    Cria várias parcerias em uma única transação.
+
+    O corpo é validado pelo modelo ParceriaCreate (itens inválidos: 422 com a posição do
+    item em `loc`). Os itens são inseridos com um único INSERT multi-linha; se o banco
+    rejeitar o lote (tamanho de coluna, restrições), o INSERT é desfeito até o SAVEPOINT e
+    cada item é inserido no seu próprio SAVEPOINT, de modo que só os itens rejeitados
+    recebem a mensagem de erro e os demais são criados. Os vetores são gerados em uma
+    única chamada em lote do spaCy (nlp.pipe) e, com o modelo de embeddings habilitado,
+    em um único encode dos embeddings v3 (e v3r), que entram no índice IVF em memória
+    como na criação simples. As similaridades são calculadas uma vez para todo o lote;
+    falhas nessa etapa desfazem o lote inteiro (500).
+    """
+    if len(itens) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Lote muito grande. Máximo de {BULK_MAX_ITEMS} itens por requisição.")
+
+    resultados = [ResultadoItemLote(indice=i) for i in range(len(itens))]
+    if not itens:
+        return ParceriaBulkResponse(total_recebidos=0, total_criados=0, total_erros=0, resultados=resultados)
+
+    nlp = models.get_nlp()
+    sentence_model = models.get_sentence_model()
+    vetores_v3: Dict[str, List[Tuple[int, List[float]]]] = {}
+
+    try:
+        # 1. Inserir todas as parcerias com um único INSERT multi-linha; se o banco recusar
+        # alguma linha, inserir item a item (cada um em seu SAVEPOINT) para isolar os erros
+        validos: List[Tuple[int, ParceriaCreate]] = list(enumerate(itens))
+        try:
+            with db.begin_nested():
+                novos_ids = _inserir_parcerias(db, itens)
+        except DBAPIError:
+            novos_ids, validos = [], []
+            for i, parceria in enumerate(itens):
+                try:
+                    with db.begin_nested():
+                        novos_ids += _inserir_parcerias(db, [parceria])
+                    validos.append((i, parceria))
+                except DBAPIError as e:
+                    resultados[i].erro = _erro_banco(e)
+
+        # 2. Gerar os vetores em uma única passada do spaCy (nlp.pipe) e, se habilitado,
+        # os embeddings v3 (e v3r) em um único encode do sentence-transformers
+        com_objeto = [(novo_id, parceria) for novo_id, (_, parceria) in zip(novos_ids, validos) if parceria.objeto]
+        if com_objeto:
+            docs = nlp.pipe([parceria.objeto for _, parceria in com_objeto])
+            colunas = ["parceria_id", "objeto_vetor"]
+            if sentence_model is not None:
+                embeddings = np.asarray(sentence_model.encode(
+                    [_texto_embedding_v3(parceria.objeto, parceria.plano_de_trabalho) for _, parceria in com_objeto],
+                    batch_size=64
+                ), dtype=np.float32)
+                vetores_v3["v3"] = [(novo_id, vetor.tolist()) for (novo_id, _), vetor in zip(com_objeto, embeddings)]
+                colunas.append("objeto_vetor_v3")
+                if projection is not None:
+                    reduzidos = projection.transform(embeddings)
+                    vetores_v3["v3r"] = [(novo_id, vetor.tolist()) for (novo_id, _), vetor in zip(com_objeto, reduzidos)]
+                    colunas += ["objeto_vetor_v3r", "projecao_v3r"]
+            vetor_params = {"projecao": projection.version} if "v3r" in vetores_v3 else {}
+            vetor_valores = []
+            for n, ((novo_id, _), doc) in enumerate(zip(com_objeto, docs)):
+                linha = [f":parceria_id_{n}", f"CAST(:vetor_{n} AS vector)"]
+                vetor_params[f"parceria_id_{n}"] = novo_id
+                vetor_params[f"vetor_{n}"] = doc.vector.tolist()
+                if "v3" in vetores_v3:
+                    linha.append(f":vetor_v3_{n}")
+                    vetor_params[f"vetor_v3_{n}"] = vetores_v3["v3"][n][1]
+                if "v3r" in vetores_v3:
+                    linha += [f":vetor_v3r_{n}", ":projecao"]
+                    vetor_params[f"vetor_v3r_{n}"] = vetores_v3["v3r"][n][1]
+                vetor_valores.append(f"({', '.join(linha)})")
+            db.execute(text(f"""
+                INSERT INTO documento_vetores ({", ".join(colunas)})
+                VALUES {", ".join(vetor_valores)};
+            """), vetor_params)
+
+            # 3. Similaridades calculadas uma única vez para todo o lote
+            ids_vetorizados = [novo_id for novo_id, _ in com_objeto]
+            db.execute(text("""
+                INSERT INTO similaridades (parceria_id_1, parceria_id_2, score)
+                SELECT
+                    novo.parceria_id as parceria_id_1,
+                    p.id as parceria_id_2,
+                    (dv.objeto_vetor <=> novo.objeto_vetor) as score
+                FROM documento_vetores novo
+                JOIN documento_vetores dv ON dv.parceria_id != novo.parceria_id
+                JOIN instrumentos_parceria p ON p.id = dv.parceria_id
+                WHERE novo.parceria_id = ANY(:novos_ids);
+            """), {"novos_ids": ids_vetorizados})
+
+            # Scores inversos apenas para documentos pré-existentes
+            # (os pares entre itens do próprio lote já foram inseridos nos dois sentidos)
+            db.execute(text("""
+                INSERT INTO similaridades (parceria_id_1, parceria_id_2, score)
+                SELECT parceria_id_2, parceria_id_1, score
+                FROM similaridades
+                WHERE parceria_id_1 = ANY(:novos_ids)
+                  AND NOT (parceria_id_2 = ANY(:novos_ids));
+            """), {"novos_ids": ids_vetorizados})
+
+        db.commit()
+        if novos_ids:
+            data_version.bump()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Erro ao criar parcerias em lote: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Erro ao salvar o lote no banco de dados.")
+
+    # 4. Disponibilizar os novos vetores no índice IVF sem retreinar
+    for versao, vetores in vetores_v3.items():
+        for novo_id, vetor in vetores:
+            vector_store.add(versao, novo_id, vetor)
+
+    for novo_id, (i, _) in zip(novos_ids, validos):
+        resultados[i].id = novo_id
+
+    total_criados = len(novos_ids)
+    return ParceriaBulkResponse(
+        total_recebidos=len(itens),
+        total_criados=total_criados,
+        total_erros=len(itens) - total_criados,
+        resultados=resultados
+    )
@@ -0,0 +1,43 @@
+"""add objeto_vetor_v3r (PCA-reduced v3) and its projection version
+
+Revision ID: 20251105_add_v3r
+Revises: 20251030_add_v3
+Create Date: 2025-11-05 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20251105_add_v3r'
+down_revision: Union[str, Sequence[str], None] = '20251030_add_v3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add objeto_vetor_v3r (FLOAT[]) and projecao_v3r (versão da projeção PCA que o gerou)"""
+    try:
+        op.add_column('documento_vetores', sa.Column('objeto_vetor_v3r', sa.ARRAY(sa.Float()), nullable=True))
+        op.add_column('documento_vetores', sa.Column('projecao_v3r', sa.String(64), nullable=True))
+    except Exception:
+        # Fallback idempotente via SQL bruto
+        op.execute("""
+        ALTER TABLE documento_vetores ADD COLUMN IF NOT EXISTS objeto_vetor_v3r FLOAT[];
+        ALTER TABLE documento_vetores ADD COLUMN IF NOT EXISTS projecao_v3r VARCHAR(64);
+        """)
+
+
+def downgrade() -> None:
+    """Remove objeto_vetor_v3r and projecao_v3r columns"""
+    try:
+        op.drop_column('documento_vetores', 'projecao_v3r')
+        op.drop_column('documento_vetores', 'objeto_vetor_v3r')
+    except Exception:
+        op.execute("""
+        ALTER TABLE IF EXISTS documento_vetores DROP COLUMN IF EXISTS projecao_v3r;
+        ALTER TABLE IF EXISTS documento_vetores DROP COLUMN IF EXISTS objeto_vetor_v3r;
+        """)
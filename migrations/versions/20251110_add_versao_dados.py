@@ -0,0 +1,34 @@
+"""add versao_dados (shared data-version counter for the result cache)
+
+Revision ID: 20251110_versao_dados
+Revises: 20251105_add_v3r
+Create Date: 2025-11-10 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20251110_versao_dados'
+down_revision: Union[str, Sequence[str], None] = '20251105_add_v3r'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create versao_dados with its single row (incremented after every write)"""
+    op.execute("""
+    CREATE TABLE IF NOT EXISTS versao_dados (
+        id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+        versao BIGINT NOT NULL DEFAULT 0,
+        atualizado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    INSERT INTO versao_dados (id, versao) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
+    """)
+
+
+def downgrade() -> None:
+    """Drop versao_dados"""
+    op.execute("DROP TABLE IF EXISTS versao_dados;")
@@ -0,0 +1,131 @@
+"""add estatisticas_parcerias (counts per ano x situacao maintained by triggers)
+
+Revision ID: 20251112_estatisticas
+Revises: 20251110_versao_dados
+Create Date: 2025-11-12 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20251112_estatisticas'
+down_revision: Union[str, Sequence[str], None] = '20251110_versao_dados'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Create estatisticas_parcerias, its statement-level triggers and the rebuild function.
+
+    The triggers read the transition tables of each statement, so a multi-row
+    INSERT/UPDATE/DELETE adjusts each (ano, situação) group once. NULLS NOT
+    DISTINCT (PostgreSQL 15) keeps a single row for null years/situações.
+    """
+    op.execute("""
+    CREATE TABLE IF NOT EXISTS estatisticas_parcerias (
+        ano_do_termo INTEGER,
+        situacao TEXT,
+        total BIGINT NOT NULL,
+        CONSTRAINT estatisticas_parcerias_grupo UNIQUE NULLS NOT DISTINCT (ano_do_termo, situacao)
+    );
+
+    CREATE OR REPLACE FUNCTION ajustar_estatisticas_parcerias() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            DELETE FROM estatisticas_parcerias;
+            RETURN NULL;
+        END IF;
+
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO estatisticas_parcerias AS e (ano_do_termo, situacao, total)
+            SELECT ano_do_termo, situacao, COUNT(*)
+            FROM novas_parcerias
+            GROUP BY ano_do_termo, situacao
+            ON CONFLICT (ano_do_termo, situacao) DO UPDATE SET total = e.total + EXCLUDED.total;
+            RETURN NULL;
+        END IF;
+
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO estatisticas_parcerias AS e (ano_do_termo, situacao, total)
+            SELECT ano_do_termo, situacao, -COUNT(*)
+            FROM antigas_parcerias
+            GROUP BY ano_do_termo, situacao
+            ON CONFLICT (ano_do_termo, situacao) DO UPDATE SET total = e.total + EXCLUDED.total;
+        ELSE
+            -- UPDATE: só os grupos cujo saldo mudou (linhas sem troca de ano/situação se anulam)
+            INSERT INTO estatisticas_parcerias AS e (ano_do_termo, situacao, total)
+            SELECT ano_do_termo, situacao, SUM(delta)
+            FROM (
+                SELECT ano_do_termo, situacao, 1 AS delta FROM novas_parcerias
+                UNION ALL
+                SELECT ano_do_termo, situacao, -1 AS delta FROM antigas_parcerias
+            ) d
+            GROUP BY ano_do_termo, situacao
+            HAVING SUM(delta) <> 0
+            ON CONFLICT (ano_do_termo, situacao) DO UPDATE SET total = e.total + EXCLUDED.total;
+        END IF;
+
+        DELETE FROM estatisticas_parcerias WHERE total <= 0;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+    # Transition tables allow a single event per trigger; the function branches on
+    # TG_OP so each statement only reads the tables its trigger provides
+    for evento, referencias in (
+        ("INSERT", "NEW TABLE AS novas_parcerias"),
+        ("DELETE", "OLD TABLE AS antigas_parcerias"),
+        ("UPDATE", "OLD TABLE AS antigas_parcerias NEW TABLE AS novas_parcerias"),
+    ):
+        op.execute(f"""
+        DROP TRIGGER IF EXISTS estatisticas_parcerias_{evento.lower()} ON instrumentos_parceria;
+        CREATE TRIGGER estatisticas_parcerias_{evento.lower()}
+            AFTER {evento} ON instrumentos_parceria
+            REFERENCING {referencias}
+            FOR EACH STATEMENT EXECUTE FUNCTION ajustar_estatisticas_parcerias();
+        """)
+
+    op.execute("""
+    DROP TRIGGER IF EXISTS estatisticas_parcerias_truncate ON instrumentos_parceria;
+    CREATE TRIGGER estatisticas_parcerias_truncate
+        AFTER TRUNCATE ON instrumentos_parceria
+        FOR EACH STATEMENT EXECUTE FUNCTION ajustar_estatisticas_parcerias();
+
+    -- Recalcula tudo a partir de instrumentos_parceria (fim de cargas em lote, correção de desvios).
+    -- O EXCLUSIVE MODE bloqueia os triggers de escrita até o COMMIT, mas não as leituras, que
+    -- continuam vendo os totais anteriores até a troca.
+    CREATE OR REPLACE FUNCTION recalcular_estatisticas_parcerias() RETURNS BIGINT AS $$
+    DECLARE
+        grupos BIGINT;
+    BEGIN
+        LOCK TABLE estatisticas_parcerias IN EXCLUSIVE MODE;
+        DELETE FROM estatisticas_parcerias;
+        INSERT INTO estatisticas_parcerias (ano_do_termo, situacao, total)
+        SELECT ano_do_termo, situacao, COUNT(*)
+        FROM instrumentos_parceria
+        GROUP BY ano_do_termo, situacao;
+        GET DIAGNOSTICS grupos = ROW_COUNT;
+        RETURN grupos;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    SELECT recalcular_estatisticas_parcerias();
+    """)
+
+
+def downgrade() -> None:
+    """Drop the triggers, functions and estatisticas_parcerias"""
+    op.execute("""
+    DROP TRIGGER IF EXISTS estatisticas_parcerias_insert ON instrumentos_parceria;
+    DROP TRIGGER IF EXISTS estatisticas_parcerias_delete ON instrumentos_parceria;
+    DROP TRIGGER IF EXISTS estatisticas_parcerias_update ON instrumentos_parceria;
+    DROP TRIGGER IF EXISTS estatisticas_parcerias_truncate ON instrumentos_parceria;
+    DROP FUNCTION IF EXISTS ajustar_estatisticas_parcerias();
+    DROP FUNCTION IF EXISTS recalcular_estatisticas_parcerias();
+    DROP TABLE IF EXISTS estatisticas_parcerias;
+    """)
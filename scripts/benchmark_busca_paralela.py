@@ -0,0 +1,72 @@
+"""
+Latência de uma consulta da busca semântica exata por número de threads.
+
+A matriz é dividida em fatias pontuadas em paralelo (cada thread calcula seu
+top-k local, mesclado no final). Em acervos grandes a latência deve cair
+aproximadamente com o número de núcleos. Para não competir com as threads do
+BLAS, rode com OPENBLAS_NUM_THREADS=1 (ou MKL_NUM_THREADS=1).
+
+Uso:
+  OPENBLAS_NUM_THREADS=1 python scripts/benchmark_busca_paralela.py
+  OPENBLAS_NUM_THREADS=1 python scripts/benchmark_busca_paralela.py --vetores 1000000 --threads 1 2 4 8
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import os
+import statistics
+import time
+
+import numpy as np
+
+from app.services.parallel_scoring import ShardedScorer
+from app.services.vector_store import VectorMatrix
+
+K = 10
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Busca exata em paralelo: latência por número de threads')
+    parser.add_argument('--vetores', type=int, default=500_000, help='Vetores sintéticos na matriz')
+    parser.add_argument('--dims', type=int, default=384)
+    parser.add_argument('--consultas', type=int, default=50)
+    parser.add_argument('--threads', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    ids = np.arange(1, args.vetores + 1)
+    vetores = rng.standard_normal((args.vetores, args.dims), dtype=np.float32)
+    matriz = VectorMatrix.from_rows(zip(ids, vetores))
+    del vetores
+    consultas = rng.standard_normal((args.consultas, args.dims), dtype=np.float32)
+    print(f"📊 {len(matriz)} vetores x {matriz.dims} dims ({matriz.vectors.nbytes / 2**20:.0f} MB), "
+          f"{args.consultas} consultas, {os.cpu_count()} CPUs")
+
+    referencia = None
+    base_ms = None
+    print()
+    print(f"{'threads':>8} {'média (ms)':>11} {'p95 (ms)':>9} {'ganho':>7}")
+    for threads in args.threads:
+        matriz.scorer = ShardedScorer(threads, min_rows=0)
+        matriz.search(consultas[0], K)  # cria o pool fora da medição
+        tempos, resultados = [], []
+        for q in consultas:
+            inicio = time.perf_counter()
+            resultados.append(matriz.search(q, K))
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        matriz.scorer.shutdown()
+        referencia = referencia or resultados
+        if [[pid for pid, _ in r] for r in resultados] != [[pid for pid, _ in r] for r in referencia]:
+            print(f"⚠️ {threads} threads: ranking diferente da execução com {args.threads[0]} thread(s)")
+        media = statistics.mean(tempos)
+        base_ms = base_ms or media
+        p95 = sorted(tempos)[int(len(tempos) * 0.95) - 1]
+        print(f"{threads:>8} {media:11.2f} {p95:9.2f} {base_ms / media:6.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Micro-benchmark da extração de campos de termos de parceria.
+
+Compara o tempo por documento de:
+- ANTES: lógica inline antiga do endpoint processar-documento (regex recompiladas
+  a cada chamada, conjunto de termos genéricos recriado em cada is_junk e
+  pipeline spaCy completa);
+- DEPOIS: DocumentProcessor (padrões pré-compilados no módulo e spaCy restrito
+  ao componente NER via nlp.select_pipes).
+
+Os textos vêm de uma pasta de PDFs (--pdfs) ou são gerados sinteticamente.
+
+Uso:
+  python scripts/benchmark_extracao.py
+  python scripts/benchmark_extracao.py --pdfs pasta_com_termos/ --repeticoes 5
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import random
+import re
+import statistics
+import time
+
+import spacy
+
+from app.services.document_processor import DocumentProcessor, restrict_to_ner
+from app.services.pdf_text import extract_text
+
+TRIBUNAL_CNPJ = "21.154.877/0001-07"
+
+PARCEIROS = [
+    "UNIVERSIDADE FEDERAL DE MINAS GERAIS",
+    "FUNDAÇÃO JOÃO PINHEIRO",
+    "companhia de saneamento de minas gerais",
+    "Instituto de Pesquisa Econômica Aplicada",
+    "ASSOCIAÇÃO MINEIRA DE MUNICÍPIOS",
+    "Cemig Distribuição",
+    "Banco do Brasil",
+]
+
+
+def gerar_texto_sintetico(n_parceiros: int, seed: int) -> str:
+    """Gera um termo fictício com o Tribunal e n_parceiros partícipes"""
+    rng = random.Random(seed)
+    partes = [f"ACORDO DE COOPERAÇÃO TÉCNICA Nº {rng.randint(1, 99)}/{rng.randint(2015, 2025)}\n"]
+    partes.append(f"O TRIBUNAL DE CONTAS DO ESTADO DE MINAS GERAIS, inscrito no CNPJ sob o nº {TRIBUNAL_CNPJ}, e ")
+    for i in range(n_parceiros):
+        cnpj = f"{rng.randint(10, 99)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}/0001-{rng.randint(10, 99)}"
+        partes.append(f"a {rng.choice(PARCEIROS)}, pessoa jurídica de direito público, inscrita no CNPJ sob o nº {cnpj}, "
+                      f"com sede na Avenida {i + 1}, Belo Horizonte, ")
+    partes.append("resolvem celebrar o presente acordo mediante as cláusulas e condições seguintes:\n")
+    partes.append("CLÁUSULA PRIMEIRA – DO OBJETO\nO presente acordo tem por objeto a cooperação técnica para "
+                  "intercâmbio de informações, capacitação de servidores e desenvolvimento de soluções de "
+                  "tecnologia da informação voltadas ao controle externo.\n")
+    partes.append("CLÁUSULA SEGUNDA – DAS OBRIGAÇÕES\n" + "Texto das obrigações dos partícipes. " * 40)
+    return "".join(partes)
+
+
+def extrair_campos_legado(texto_completo_original: str, nlp) -> dict:
+    """Reprodução fiel da extração inline anterior do endpoint processar-documento"""
+    texto_limpo_para_analise = re.sub(r'\s+', ' ', texto_completo_original.replace('\n', ' '))
+
+    match_objeto = re.search(
+        r'CLÁUSULA\s*PRIMEIRA\s*–\s*DO\s*OBJETO\s*(.*?)(?=\s*CLÁUSULA\s*SEGUNDA|\Z)',
+        texto_completo_original,
+        re.DOTALL | re.IGNORECASE
+    )
+    objeto_sugerido = match_objeto.group(1).strip() if match_objeto else texto_completo_original[:1000]
+
+    todos_cnpjs = re.findall(r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}', texto_limpo_para_analise)
+    cnpjs_parceiros = [cnpj for cnpj in todos_cnpjs if cnpj != TRIBUNAL_CNPJ]
+    cnpj_sugerido = ", ".join(list(set(cnpjs_parceiros)))
+
+    regex_upper = re.compile(r"([A-ZÀ-Ú]{2,}(?:\s+[A-ZÀ-Ú]{2,}){1,})")
+
+    def is_junk(c: str) -> bool:
+        up = c.upper()
+        junk = {"UNIÃO", "ESTADO", "MUNICÍPIO", "GOVERNO", "PREFEITURA", "TERMO", "ADITIVO", "ACORDO", "COOPERAÇÃO", "COOPERACAO", "PRORROGAÇÃO", "PRORROGACAO", "OBJETO", "CELEBRAM"}
+        if any(j in up for j in junk):
+            return True
+        if len(c.split()) < 2:
+            return True
+        return False
+
+    best_global = None
+    best_global_dist = float('inf')
+    best_global_score = 0.0
+
+    for parceiro_cnpj in cnpjs_parceiros:
+        posicao = texto_limpo_para_analise.find(parceiro_cnpj)
+        if posicao == -1:
+            continue
+        left = max(0, posicao - 500)
+        right = min(len(texto_limpo_para_analise), posicao + 200)
+        window = texto_limpo_para_analise[left:right]
+
+        chosen = None
+        chosen_dist = float('inf')
+        for m in regex_upper.findall(window):
+            idx = window.rfind(m)
+            if idx >= 0:
+                dist = posicao - (left + idx + len(m))
+                if dist >= 0 and dist < chosen_dist:
+                    candidate = m.strip()
+                    if not is_junk(candidate):
+                        chosen = candidate
+                        chosen_dist = dist
+
+        if not chosen:
+            org_patterns = [
+                r'(?:instituto|universidade|fundação|fundacao|empresa|companhia|hospital|secretaria|faculdade|centro|associação|associacao)\s+(?:[\w\s]+(?:\s+(?:de|do|da|dos|das)\s+[\w\s]+)*)',
+                r'(?:[\w\s]+(?:\s+(?:de|do|da|dos|das)\s+[\w\s]+)*(?:\s+(?:ltda|s\.?/?a|sociedade|instituto|empresa)))'
+            ]
+            for pattern in org_patterns:
+                for m in re.finditer(pattern, window, re.IGNORECASE):
+                    dist = posicao - (left + m.end())
+                    if dist >= 0 and dist < chosen_dist:
+                        candidate = ' '.join(word.capitalize() if not word in ['de', 'do', 'da', 'dos', 'das'] else word.lower()
+                                             for word in m.group().strip().split())
+                        if not is_junk(candidate):
+                            chosen = candidate
+                            chosen_dist = dist
+
+        if not chosen:
+            for ent in nlp(window).ents:
+                if ent.label_ == 'ORG':
+                    ent_text = ent.text.strip()
+                    dist = min(abs(left + ent.start_char - posicao), abs(left + ent.end_char - posicao))
+                    if not is_junk(ent_text) and dist < chosen_dist:
+                        chosen = ent_text
+                        chosen_dist = dist
+
+        if chosen:
+            score = (1.0 / (1 + chosen_dist)) + (len(chosen.split()) / 10.0)
+            if sum(1 for ch in chosen if ch.isupper()) / max(1, len(chosen)) > 0.4:
+                score += 0.2
+            if chosen_dist < best_global_dist or (chosen_dist == best_global_dist and score > best_global_score):
+                best_global = chosen
+                best_global_dist = chosen_dist
+                best_global_score = score
+
+    match_ano = re.search(r'Nº\s*\d+/(\d{4})', texto_limpo_para_analise, re.IGNORECASE)
+    return {
+        "razao_social_sugerida": best_global or "",
+        "objeto_sugerido": objeto_sugerido,
+        "cnpj_sugerido": cnpj_sugerido,
+        "ano_do_termo_sugerido": match_ano.group(1) if match_ano else ""
+    }
+
+
+def medir(funcao, textos, repeticoes: int) -> list:
+    """Tempo (ms) por documento de cada execução"""
+    tempos = []
+    for _ in range(repeticoes):
+        for texto in textos:
+            inicio = time.perf_counter()
+            funcao(texto)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da extração de campos (antes x depois)')
+    parser.add_argument('--pdfs', help='Pasta com PDFs reais (padrão: textos sintéticos)')
+    parser.add_argument('--documentos', type=int, default=30, help='Quantidade de textos sintéticos')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--modelo', default='pt_core_news_lg')
+    args = parser.parse_args()
+
+    if args.pdfs:
+        textos = [extract_text(p.read_bytes(), parallel=False)[0] for p in sorted(Path(args.pdfs).glob('*.pdf'))]
+    else:
+        textos = [gerar_texto_sintetico(n_parceiros=1 + i % 4, seed=i) for i in range(args.documentos)]
+    print(f"📄 {len(textos)} documentos, {args.repeticoes} repetições")
+
+    nlp = spacy.load(args.modelo)
+
+    # Aquecimento (primeira chamada do spaCy inclui inicializações preguiçosas)
+    extrair_campos_legado(textos[0], nlp)
+    antes = medir(lambda t: extrair_campos_legado(t, nlp), textos, args.repeticoes)
+
+    # O mesmo objeto nlp passa a ter apenas o NER habilitado
+    processor = DocumentProcessor(restrict_to_ner(nlp))
+    processor.extract_fields(textos[0])
+    depois = medir(processor.extract_fields, textos, args.repeticoes)
+
+    print()
+    print(f"{'':10} {'média (ms)':>12} {'mediana (ms)':>14} {'p95 (ms)':>10}")
+    for rotulo, tempos in (("ANTES", antes), ("DEPOIS", depois)):
+        p95 = sorted(tempos)[int(len(tempos) * 0.95) - 1]
+        print(f"{rotulo:10} {statistics.mean(tempos):12.2f} {statistics.median(tempos):14.2f} {p95:10.2f}")
+    print()
+    print(f"⚡ Ganho: {statistics.mean(antes) / statistics.mean(depois):.2f}x por documento")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
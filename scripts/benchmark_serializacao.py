@@ -0,0 +1,113 @@
+"""
+Tempo de serialização de páginas de parcerias: caminho Pydantic x caminho rápido.
+
+Compara, para páginas de 10/100/1000 linhas com textos longos, o caminho
+padrão do FastAPI (RowMapping -> validação pelo response_model -> encoder
+JSON) com o caminho rápido da API (dicts montados das tuplas das linhas ->
+orjson, sem validação). As linhas vêm de um SQLite em memória com dados
+sintéticos, então o tempo medido inclui a leitura das linhas do resultado e
+não depende do PostgreSQL.
+
+Uso:
+  python scripts/benchmark_serializacao.py
+  python scripts/benchmark_serializacao.py --linhas 10 100 1000 --repeticoes 200
+"""
+import os
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+# Os modelos vêm de main.py; o benchmark não usa o banco da API
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import argparse
+import json
+import statistics
+import time
+from datetime import date, timedelta
+from typing import List
+
+import pydantic
+from sqlalchemy import create_engine, text
+
+from app.services.fast_json import dumps, orjson, rows_as_dicts
+from main import Parceria
+
+COLUNAS = ["id", "numero_do_termo", "ano_do_termo", "cpf_cnpj", "razao_social", "objeto",
+           "plano_de_trabalho", "data_da_assinatura", "data_de_publicacao", "vigencia", "situacao"]
+
+
+def criar_banco(linhas: int):
+    """SQLite em memória com parcerias sintéticas (objeto ~300 e plano ~800 caracteres)"""
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE instrumentos_parceria ({', '.join(COLUNAS)})"))
+        inicio = date(2020, 1, 1)
+        conn.execute(
+            text(f"INSERT INTO instrumentos_parceria VALUES ({', '.join(':' + c for c in COLUNAS)})"),
+            [
+                {
+                    "id": i, "numero_do_termo": f"{i}/2024", "ano_do_termo": 2020 + i % 5,
+                    "cpf_cnpj": f"{i:014d}", "razao_social": f"Instituição de Pesquisa Número {i}",
+                    "objeto": ("Cooperação técnica para desenvolvimento de soluções em ciência de dados " * 4)[:300],
+                    "plano_de_trabalho": ("Etapa de execução com metas, indicadores e cronograma físico. " * 14)[:800],
+                    "data_da_assinatura": inicio + timedelta(days=i % 900),
+                    "data_de_publicacao": inicio + timedelta(days=i % 900 + 3),
+                    "vigencia": inicio + timedelta(days=i % 900 + 730), "situacao": "Vigente",
+                }
+                for i in range(1, linhas + 1)
+            ]
+        )
+    return engine
+
+
+def caminho_pydantic(conn, query, adaptador) -> bytes:
+    """Como o FastAPI com response_model: valida cada linha e serializa com o encoder padrão"""
+    rows = conn.execute(query).mappings().all()
+    conteudo = adaptador.dump_python(adaptador.validate_python(rows), mode="json")
+    return json.dumps(conteudo, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def caminho_rapido(conn, query, adaptador) -> bytes:
+    """Como a API com HUB_FAST_JSON=1: dicts das tuplas das linhas direto para o orjson"""
+    return dumps(rows_as_dicts(conn.execute(query)))
+
+
+def medir(funcao, conn, query, adaptador, repeticoes: int) -> List[float]:
+    funcao(conn, query, adaptador)  # aquecimento
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(conn, query, adaptador)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serialização de páginas de parcerias: Pydantic x orjson')
+    parser.add_argument('--linhas', type=int, nargs='+', default=[10, 100, 1000], help='Tamanhos de página')
+    parser.add_argument('--repeticoes', type=int, default=100)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("⚠️ orjson não instalado: o caminho rápido usa o encoder JSON da biblioteca padrão")
+    engine = criar_banco(max(args.linhas))
+    adaptador = pydantic.TypeAdapter(List[Parceria])
+
+    print(f"{'linhas':>7} {'pydantic (ms)':>14} {'rápido (ms)':>12} {'ganho':>7} {'KB':>8}")
+    with engine.connect() as conn:
+        for linhas in args.linhas:
+            query = text(f"SELECT {', '.join(COLUNAS)} FROM instrumentos_parceria ORDER BY id LIMIT {linhas}")
+            # Mesmo conteúdo nos dois caminhos (o Pydantic acrescenta similarity_score: null)
+            esperado = [{**item, "similarity_score": None} for item in json.loads(caminho_rapido(conn, query, adaptador))]
+            if json.loads(caminho_pydantic(conn, query, adaptador)) != esperado:
+                print(f"⚠️ {linhas} linhas: conteúdo diferente entre os caminhos")
+
+            lento = statistics.median(medir(caminho_pydantic, conn, query, adaptador, args.repeticoes))
+            rapido = statistics.median(medir(caminho_rapido, conn, query, adaptador, args.repeticoes))
+            tamanho = len(caminho_rapido(conn, query, adaptador)) / 1024
+            print(f"{linhas:>7} {lento:14.3f} {rapido:12.3f} {lento / rapido:6.2f}x {tamanho:8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
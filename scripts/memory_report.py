@@ -0,0 +1,118 @@
+"""
+Relatório de memória por worker do servidor (Linux, lê /proc/<pid>/smaps_rollup).
+
+Mostra para o processo mestre e cada worker:
+- RSS: memória residente (conta páginas compartilhadas em todos os processos);
+- PSS: parcela proporcional (páginas compartilhadas divididas entre quem as usa);
+- Compartilhada / Privada: páginas herdadas do mestre x páginas próprias do worker.
+
+A soma do PSS é o consumo real do conjunto. No modo preload-then-fork
+(gunicorn.conf.py) a memória privada de cada worker deve ficar bem abaixo do RSS.
+
+Uso:
+  python scripts/memory_report.py --nome gunicorn
+  python scripts/memory_report.py --pid 12345
+"""
+import argparse
+import os
+import sys
+from typing import Dict, List, Optional
+
+CAMPOS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def ler_smaps(pid: int) -> Dict[str, int]:
+    """Totais (kB) de /proc/<pid>/smaps_rollup"""
+    valores = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for linha in f:
+            partes = linha.split()
+            if partes and partes[0].rstrip(":") in CAMPOS:
+                valores[partes[0].rstrip(":")] = int(partes[1])
+    return valores
+
+
+def filhos(pid: int) -> List[int]:
+    """PIDs filhos diretos (varre /proc/*/stat)"""
+    resultado = []
+    for entrada in os.listdir("/proc"):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entrada}/stat") as f:
+                # O nome do processo vem entre parênteses e pode conter espaços
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            resultado.append(int(entrada))
+    return sorted(resultado)
+
+
+def encontrar_mestre(nome: str) -> Optional[int]:
+    """Processo cujo cmdline contém `nome` e cujo pai não contém (o mestre)"""
+    def cmdline(pid) -> str:
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                return f.read().replace(b"\0", b" ").decode(errors="replace")
+        except OSError:
+            return ""
+
+    for entrada in sorted(os.listdir("/proc"), key=lambda e: int(e) if e.isdigit() else 0):
+        if entrada.isdigit() and int(entrada) != os.getpid() and nome in cmdline(entrada):
+            with open(f"/proc/{entrada}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            if nome not in cmdline(ppid):
+                return int(entrada)
+    return None
+
+
+def mb(kb: int) -> str:
+    return f"{kb / 1024:9.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memória por worker (RSS/PSS/compartilhada/privada)')
+    parser.add_argument('--pid', type=int, help='PID do processo mestre')
+    parser.add_argument('--nome', default='gunicorn', help='Trecho da linha de comando do mestre (se --pid não for dado)')
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("❌ Requer Linux (kernel >= 4.14) com /proc/<pid>/smaps_rollup")
+        return 1
+
+    mestre = args.pid or encontrar_mestre(args.nome)
+    if not mestre:
+        print(f"❌ Processo mestre não encontrado ('{args.nome}')")
+        return 1
+
+    processos = [("mestre", mestre)] + [("worker", pid) for pid in filhos(mestre)]
+    print(f"{'papel':8} {'pid':>8} {'RSS MB':>9} {'PSS MB':>9} {'Compart. MB':>11} {'Privada MB':>10}")
+    print("-" * 60)
+    totais = dict.fromkeys(CAMPOS, 0)
+    workers = []
+    for papel, pid in processos:
+        try:
+            v = ler_smaps(pid)
+        except OSError:
+            continue
+        for campo in CAMPOS:
+            totais[campo] += v.get(campo, 0)
+        compartilhada = v.get("Shared_Clean", 0) + v.get("Shared_Dirty", 0)
+        privada = v.get("Private_Clean", 0) + v.get("Private_Dirty", 0)
+        if papel == "worker":
+            workers.append(privada)
+        print(f"{papel:8} {pid:>8} {mb(v.get('Rss', 0))} {mb(v.get('Pss', 0))} {mb(compartilhada):>11} {mb(privada):>10}")
+
+    print("-" * 60)
+    print(f"{'total':8} {'':>8} {mb(totais['Rss'])} {mb(totais['Pss'])}")
+    print()
+    print(f"Consumo real do conjunto (soma do PSS): {totais['Pss'] / 1024:.1f} MB")
+    if workers:
+        print(f"Memória privada média por worker: {sum(workers) / len(workers) / 1024:.1f} MB "
+              f"({len(workers)} workers)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
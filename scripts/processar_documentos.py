@@ -0,0 +1,90 @@
+"""
+Processa em lote uma pasta (ou arquivo .zip) de termos assinados em PDF.
+
+Usa o mesmo pool de workers do endpoint /api/v1/processar-documentos: cada
+processo carrega o modelo spaCy uma única vez e os resultados são emitidos em
+NDJSON (uma linha por arquivo, na ordem em que terminam), seguidos de uma linha
+de resumo com tempo total e throughput.
+
+Uso:
+  python scripts/processar_documentos.py pasta_com_pdfs/ > resultados.ndjson
+  python scripts/processar_documentos.py termos.zip --workers 4 --saida resultados.ndjson
+"""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import json
+import zipfile
+from typing import Iterator, Tuple
+
+from app.services.batch_ingestion import BatchIngestor
+
+MAX_FILE_SIZE = 10 * 1024 * 1024
+
+
+def listar_pdfs(origem: Path) -> Iterator[Tuple[str, bytes]]:
+    """Lê os PDFs de uma pasta (recursivamente) ou de um arquivo .zip"""
+    if origem.is_dir():
+        for caminho in sorted(origem.rglob("*")):
+            if caminho.is_file() and caminho.suffix.lower() == ".pdf":
+                yield str(caminho.relative_to(origem)), caminho.read_bytes()
+    elif zipfile.is_zipfile(origem):
+        with zipfile.ZipFile(origem) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(".pdf"):
+                    yield info.filename, zf.read(info)
+    else:
+        raise ValueError(f"Origem inválida (esperado diretório ou .zip): {origem}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Processamento em lote de PDFs de termos de parceria')
+    parser.add_argument('origem', help='Diretório ou arquivo .zip com os PDFs')
+    parser.add_argument('--workers', type=int, default=None, help='Número de processos (padrão: núcleos da CPU)')
+    parser.add_argument('--modelo', default='pt_core_news_lg', help='Modelo spaCy carregado em cada worker')
+    parser.add_argument('--saida', help='Arquivo NDJSON de saída (padrão: stdout)')
+    args = parser.parse_args()
+
+    try:
+        arquivos = []
+        for nome, conteudo in listar_pdfs(Path(args.origem)):
+            if len(conteudo) > MAX_FILE_SIZE:
+                print(f"⚠️ Ignorado (maior que 10MB): {nome}", file=sys.stderr)
+                continue
+            arquivos.append((nome, conteudo))
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    print(f"📄 {len(arquivos)} PDFs encontrados em {args.origem}", file=sys.stderr)
+    if not arquivos:
+        return 0
+
+    saida = open(args.saida, 'w', encoding='utf-8') if args.saida else sys.stdout
+    ingestor = BatchIngestor(model_name=args.modelo, workers=args.workers)
+    try:
+        for registro in ingestor.process(arquivos):
+            saida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            saida.flush()
+            if "resumo" in registro:
+                resumo = registro["resumo"]
+                print(
+                    f"✅ {resumo['processados']}/{resumo['total_arquivos']} processados em {resumo['tempo_total_s']}s "
+                    f"({resumo['arquivos_por_segundo']} arquivos/s, média {resumo['tempo_medio_ms']} ms/arquivo)",
+                    file=sys.stderr
+                )
+            else:
+                status = "✅" if registro["status"] == "ok" else "❌"
+                print(f"{status} {registro['arquivo']} ({registro['tempo_ms']} ms)", file=sys.stderr)
+    finally:
+        ingestor.shutdown()
+        if saida is not sys.stdout:
+            saida.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
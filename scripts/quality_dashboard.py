@@ -72,6 +72,31 @@ def semantic_search(query: str, limit: int = 10) -> Dict:
         print(f"  ❌ Erro na busca semântica: {e}")
         return {'items': [], 'total_items': 0, 'response_time_ms': 0}
 
+def semantic_search_batch(queries: List[str], limit: int = 10) -> List[Dict]:
+    """Busca semântica de todas as queries em uma requisição (tempo do lote dividido entre as queries)"""
+    import time
+    url = f"{API_BASE}/semantic-busca/batch"
+    payload = {"consultas": [{"termo": q, "limit": limit} for q in queries]}
+    
+    try:
+        start = time.time()
+        response = requests.post(url, json=payload, timeout=30)
+        elapsed = time.time() - start
+        
+        if response.status_code != 200:
+            print(f"  ⚠️ Lote indisponível (HTTP {response.status_code}); usando uma requisição por query")
+            return [semantic_search(q, limit) for q in queries]
+        
+        per_query_ms = round(elapsed * 1000 / max(len(queries), 1), 2)
+        results = response.json().get('resultados', [])
+        for data in results:
+            data['response_time_ms'] = per_query_ms
+        return results
+        
+    except Exception as e:
+        print(f"  ❌ Erro na busca semântica em lote: {e}")
+        return [semantic_search(q, limit) for q in queries]
+
 def textual_search(query: str, limit: int = 10) -> Dict:
     """Busca textual com timing"""
     import time
@@ -424,11 +449,13 @@ def run_quality_analysis():
     
     results = []
     
-    for i, test in enumerate(TEST_QUERIES, 1):
+    # Buscas semânticas de todas as queries em uma única requisição
+    semantic_batch = semantic_search_batch([test['query'] for test in TEST_QUERIES])
+    
+    for i, (test, semantic) in enumerate(zip(TEST_QUERIES, semantic_batch), 1):
         print(f"\n📝 Query {i}/{len(TEST_QUERIES)}: {test['query'][:60]}...")
         
         # Executar buscas
-        semantic = semantic_search(test['query'])
         textual = textual_search(test['query'])
         
         # Verificar se há items na resposta
@@ -1,6 +1,12 @@
 import psycopg2
 import os
+import sys
 from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from app.services.result_cache import BUMP_DATA_VERSION_SQL
 
 # Configurações de conexão
 conn = psycopg2.connect(
@@ -47,5 +53,17 @@ if APPLY:
                     cur.execute("DELETE FROM instrumentos_parceria WHERE id = %s", (rid,))
         conn.commit()
     print("Deduplicação aplicada.")
+
+    # Recalcula as estatísticas pré-calculadas e invalida o cache de resultados da API
+    # (depois do commit: sem a migração de estatísticas/versao_dados a deduplicação é mantida)
+    if dedup_count:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT recalcular_estatisticas_parcerias()")
+                cur.execute(BUMP_DATA_VERSION_SQL)
+            conn.commit()
+        except psycopg2.Error as e:
+            conn.rollback()
+            print("Aviso: não foi possível atualizar estatisticas_parcerias/versao_dados:", e)
 else:
     print("Deduplicação NÃO aplicada (modo dry-run). Para aplicar, altere APPLY=True no script.")